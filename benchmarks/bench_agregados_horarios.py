@@ -0,0 +1,127 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from agregados_horarios import AgregadosHorarios, COLUNAS_ESTADO, atualizar_agregados, construir_agregados
+from armazenamento_horario import (atualizar_dados_horarios, carregar_dados_horarios, parquet_disponivel,
+                                   salvar_dados_horarios)
+from rotulagem_risco import calcular_features_calendario, classificar_risco_vetorizado
+
+INICIO = pd.Timestamp('2025-01-01 03:00')  # meia-noite de Brasília
+
+
+def gerar_dataset(estacoes, dias, fracao_ausente, rng):
+    # Um ano da tabela horária com as colunas usadas pelos agregados e pelas partições Parquet
+    codigos = np.char.add('35', np.char.zfill(np.arange(estacoes).astype(str), 8))
+    horas = dias * 24
+    n = estacoes * horas
+    chuva = np.round(np.where(rng.random(n) < 0.85, 0.0, rng.gamma(0.8, 6.0, n)), 2)
+    df = pd.DataFrame({
+        'cod_estacao': np.repeat(codigos, horas),
+        'datahora_utc_hora': np.tile(pd.date_range(INICIO, periods=horas, freq='h').to_numpy(), estacoes),
+        'acumulado_chuva_1_h_mm': chuva,
+        'municipio': np.repeat(np.array([f"MUNICIPIO {m:03d}" for m in rng.integers(0, estacoes // 3 + 1, estacoes)]), horas),
+        'nivel_risco': classificar_risco_vetorizado(chuva),
+    })
+    df = df[rng.random(n) >= fracao_ausente].reset_index(drop=True)
+    calendario = calcular_features_calendario(df['datahora_utc_hora'] - pd.Timedelta(hours=3))
+    return df.assign(ano=calendario['ano'], mes=calendario['mes'])
+
+
+def recalcular(df, periodo, chave):
+    # Caminho de hoje: agrupar a tabela horária inteira a cada relatório
+    dia = (df['datahora_utc_hora'] - pd.Timedelta(hours=3)).to_numpy(dtype='datetime64[ns]')
+    unidade = {'dia': 'D', 'mes': 'M', 'ano': 'Y'}[periodo]
+    nivel = df['nivel_risco'].to_numpy()
+    tabela = pd.DataFrame({chave: df[chave].to_numpy(), periodo: dia.astype(f'datetime64[{unidade}]').astype('datetime64[ns]'),
+                           'chuva': df['acumulado_chuva_1_h_mm'].to_numpy(),
+                           **{f'nivel_{k}': (nivel == k).astype('int32') for k in range(3)}})
+    resultado = tabela.groupby([chave, periodo], sort=True).agg(
+        soma_chuva_mm=('chuva', 'sum'), horas=('chuva', 'size'), max_chuva_mm=('chuva', 'max'),
+        horas_risco_baixo=('nivel_0', 'sum'), horas_risco_moderado=('nivel_1', 'sum'), horas_risco_alto=('nivel_2', 'sum'))
+    return resultado.reset_index()
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return np.median(tempos), resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latência das consultas pelos agregados materializados versus recálculo a partir da tabela horária.")
+    parser.add_argument('--estacoes', type=int, default=500)
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--fracao-ausente', type=float, default=0.05, help="Fração das horas sem leitura.")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    if not parquet_disponivel():
+        print("Erro: este benchmark usa o dataset Parquet; instale o pyarrow (pip install pyarrow).")
+        raise SystemExit(1)
+    rng = np.random.default_rng(42)
+    df = gerar_dataset(args.estacoes, args.dias, args.fracao_ausente, rng)
+    ultimo_dia = df['datahora_utc_hora'] >= INICIO + pd.Timedelta(days=args.dias - 1)
+    print(f"{len(df):,} linhas ({args.estacoes} estações x {args.dias} dias, {df['municipio'].nunique()} municípios)\n")
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_parquet = os.path.join(diretorio, 'horario.parquet')
+        diretorio_agregados = os.path.join(diretorio, 'agregados')
+        salvar_dados_horarios(df[~ultimo_dia], 'parquet', caminho_parquet=caminho_parquet)
+
+        inicio = time.perf_counter()
+        construir_agregados(diretorio=diretorio_agregados, caminho=caminho_parquet)
+        tempo_construcao = time.perf_counter() - inicio
+
+        # Chega mais um dia: só os estados (estação, dia) e (estação, mês) desse dia são refeitos
+        df_dia = df[ultimo_dia]
+        chaves_vazias = pd.MultiIndex.from_arrays([[], []], names=['cod_estacao', 'datahora_utc_hora'])
+        atualizar_dados_horarios(df_dia, chaves_vazias, 'parquet', caminho_parquet=caminho_parquet)
+        inicio = time.perf_counter()
+        dias_recalculados = atualizar_agregados(df_dia, chaves_vazias, diretorio_agregados, caminho_parquet)
+        tempo_atualizacao = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        construir_agregados(diretorio=os.path.join(diretorio, 'referencia'), caminho=caminho_parquet)
+        tempo_reconstrucao = time.perf_counter() - inicio
+        incremental = AgregadosHorarios(diretorio_agregados)
+        referencia = AgregadosHorarios(os.path.join(diretorio, 'referencia'))
+        iguais = all(getattr(incremental, nome).index.equals(getattr(referencia, nome).index)
+                     and np.allclose(getattr(incremental, nome).to_numpy(dtype=float), getattr(referencia, nome).to_numpy(dtype=float))
+                     for nome in ('diario', 'mensal'))
+
+        print("Manutenção dos agregados:")
+        print(f"  {'construção completa (lê o Parquet)':<46} {tempo_construcao:8.2f} s")
+        print(f"  {f'novo dia: {dias_recalculados} estados recalculados':<46} {tempo_atualizacao:8.2f} s "
+              f"(reconstruir: {tempo_reconstrucao:.2f} s)")
+        print(f"  estados idênticos à reconstrução completa: {iguais}\n")
+
+        inicio = time.perf_counter()
+        carregar_dados_horarios(colunas=['cod_estacao', 'municipio', 'datahora_utc_hora', 'acumulado_chuva_1_h_mm',
+                                         'nivel_risco'], caminho=caminho_parquet)
+        tempo_leitura = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        agregados = AgregadosHorarios(diretorio_agregados)
+        tempo_abertura = time.perf_counter() - inicio
+        print(f"Ler a tabela horária do Parquet (colunas necessárias): {tempo_leitura:.2f} s")
+        print(f"Abrir os agregados: {tempo_abertura * 1000:.1f} ms\n")
+
+        print(f"Consultas sobre o ano inteiro (mediana de {args.repeticoes}):")
+        for periodo, nivel in (('mes', 'municipio'), ('ano', 'estacao'), ('dia', 'municipio'), ('mes', 'estacao')):
+            chave = 'cod_estacao' if nivel == 'estacao' else 'municipio'
+            tempo_recalculo, esperado = cronometrar(lambda: recalcular(df, periodo, chave), args.repeticoes)
+            tempo_agregados, obtido = cronometrar(lambda: agregados.consultar(periodo, nivel), args.repeticoes)
+            identicos = (len(obtido) == len(esperado)
+                         and np.allclose(obtido[COLUNAS_ESTADO].to_numpy(dtype=float), esperado[COLUNAS_ESTADO].to_numpy(dtype=float)))
+            print(f"  {nivel} x {periodo:<4} ({len(obtido):>7,} linhas): recálculo em memória {tempo_recalculo * 1000:8.1f} ms "
+                  f"(+{tempo_leitura:.1f} s de leitura) | agregados {tempo_agregados * 1000:7.1f} ms "
+                  f"-> {tempo_recalculo / tempo_agregados:,.0f}x | idênticos: {identicos}")
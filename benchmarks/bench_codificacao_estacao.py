@@ -0,0 +1,80 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from codificacao_estacao import MODOS_CODIFICACAO, construir_preprocessador
+from rotulagem_risco import classificar_risco_vetorizado
+
+
+def gerar_dados(n_estacoes, linhas, semente=42):
+    # Estações espalhadas pelo estado de SP; a resposta de cada estação à chuva varia suavemente
+    # com a posição, de modo que a identidade (ou a localização) da estação importa para o rótulo
+    rng = np.random.default_rng(semente)
+    latitude = rng.uniform(-25.0, -20.0, n_estacoes)
+    longitude = rng.uniform(-53.0, -44.0, n_estacoes)
+    fator = 1.0 + 0.6 * np.sin(latitude * 1.7) * np.cos(longitude * 0.9)
+    estacao = rng.integers(0, n_estacoes, linhas)
+    chuva = np.where(rng.random(linhas) < 0.7, 0.0, rng.gamma(0.8, 8.0, linhas)).round(2)
+    return pd.DataFrame({
+        'acumulado_chuva_1_h_mm': chuva,
+        'cod_estacao': pd.Categorical(np.char.add('35', np.char.zfill(estacao.astype(str), 8))),
+        'latitude': latitude[estacao],
+        'longitude': longitude[estacao],
+        'nivel_risco': classificar_risco_vetorizado(chuva * fator[estacao]).astype('int64'),
+    })
+
+
+def pico_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir_modo(modo, n_estacoes, linhas, arvores):
+    # Executado em um processo novo para que o pico de memória seja só deste modo
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+
+    df = gerar_dados(n_estacoes, linhas)
+    X = df[['acumulado_chuva_1_h_mm', 'cod_estacao']]
+    y = df['nivel_risco']
+    X_treino, X_teste, y_treino, y_teste = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    pipeline = Pipeline(steps=[
+        ('preprocessor', construir_preprocessador(modo, df)),
+        ('classifier', RandomForestClassifier(random_state=42, n_estimators=arvores))
+    ])
+    rss_antes = pico_rss_mb()
+    inicio = time.perf_counter()
+    pipeline.fit(X_treino, y_treino)
+    tempo_fit = time.perf_counter() - inicio
+    pico_fit = pico_rss_mb()
+    acuracia = (pipeline.predict(X_teste) == y_teste.to_numpy()).mean()
+    # Estações desconhecidas: teste com códigos que o codificador nunca viu
+    X_novas = X_teste.assign(cod_estacao='NOVA' + X_teste['cod_estacao'].astype(str))
+    acuracia_novas = (pipeline.predict(X_novas) == y_teste.to_numpy()).mean()
+    return tempo_fit, pico_fit, max(pico_fit - rss_antes, 0.0), acuracia, acuracia_novas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo de treino, pico de memória e acurácia por codificação de estação.")
+    parser.add_argument('--estacoes', type=int, default=1000)
+    parser.add_argument('--linhas', type=int, default=100_000)
+    parser.add_argument('--arvores', type=int, default=50)
+    parser.add_argument('--modos', nargs='+', choices=MODOS_CODIFICACAO, default=list(MODOS_CODIFICACAO))
+    args = parser.parse_args()
+
+    print(f"{args.linhas:,} linhas, {args.estacoes:,} estações, {args.arvores} árvores (80% treino / 20% teste)")
+    print(f"{'codificação':<16} {'fit (s)':>9} {'pico RSS (MB)':>14} {'+ no fit (MB)':>14} {'acurácia':>9} {'acur. estações novas':>21}")
+    contexto = multiprocessing.get_context('spawn')
+    for modo in args.modos:
+        with contexto.Pool(1) as pool:
+            tempo, pico, acrescimo, acuracia, acuracia_novas = pool.apply(
+                medir_modo, (modo, args.estacoes, args.linhas, args.arvores))
+        print(f"{modo:<16} {tempo:>9.2f} {pico:>14.0f} {acrescimo:>14.0f} {acuracia:>9.4f} {acuracia_novas:>21.4f}")
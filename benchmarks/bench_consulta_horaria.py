@@ -0,0 +1,107 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from armazenamento_horario import carregar_dados_horarios, salvar_dados_horarios
+from consulta_horaria import ConsultaHoraria, construir_indice_consulta
+
+INICIO = pd.Timestamp('2025-01-01')
+
+
+def gerar_dataset(estacoes, horas, rng):
+    codigos = np.char.add('35', np.char.zfill(np.arange(estacoes).astype(str), 8))
+    n = estacoes * horas
+    return pd.DataFrame({
+        'cod_estacao': np.repeat(codigos, horas),
+        'datahora_utc_hora': np.tile(pd.date_range(INICIO, periods=horas, freq='h').to_numpy(), estacoes),
+        'acumulado_chuva_1_h_mm': np.round(np.where(rng.random(n) < 0.8, 0.0, rng.gamma(0.8, 6.0, n)), 2),
+        'municipio': np.repeat(np.array([f"Municipio {m}" for m in rng.integers(0, 645, estacoes)]), horas),
+        'nivel_risco': rng.integers(0, 3, n),
+    })
+
+
+def medir(funcao, consultas):
+    tempos = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        funcao(*consulta)
+        tempos.append(time.perf_counter() - inicio)
+    return np.array(tempos) * 1000
+
+
+def imprimir(descricao, tempos_ms, referencia_ms=None):
+    p50 = np.percentile(tempos_ms, 50)
+    ganho = f" -> {referencia_ms / p50:,.0f}x" if referencia_ms else ""
+    print(f"  {descricao:<34} p50 {p50:9.3f} ms | p99 {np.percentile(tempos_ms, 99):9.3f} ms{ganho}")
+    return p50
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latência das consultas pelo índice com mmap versus máscara booleana do pandas.")
+    parser.add_argument('--estacoes', type=int, default=1000)
+    parser.add_argument('--horas', type=int, default=2160, help="Horas por estação (2160 = 90 dias).")
+    parser.add_argument('--consultas', type=int, default=300)
+    parser.add_argument('--janela-horas', type=int, default=168, help="Tamanho da janela das consultas por estação.")
+    parser.add_argument('--consultas-distintas', type=int, default=20,
+                        help="Consultas distintas repetidas no cenário de painel (cache LRU quente).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    df = gerar_dataset(args.estacoes, args.horas, rng)
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_csv = os.path.join(diretorio, 'horario.csv')
+        salvar_dados_horarios(df, 'csv', caminho_csv=caminho_csv)
+        print(f"{len(df):,} linhas ({args.estacoes} estações x {args.horas} horas), "
+              f"CSV de {os.path.getsize(caminho_csv) / 1e6:.0f} MB\n")
+
+        inicio = time.perf_counter()
+        df_carregado = carregar_dados_horarios(caminho=caminho_csv)
+        df_carregado['datahora_utc_hora'] = pd.to_datetime(df_carregado['datahora_utc_hora'])
+        df_carregado['cod_estacao'] = df_carregado['cod_estacao'].astype(str)
+        tempo_csv = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        construir_indice_consulta(os.path.join(diretorio, 'indice'), caminho_csv)
+        tempo_construcao = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        consulta = ConsultaHoraria(os.path.join(diretorio, 'indice'), tamanho_cache=0)
+        tempo_abertura = time.perf_counter() - inicio
+        print(f"Carregar o CSV inteiro (como antes, a cada análise): {tempo_csv:.2f} s")
+        print(f"Construir o índice (uma vez por versão do dataset): {tempo_construcao:.2f} s")
+        print(f"Abrir o índice (mmap): {tempo_abertura * 1000:.1f} ms\n")
+
+        codigos = df_carregado['cod_estacao'].unique()
+        horas = pd.date_range(INICIO, periods=args.horas, freq='h')
+        consultas_estacao = []
+        for _ in range(args.consultas):
+            t0 = horas[rng.integers(0, args.horas - args.janela_horas)]
+            consultas_estacao.append((rng.choice(codigos), t0, t0 + pd.Timedelta(hours=args.janela_horas - 1)))
+        consultas_hora = [(horas[i],) for i in rng.integers(0, args.horas, args.consultas)]
+
+        def mascara_estacao(cod, t0, t1):
+            return df_carregado[(df_carregado['cod_estacao'] == cod) & (df_carregado['datahora_utc_hora'] >= t0)
+                                & (df_carregado['datahora_utc_hora'] <= t1)]
+
+        def mascara_hora(hora):
+            return df_carregado[df_carregado['datahora_utc_hora'] == hora]
+
+        for descricao, mascara, indice, consultas in (
+                ("Estação X entre t0 e t1", mascara_estacao, consulta.estacao, consultas_estacao),
+                ("Todas as estações na hora h", mascara_hora, consulta.hora, consultas_hora)):
+            print(f"{descricao} ({args.consultas} consultas):")
+            referencia = imprimir("máscara booleana (pandas)", medir(mascara, consultas))
+            imprimir("índice, sem cache", medir(indice, consultas), referencia)
+            # Painel: poucas consultas distintas repetidas; o cache guarda os resultados
+            consulta_painel = ConsultaHoraria(os.path.join(diretorio, 'indice'))
+            repetidas = [consultas[i % args.consultas_distintas] for i in range(len(consultas))]
+            medir(getattr(consulta_painel, indice.__name__), repetidas[:args.consultas_distintas])
+            imprimir("índice, cache LRU quente", medir(getattr(consulta_painel, indice.__name__), repetidas), referencia)
+            iguais = all(np.array_equal(mascara(*c)['acumulado_chuva_1_h_mm'].to_numpy(),
+                                        indice(*c)['acumulado_chuva_1_h_mm'].to_numpy()) for c in consultas[:50])
+            print(f"  resultados idênticos (50 consultas): {iguais}\n")
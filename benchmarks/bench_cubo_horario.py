@@ -0,0 +1,151 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from armazenamento_horario import carregar_dados_horarios, salvar_dados_horarios
+from cubo_horario import CuboHorario, construir_cubo_horario
+from features_chuva import calcular_features_janelas
+
+INICIO = pd.Timestamp('2025-01-01')
+
+
+def gerar_dataset(estacoes, horas, fracao_ausente, rng):
+    # Tabela longa como a do processamento: horas sem leitura simplesmente não aparecem
+    codigos = np.char.add('35', np.char.zfill(np.arange(estacoes).astype(str), 8))
+    n = estacoes * horas
+    df = pd.DataFrame({
+        'cod_estacao': np.repeat(codigos, horas),
+        'datahora_utc_hora': np.tile(pd.date_range(INICIO, periods=horas, freq='h').to_numpy(), estacoes),
+        'acumulado_chuva_1_h_mm': np.round(np.where(rng.random(n) < 0.8, 0.0, rng.gamma(0.8, 6.0, n)), 2),
+        'municipio': np.repeat(np.array([f"Municipio {m}" for m in rng.integers(0, 645, estacoes)]), horas),
+        'nivel_risco': rng.integers(0, 3, n),
+    })
+    return df[rng.random(n) >= fracao_ausente].reset_index(drop=True)
+
+
+def medir(funcao, consultas):
+    tempos = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        funcao(*consulta)
+        tempos.append(time.perf_counter() - inicio)
+    return np.array(tempos) * 1e6
+
+
+def imprimir(descricao, tempos_us, referencia_us=None):
+    p50 = np.percentile(tempos_us, 50)
+    ganho = f" -> {referencia_us / p50:,.0f}x" if referencia_us else ""
+    print(f"  {descricao:<34} p50 {p50:10.1f} us | p99 {np.percentile(tempos_us, 99):10.1f} us{ganho}")
+    return p50
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memória e velocidade de acesso do cubo estações x horas versus CSV/DataFrame.")
+    parser.add_argument('--estacoes', type=int, default=1000)
+    parser.add_argument('--horas', type=int, default=2160, help="Horas do período (2160 = 90 dias).")
+    parser.add_argument('--fracao-ausente', type=float, default=0.1, help="Fração das horas sem leitura.")
+    parser.add_argument('--consultas', type=int, default=300)
+    parser.add_argument('--janela-horas', type=int, default=168, help="Tamanho da série consultada por estação.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    df = gerar_dataset(args.estacoes, args.horas, args.fracao_ausente, rng)
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_csv = os.path.join(diretorio, 'horario.csv')
+        caminho_cubo = os.path.join(diretorio, 'cubo')
+        salvar_dados_horarios(df, 'csv', caminho_csv=caminho_csv)
+        print(f"{len(df):,} linhas ({args.estacoes} estações x {args.horas} horas, "
+              f"{args.fracao_ausente:.0%} das horas sem leitura)\n")
+
+        inicio = time.perf_counter()
+        df_carregado = carregar_dados_horarios(caminho=caminho_csv)
+        df_carregado['datahora_utc_hora'] = pd.to_datetime(df_carregado['datahora_utc_hora'])
+        df_carregado['cod_estacao'] = df_carregado['cod_estacao'].astype(str)
+        tempo_csv = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        construir_cubo_horario(caminho_cubo, caminho_csv)
+        tempo_construcao = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        cubo = CuboHorario(caminho_cubo)
+        tempo_abertura = time.perf_counter() - inicio
+
+        memoria_df = df_carregado.memory_usage(deep=True).sum()
+        memoria_chuva = df_carregado[['cod_estacao', 'datahora_utc_hora', 'acumulado_chuva_1_h_mm']].memory_usage(deep=True).sum()
+        arquivos_cubo = sum(os.path.getsize(os.path.join(caminho_cubo, nome)) for nome in os.listdir(caminho_cubo))
+        print("Espaço:")
+        print(f"  {'CSV horário em disco':<44} {os.path.getsize(caminho_csv) / 1e6:8.1f} MB")
+        print(f"  {'DataFrame carregado (todas as colunas)':<44} {memoria_df / 1e6:8.1f} MB")
+        print(f"  {'DataFrame (estação, hora, chuva)':<44} {memoria_chuva / 1e6:8.1f} MB")
+        print(f"  {'cubo em disco (float32 + códigos)':<44} {arquivos_cubo / 1e6:8.1f} MB "
+              f"(residente só nas páginas tocadas)\n")
+        print("Tempo de preparação:")
+        print(f"  {'carregar o CSV em um DataFrame':<44} {tempo_csv:8.2f} s")
+        print(f"  {'construir o cubo (uma vez por versão)':<44} {tempo_construcao:8.2f} s")
+        print(f"  {'abrir o cubo (mmap)':<44} {tempo_abertura * 1000:8.2f} ms\n")
+
+        codigos = cubo.estacoes
+        horas = cubo.horas
+        pontos = [(rng.choice(codigos), horas[i]) for i in rng.integers(0, len(horas), args.consultas)]
+        instantes = [(horas[i],) for i in rng.integers(0, len(horas), args.consultas)]
+        series = []
+        for _ in range(args.consultas):
+            t0 = horas[rng.integers(0, len(horas) - args.janela_horas)]
+            series.append((rng.choice(codigos), t0, t0 + pd.Timedelta(hours=args.janela_horas - 1)))
+        indexado = df_carregado.set_index(['cod_estacao', 'datahora_utc_hora']).sort_index()['acumulado_chuva_1_h_mm']
+
+        def ponto_mascara(cod, hora):
+            valores = df_carregado.loc[(df_carregado['cod_estacao'] == cod)
+                                       & (df_carregado['datahora_utc_hora'] == hora), 'acumulado_chuva_1_h_mm']
+            return float(valores.iloc[0]) if len(valores) else np.nan
+
+        def ponto_multiindex(cod, hora):
+            return float(indexado.get((cod, hora), np.nan))
+
+        def instantaneo_mascara(hora):
+            return df_carregado.loc[df_carregado['datahora_utc_hora'] == hora, ['cod_estacao', 'acumulado_chuva_1_h_mm']]
+
+        def serie_mascara(cod, t0, t1):
+            return df_carregado.loc[(df_carregado['cod_estacao'] == cod) & (df_carregado['datahora_utc_hora'] >= t0)
+                                    & (df_carregado['datahora_utc_hora'] <= t1), 'acumulado_chuva_1_h_mm']
+
+        print(f"Leitura de uma (estação, hora) ({args.consultas} consultas):")
+        referencia = imprimir("máscara booleana (pandas)", medir(ponto_mascara, pontos))
+        imprimir("MultiIndex ordenado (.get)", medir(ponto_multiindex, pontos), referencia)
+        imprimir("cubo.valor", medir(cubo.valor, pontos), referencia)
+        iguais = all(np.allclose(ponto_mascara(*p), cubo.valor(*p), equal_nan=True) for p in pontos)
+        print(f"  resultados idênticos: {iguais}\n")
+
+        print(f"Todas as estações na hora h ({args.consultas} consultas):")
+        referencia = imprimir("máscara booleana (pandas)", medir(instantaneo_mascara, instantes))
+        imprimir("cubo.instantaneo", medir(cubo.instantaneo, instantes), referencia)
+        iguais = all(np.allclose(instantaneo_mascara(*h)['acumulado_chuva_1_h_mm'].to_numpy(),
+                                 cubo.instantaneo(*h).dropna().to_numpy()) for h in instantes[:50])
+        print(f"  resultados idênticos (50 consultas): {iguais}\n")
+
+        print(f"Série de {args.janela_horas} h de uma estação ({args.consultas} consultas):")
+        referencia = imprimir("máscara booleana (pandas)", medir(serie_mascara, series))
+        imprimir("cubo.serie", medir(cubo.serie, series), referencia)
+        iguais = all(np.allclose(serie_mascara(*s).to_numpy(), cubo.serie(*s).dropna().to_numpy()) for s in series[:50])
+        print(f"  resultados idênticos (50 consultas): {iguais}\n")
+
+        print("Janelas móveis (soma e máximo em 3, 6, 24 e 72 h) de todas as estações e horas:")
+        inicio = time.perf_counter()
+        features_df = calcular_features_janelas(df_carregado)
+        tempo_df = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        features_cubo = cubo.janelas_moveis()
+        tempo_cubo = time.perf_counter() - inicio
+        print(f"  {'calcular_features_janelas (DataFrame)':<44} {tempo_df:8.2f} s")
+        print(f"  {'cubo.janelas_moveis':<44} {tempo_cubo:8.2f} s -> {tempo_df / tempo_cubo:.1f}x")
+        linhas = np.searchsorted(codigos, df_carregado['cod_estacao'].to_numpy())
+        colunas = ((df_carregado['datahora_utc_hora'] - cubo.hora_inicial) // pd.Timedelta(hours=1)).to_numpy()
+        diferenca = max(np.abs(features_cubo[nome][linhas, colunas] - features_df[nome].to_numpy()).max()
+                        for nome in features_df.columns)
+        print(f"  maior diferença entre os resultados: {diferenca:.2g} mm (arredondamento do float32)")
@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from features_chuva import janelas_do_modelo, nomes_features_janelas
+from floresta_compacta import carregar_floresta_compacta, exportar_floresta_compacta
+from inferencia_lote import PreditorEmLote, ServicoMicroLotes
+from rotulagem_risco import classificar_risco_vetorizado
+
+
+def treinar_modelo_sintetico(n_estacoes, linhas, rng):
+    # Mesmo pipeline de 2_train_model.py, treinado com leituras sintéticas
+    estacoes = np.array([f"35{i:06d}A" for i in range(n_estacoes)])
+    chuva = np.where(rng.random(linhas) < 0.8, 0.0, rng.gamma(0.7, 6.0, linhas))
+    X = pd.DataFrame({'acumulado_chuva_1_h_mm': chuva, 'cod_estacao': rng.choice(estacoes, linhas)})
+    y = classificar_risco_vetorizado(chuva)
+    modelo = Pipeline(steps=[
+        ('preprocessor', ColumnTransformer(
+            transformers=[('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False), ['cod_estacao'])],
+            remainder='passthrough')),
+        ('classifier', RandomForestClassifier(random_state=42, n_estimators=100))
+    ])
+    modelo.fit(X, y)
+    return modelo
+
+
+def gerar_leituras(modelo, n, rng):
+    estacoes = np.asarray(modelo.named_steps['preprocessor'].named_transformers_['onehot'].categories_[0]).astype(str)
+    cod = rng.choice(estacoes, n)
+    chuva = np.where(rng.random(n) < 0.8, 0.0, rng.gamma(0.7, 6.0, n))
+    # Sem histórico, as janelas (se o modelo usar) repetem a leitura atual
+    extras = {nome: chuva for nome in nomes_features_janelas(janelas_do_modelo(modelo))}
+    return cod, chuva, extras
+
+
+def prever_com_dataframe(modelo, cod, chuva, extras):
+    # Caminho anterior: DataFrame + modelo.predict (ColumnTransformer e despacho do joblib a cada chamada)
+    return modelo.predict(pd.DataFrame({'acumulado_chuva_1_h_mm': chuva, 'cod_estacao': cod, **extras}))
+
+
+def medir_latencias(funcao, repeticoes):
+    latencias = np.empty(repeticoes)
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        latencias[i] = time.perf_counter() - inicio
+    return latencias
+
+
+def imprimir(descricao, latencias, linhas_por_chamada):
+    p50, p99 = np.percentile(latencias, [50, 99]) * 1e3
+    linhas_s = linhas_por_chamada * len(latencias) / latencias.sum()
+    print(f"{descricao:<38} p50 {p50:>9.3f} ms  p99 {p99:>9.3f} ms  {linhas_s:>12,.0f} linhas/s")
+
+
+def medir_concorrencia(funcao_por_leitura, cod, chuva, extras, threads):
+    # Cada thread envia leituras uma a uma, como vários sensores chegando ao mesmo tempo
+    latencias = np.empty(len(cod))
+    fatias = np.array_split(np.arange(len(cod)), threads)
+
+    def trabalhar(indices):
+        for i in indices:
+            inicio = time.perf_counter()
+            funcao_por_leitura(cod[i], chuva[i], {nome: valores[i] for nome, valores in extras.items()})
+            latencias[i] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    trabalhadores = [threading.Thread(target=trabalhar, args=(indices,)) for indices in fatias]
+    for t in trabalhadores:
+        t.start()
+    for t in trabalhadores:
+        t.join()
+    return latencias, time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latência e vazão da inferência em lote versus DataFrame por chamada.")
+    parser.add_argument('--modelo', default=None, help="Pipeline .joblib treinado; sem ele um modelo sintético é treinado.")
+    parser.add_argument('--estacoes', type=int, default=200, help="Estações do modelo sintético.")
+    parser.add_argument('--tamanhos-lote', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--repeticoes', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requisicoes', type=int, default=4000, help="Leituras individuais no teste concorrente.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    if args.modelo:
+        modelo = joblib.load(args.modelo)
+    else:
+        print(f"Treinando modelo sintético com {args.estacoes} estações...")
+        modelo = treinar_modelo_sintetico(args.estacoes, 50_000, rng)
+    preditor = PreditorEmLote(modelo)
+
+    # Carga e tamanho do pipeline .joblib versus a floresta compacta exportada pelo treino
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_joblib = os.path.join(diretorio, 'modelo.joblib')
+        caminho_compacto = os.path.join(diretorio, 'modelo_compacto.npz')
+        joblib.dump(modelo, caminho_joblib)
+        exportar_floresta_compacta(modelo, caminho_compacto)
+        for descricao, caminho, carregar in [("pipeline .joblib", caminho_joblib, joblib.load),
+                                             ("floresta compacta .npz", caminho_compacto, carregar_floresta_compacta)]:
+            inicio = time.perf_counter()
+            carregado = carregar(caminho)
+            print(f"Carga do {descricao:<24} {time.perf_counter() - inicio:>8.3f} s  {os.path.getsize(caminho) / 1024:>8.0f} KB")
+        floresta = carregado
+
+    cod, chuva, extras = gerar_leituras(modelo, max(args.tamanhos_lote), rng)
+    esperado = prever_com_dataframe(modelo, cod, chuva, extras)
+    assert (preditor.prever(cod, chuva, extras) == esperado).all(), "Preditor em lote difere de modelo.predict!"
+    assert (floresta.prever(cod, chuva, extras) == esperado).all(), "Floresta compacta difere de modelo.predict!"
+    print("Predições idênticas às de modelo.predict.\n")
+
+    for tamanho in args.tamanhos_lote:
+        repeticoes = max(5, min(args.repeticoes, 200_000 // tamanho))
+        lote = (cod[:tamanho], chuva[:tamanho], {nome: v[:tamanho] for nome, v in extras.items()})
+        print(f"Lote de {tamanho} leitura(s), {repeticoes} chamadas:")
+        imprimir("  DataFrame + modelo.predict", medir_latencias(lambda: prever_com_dataframe(modelo, *lote), repeticoes), tamanho)
+        imprimir("  PreditorEmLote.prever", medir_latencias(lambda: preditor.prever(*lote), repeticoes), tamanho)
+        imprimir("  FlorestaCompacta.prever", medir_latencias(lambda: floresta.prever(*lote), repeticoes), tamanho)
+
+    n = min(args.requisicoes, len(cod))
+    cod, chuva = cod[:n], chuva[:n]
+    extras = {nome: v[:n] for nome, v in extras.items()}
+    print(f"\n{n} requisições de uma leitura vindas de {args.threads} threads:")
+    latencias, total = medir_concorrencia(lambda c, h, e: preditor.prever([c], [h], {k: [v] for k, v in e.items()}),
+                                          cod, chuva, extras, args.threads)
+    p50, p99 = np.percentile(latencias, [50, 99]) * 1e3
+    print(f"  {'uma predição por requisição':<36} p50 {p50:>9.3f} ms  p99 {p99:>9.3f} ms  {n / total:>12,.0f} linhas/s")
+    with ServicoMicroLotes(preditor) as servico:
+        latencias, total = medir_concorrencia(servico.prever, cod, chuva, extras, args.threads)
+        lotes = servico.lotes_processados
+    p50, p99 = np.percentile(latencias, [50, 99]) * 1e3
+    print(f"  {'ServicoMicroLotes':<36} p50 {p50:>9.3f} ms  p99 {p99:>9.3f} ms  {n / total:>12,.0f} linhas/s"
+          f"  ({lotes} lotes, {n / lotes:.1f} leituras/lote)")
@@ -0,0 +1,50 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ingestao_cemaden import TAMANHO_BLOCO_PADRAO, agregar_arquivos_em_paralelo
+
+
+def medir_escalabilidade(arquivos, max_workers, tamanho_fatia, repeticoes):
+    """
+    Mede o tempo de agregação horária com 1..max_workers processos e imprime o speedup
+    em relação a 1 processo. Também confere que todas as execuções produzem o mesmo resultado.
+    """
+    total_bytes = sum(os.path.getsize(a) for a in arquivos)
+    print(f"Arquivos: {len(arquivos)} ({total_bytes / 1024 / 1024:.1f} MB) | CPUs disponíveis: {os.cpu_count()}")
+    print(f"{'workers':>8} {'tempo (s)':>10} {'MB/s':>8} {'speedup':>8}")
+
+    referencia = None
+    tempo_base = None
+    for workers in range(1, max_workers + 1):
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            df_horario = agregar_arquivos_em_paralelo(arquivos, workers, TAMANHO_BLOCO_PADRAO, tamanho_fatia)
+            tempos.append(time.perf_counter() - inicio)
+        tempo = min(tempos)
+        if referencia is None:
+            referencia, tempo_base = df_horario, tempo
+        elif not df_horario.equals(referencia):
+            print(f"Aviso: resultado com {workers} processos difere do resultado com 1 processo!")
+        print(f"{workers:>8} {tempo:>10.2f} {total_bytes / 1024 / 1024 / tempo:>8.1f} {tempo_base / tempo:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de escalabilidade da ingestão paralela do CEMADEN.")
+    parser.add_argument('--arquivos', default="data/cemaden_*.csv",
+                        help="Padrão glob dos CSVs mensais brutos.")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--tamanho-fatia-mb', type=int, default=16)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    arquivos = sorted(a for a in glob.glob(args.arquivos) if 'processed' not in a)
+    if not arquivos:
+        print(f"Nenhum arquivo encontrado para o padrão {args.arquivos}.")
+        sys.exit(1)
+    medir_escalabilidade(arquivos, args.max_workers, args.tamanho_fatia_mb * 1024 * 1024, args.repeticoes)
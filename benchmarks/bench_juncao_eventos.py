@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from juncao_eventos import RAIO_TERRA_KM, IndiceEstacoes, juntar_eventos_estacoes, marcar_horas_com_evento
+
+INICIO = pd.Timestamp('2025-01-01')
+
+
+def gerar_dados(estacoes, horas, eventos, rng):
+    # Estações espalhadas pelo estado de SP, uma leitura por hora cada
+    lat = rng.uniform(-25.0, -20.0, estacoes)
+    lon = rng.uniform(-53.0, -44.5, estacoes)
+    cod = np.char.add('35', np.char.zfill(np.arange(estacoes).astype(str), 8))
+    df_horario = pd.DataFrame({
+        'cod_estacao': np.repeat(cod, horas),
+        'datahora_utc_hora': np.tile(pd.date_range(INICIO, periods=horas, freq='h').to_numpy(), estacoes),
+        'latitude': np.repeat(lat, horas),
+        'longitude': np.repeat(lon, horas),
+        'acumulado_chuva_1_h_mm': np.where(rng.random(estacoes * horas) < 0.8, 0.0,
+                                           rng.gamma(0.8, 6.0, estacoes * horas)).astype('float32'),
+        'nivel_risco': np.zeros(estacoes * horas, dtype='int8'),
+    })
+    df_eventos = pd.DataFrame({
+        'Latitude': rng.uniform(-25.0, -20.0, eventos),
+        'Longitude': rng.uniform(-53.0, -44.5, eventos),
+        'datahora_evento_utc': INICIO + pd.to_timedelta(rng.integers(0, horas, eventos), unit='h'),
+        'horario_conhecido': True,
+        'Bairro_Localizacao': [f"Evento {i}" for i in range(eventos)],
+    })
+    return df_horario, df_eventos
+
+
+def juntar_com_laco(df_eventos, df_horario, raio_km, horas_antes, horas_depois):
+    # Abordagem ingênua: para cada evento, distância a todas as estações e máscara booleana no DataFrame
+    estacoes = df_horario.groupby('cod_estacao')[['latitude', 'longitude']].first()
+    lat_e, lon_e = np.radians(estacoes['latitude'].to_numpy()), np.radians(estacoes['longitude'].to_numpy())
+    partes = []
+    for i, evento in df_eventos.iterrows():
+        lat, lon = np.radians(evento['Latitude']), np.radians(evento['Longitude'])
+        a = np.sin((lat_e - lat) / 2) ** 2 + np.cos(lat) * np.cos(lat_e) * np.sin((lon_e - lon) / 2) ** 2
+        proximas = estacoes.index[2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(a)) <= raio_km]
+        inicio = evento['datahora_evento_utc'] - pd.Timedelta(hours=horas_antes)
+        fim = evento['datahora_evento_utc'] + pd.Timedelta(hours=horas_depois)
+        mascara = (df_horario['cod_estacao'].isin(proximas) & (df_horario['datahora_utc_hora'] >= inicio)
+                   & (df_horario['datahora_utc_hora'] <= fim))
+        partes.append(df_horario.loc[mascara, ['cod_estacao', 'datahora_utc_hora', 'acumulado_chuva_1_h_mm']].assign(evento=i))
+    return pd.concat(partes, ignore_index=True)
+
+
+def chaves(df):
+    return set(zip(df['evento'], df['cod_estacao'], pd.to_datetime(df['datahora_utc_hora']), df['acumulado_chuva_1_h_mm']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Junção espaço-temporal eventos x estações: BallTree + busca binária versus laço por evento.")
+    parser.add_argument('--estacoes', type=int, default=20_000)
+    parser.add_argument('--horas', type=int, default=240)
+    parser.add_argument('--eventos', type=int, default=20_000)
+    parser.add_argument('--raio-km', type=float, default=10.0)
+    parser.add_argument('--horas-antes', type=int, default=24)
+    parser.add_argument('--horas-depois', type=int, default=6)
+    parser.add_argument('--amostra-laco', type=int, default=50, help="Eventos avaliados pelo laço (o tempo é extrapolado).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    df_horario, df_eventos = gerar_dados(args.estacoes, args.horas, args.eventos, rng)
+    print(f"{args.estacoes:,} estações x {args.horas} horas = {len(df_horario):,} linhas; {args.eventos:,} eventos; raio {args.raio_km} km\n")
+
+    inicio = time.perf_counter()
+    indice = IndiceEstacoes(df_horario)
+    print(f"Índice (BallTree haversine + série ordenada por estação/hora): {time.perf_counter() - inicio:.2f} s")
+
+    inicio = time.perf_counter()
+    juncao = juntar_eventos_estacoes(df_eventos, indice, args.raio_km, args.horas_antes, args.horas_depois)
+    tempo_vetorizado = time.perf_counter() - inicio
+    print(f"Junção vetorizada: {tempo_vetorizado:.2f} s para {args.eventos:,} eventos ({len(juncao):,} linhas, "
+          f"{args.eventos / tempo_vetorizado:,.0f} eventos/s)")
+
+    inicio = time.perf_counter()
+    marcar_horas_com_evento(df_horario, juncao)
+    print(f"Rótulo evento_proximo no dataset horário: {time.perf_counter() - inicio:.2f} s "
+          f"({int(df_horario['evento_proximo'].sum()):,} horas marcadas)")
+
+    amostra = df_eventos.head(args.amostra_laco)
+    inicio = time.perf_counter()
+    referencia = juntar_com_laco(amostra, df_horario, args.raio_km, args.horas_antes, args.horas_depois)
+    tempo_laco = (time.perf_counter() - inicio) / len(amostra) * args.eventos
+    iguais = chaves(referencia) == chaves(juncao[juncao['evento'] < len(amostra)])
+    print(f"Laço por evento (extrapolado de {len(amostra)} eventos): {tempo_laco:.1f} s "
+          f"-> {tempo_laco / tempo_vetorizado:.0f}x mais lento; resultados idênticos na amostra: {iguais}")
@@ -0,0 +1,123 @@
+import argparse
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from motor_alertas import INTENSIDADES, MotorAlertas, determinar_risco_final_lote
+from rotulagem_risco import classificar_risco_vetorizado
+
+simulador = importlib.import_module('3_run_simulation_with_local_sensor')
+
+# Limites (mm/h) entre as intensidades do simulador: Leve | Moderada | Forte | Extrema
+LIMITES_INTENSIDADE = [simulador.INTENSIDADE_MM_H[nome][1] for nome in INTENSIDADES[:-1]]
+
+
+def gerar_ciclos(n_estacoes, n_ciclos, rng):
+    # Chuva com persistência (AR(1) no log), oscilando em torno dos limiares de risco
+    base = rng.gamma(0.8, 6.0, n_estacoes)
+    log_chuva = np.log1p(base)
+    for _ in range(n_ciclos):
+        log_chuva = 0.8 * log_chuva + 0.2 * np.log1p(base) + rng.normal(0.0, 0.35, n_estacoes)
+        chuva = np.expm1(np.maximum(log_chuva, 0.0))
+        risco_ml = classificar_risco_vetorizado(chuva).astype(np.int8)
+        intensidade = np.searchsorted(LIMITES_INTENSIDADE, chuva, side='right').astype(np.int8)
+        yield risco_ml, intensidade
+
+
+class MotorEscalar:
+    """Mesma histerese do MotorAlertas, estação por estação com determinar_risco_final do simulador."""
+
+    def __init__(self, n_estacoes, ciclos_resfriamento, permanencia_minima):
+        self.estado = [[0, 10 ** 9, 0] for _ in range(n_estacoes)]
+        self.ciclos_resfriamento = ciclos_resfriamento
+        self.permanencia_minima = permanencia_minima
+
+    def processar_ciclo(self, riscos, intensidades):
+        transicoes = []
+        for i, (risco_ml, intensidade) in enumerate(zip(riscos, intensidades)):
+            estado = self.estado[i]
+            estado[1] += 1
+            alvo = simulador.determinar_risco_final(risco_ml, intensidade, None)
+            if alvo > estado[0]:
+                transicoes.append((i, estado[0], alvo))
+                estado[0], estado[1], estado[2] = alvo, 0, 0
+            elif alvo < estado[0]:
+                estado[2] += 1
+                if estado[2] >= self.ciclos_resfriamento and estado[1] >= self.permanencia_minima:
+                    transicoes.append((i, estado[0], alvo))
+                    estado[0], estado[2] = alvo, 0
+            else:
+                estado[2] = 0
+        return transicoes
+
+
+def imprimir_tempos(descricao, tempos):
+    tempos_ms = np.array(tempos) * 1000
+    print(f"  {descricao:<44} p50 {np.percentile(tempos_ms, 50):7.2f} ms | p99 {np.percentile(tempos_ms, 99):7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motor de alertas vetorizado com histerese versus laço por estação.")
+    parser.add_argument('--estacoes', type=int, default=100_000)
+    parser.add_argument('--municipios', type=int, default=645)
+    parser.add_argument('--ciclos', type=int, default=48)
+    parser.add_argument('--amostra-laco', type=int, default=5_000, help="Estações avaliadas pelo laço (o tempo é extrapolado).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    cod_estacoes = np.char.add('35', np.char.zfill(np.arange(args.estacoes).astype(str), 8))
+    municipios = [f"Municipio {m}" for m in rng.integers(0, args.municipios, args.estacoes)]
+    ciclos = list(gerar_ciclos(args.estacoes, args.ciclos, rng))
+    print(f"{args.estacoes:,} estações, {args.municipios} municípios, {args.ciclos} ciclos\n")
+
+    motor = MotorAlertas(cod_estacoes, municipios)
+    tempos_ciclo, tempos_resumo, n_transicoes, n_sem_histerese, n_alertas_antigos = [], [], [], [], []
+    transicoes_amostra = []
+    nivel_sem_histerese = np.zeros(args.estacoes, dtype=np.int8)
+    for risco_ml, intensidade in ciclos:
+        inicio = time.perf_counter()
+        transicoes = motor.processar_ciclo(risco_ml, intensidade)
+        tempos_ciclo.append(time.perf_counter() - inicio)
+        inicio = time.perf_counter()
+        motor.resumir_por_municipio(transicoes)
+        tempos_resumo.append(time.perf_counter() - inicio)
+
+        n_transicoes.append(len(transicoes))
+        alvo = determinar_risco_final_lote(risco_ml, intensidade)
+        n_sem_histerese.append(int((alvo != nivel_sem_histerese).sum()))
+        n_alertas_antigos.append(int((alvo > 0).sum()))
+        nivel_sem_histerese = alvo
+        na_amostra = transicoes.estacoes < args.amostra_laco
+        transicoes_amostra.append(set(zip(transicoes.estacoes[na_amostra].tolist(),
+                                          transicoes.nivel_anterior[na_amostra].tolist(),
+                                          transicoes.nivel_novo[na_amostra].tolist())))
+
+    print("Tempo por ciclo (vetorizado):")
+    imprimir_tempos("processar_ciclo (códigos de intensidade)", tempos_ciclo)
+    imprimir_tempos("resumir_por_municipio", tempos_resumo)
+    nomes = np.array(INTENSIDADES)[ciclos[0][1]]
+    inicio = time.perf_counter()
+    MotorAlertas(cod_estacoes).processar_ciclo(ciclos[0][0], nomes)
+    print(f"  {'processar_ciclo (nomes de intensidade)':<44} {(time.perf_counter() - inicio) * 1000:7.2f} ms")
+
+    print(f"\nAlertas emitidos por ciclo (média):")
+    print(f"  antes (todo ciclo com risco > 0):            {np.mean(n_alertas_antigos):10,.0f}")
+    print(f"  mudanças de nível sem histerese:             {np.mean(n_sem_histerese):10,.0f}")
+    print(f"  transições com histerese:                    {np.mean(n_transicoes):10,.0f}")
+
+    amostra = args.amostra_laco
+    escalar = MotorEscalar(amostra, motor.ciclos_resfriamento, motor.permanencia_minima)
+    iguais = True
+    inicio = time.perf_counter()
+    for (risco_ml, intensidade), esperadas in zip(ciclos, transicoes_amostra):
+        transicoes = escalar.processar_ciclo(risco_ml[:amostra].tolist(), np.array(INTENSIDADES)[intensidade[:amostra]].tolist())
+        iguais &= set(transicoes) == esperadas
+    tempo_laco = (time.perf_counter() - inicio) / args.ciclos * args.estacoes / amostra
+    tempo_vetorizado = float(np.median(tempos_ciclo))
+    print(f"\nLaço por estação com determinar_risco_final (extrapolado de {amostra:,} estações): "
+          f"{tempo_laco * 1000:.0f} ms/ciclo -> {tempo_laco / tempo_vetorizado:.0f}x mais lento; transições idênticas: {iguais}")
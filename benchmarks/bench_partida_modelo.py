@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+DIRETORIO_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, DIRETORIO_SRC)
+
+from cache_modelos import treinar_com_cache
+from floresta_compacta import caminho_floresta_compacta, exportar_floresta_compacta
+from rotulagem_risco import classificar_risco_vetorizado
+
+NOME_MODELO = 'cemaden_flood_risk_model_pipeline.joblib'
+
+# Cada medição roda em um processo novo: o tempo inclui importações e carga do modelo, como na partida
+# real do simulador. O processo imprime um JSON com os tempos internos e, se pedido, espera uma linha
+# no stdin antes de sair (para medir a memória de vários processos vivos ao mesmo tempo)
+CODIGO_ANTES = """
+import json, sys, time
+inicio = time.perf_counter()
+import joblib, numpy, pandas, sklearn
+sys.path.insert(0, {src!r})
+from inferencia_lote import obter_preditor
+importado = time.perf_counter()
+modelo = joblib.load({modelo!r})
+carregado = time.perf_counter()
+obter_preditor(modelo).prever(['SP001'], [50.0])
+"""
+
+CODIGO_DEPOIS = """
+import importlib, json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {src!r})
+simulador = importlib.import_module('3_run_simulation_with_local_sensor')
+importado = time.perf_counter()
+modelo = simulador.carregar_modelo({modelo!r})
+carregado = time.perf_counter()
+simulador.prever_risco_ml(modelo, 50.0, 'SP001')
+"""
+
+CODIGO_FIM = """
+predito = time.perf_counter()
+print(json.dumps({{'importacao': importado - inicio, 'carga': carregado - importado, 'predicao': predito - carregado,
+                  'modulos_pesados': sorted(m for m in ('pandas', 'sklearn', 'joblib') if m in sys.modules)}}), flush=True)
+if {esperar!r}:
+    sys.stdin.readline()
+"""
+
+
+def construir_pipeline(n_estimators):
+    # Mesmo pipeline de 2_train_model.py
+    return Pipeline(steps=[
+        ('preprocessor', ColumnTransformer(
+            transformers=[('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False), ['cod_estacao'])],
+            remainder='passthrough')),
+        ('classifier', RandomForestClassifier(random_state=42, n_estimators=n_estimators))
+    ])
+
+
+def gerar_dados(n_estacoes, linhas, rng):
+    estacoes = np.array([f"35{i:06d}A" for i in range(n_estacoes)])
+    chuva = np.where(rng.random(linhas) < 0.8, 0.0, rng.gamma(0.7, 6.0, linhas))
+    X = pd.DataFrame({'acumulado_chuva_1_h_mm': chuva, 'cod_estacao': rng.choice(estacoes, linhas)})
+    return X, classificar_risco_vetorizado(chuva)
+
+
+def descartar_do_cache_de_paginas(caminhos):
+    # Melhor esforço: pede ao kernel para descartar as páginas dos arquivos (partida a frio).
+    # Retorna False onde não há posix_fadvise
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for caminho in caminhos:
+        if os.path.exists(caminho):
+            fd = os.open(caminho, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def codigo_partida(modelo_antes, modelo_depois, depois, esperar=False):
+    if depois:
+        codigo = CODIGO_DEPOIS.format(src=DIRETORIO_SRC, modelo=modelo_depois)
+    else:
+        codigo = CODIGO_ANTES.format(src=DIRETORIO_SRC, modelo=modelo_antes)
+    return codigo + CODIGO_FIM.format(esperar=esperar)
+
+
+def medir_partida(codigo, arquivos, frio):
+    if frio:
+        descartar_do_cache_de_paginas(arquivos)
+    inicio = time.perf_counter()
+    saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True).stdout
+    tempos = json.loads(saida.strip().splitlines()[-1])
+    tempos['total'] = time.perf_counter() - inicio
+    return tempos
+
+
+def memoria_processo(pid):
+    # PSS (memória proporcional, páginas compartilhadas divididas entre os processos) e USS (só privadas), em MB
+    campos = {}
+    with open(f"/proc/{pid}/smaps_rollup") as arquivo:
+        for linha in arquivo:
+            partes = linha.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                campos[partes[0].rstrip(':')] = int(partes[1]) / 1024
+    return campos.get('Pss', 0.0), campos.get('Private_Clean', 0.0) + campos.get('Private_Dirty', 0.0)
+
+
+def medir_memoria_processos(codigo, n_processos):
+    # Sobe n processos que carregam o modelo e ficam vivos; mede a memória com todos ao mesmo tempo
+    processos = [subprocess.Popen([sys.executable, '-c', codigo], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                 for _ in range(n_processos)]
+    try:
+        for processo in processos:
+            processo.stdout.readline()
+        memorias = [memoria_processo(processo.pid) for processo in processos]
+    finally:
+        for processo in processos:
+            processo.communicate('\n')
+    return sum(pss for pss, _ in memorias), float(np.mean([uss for _, uss in memorias]))
+
+
+def imprimir_partida(descricao, medicoes):
+    mediana = {campo: float(np.median([m[campo] for m in medicoes])) for campo in ('total', 'importacao', 'carga', 'predicao')}
+    print(f"  {descricao:<8} total {mediana['total'] * 1000:7.0f} ms | importações {mediana['importacao'] * 1000:6.0f} ms | "
+          f"carga {mediana['carga'] * 1000:6.0f} ms | 1ª predição {mediana['predicao'] * 1000:5.1f} ms | "
+          f"módulos: {', '.join(medicoes[0]['modulos_pesados']) or 'só numpy'}")
+    return mediana['total']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partida do simulador (importações + carga do modelo) e treino com cache de artefatos.")
+    parser.add_argument('--estacoes', type=int, default=500, help="Estações do modelo sintético.")
+    parser.add_argument('--linhas', type=int, default=100_000, help="Linhas de treino do modelo sintético.")
+    parser.add_argument('--arvores', type=int, default=100)
+    parser.add_argument('--repeticoes', type=int, default=5, help="Partidas por cenário (mediana).")
+    parser.add_argument('--processos', type=int, default=4, help="Processos simultâneos na medição de memória.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    X, y = gerar_dados(args.estacoes, args.linhas, rng)
+    with tempfile.TemporaryDirectory() as diretorio:
+        diretorio_cache = os.path.join(diretorio, 'cache')
+        print(f"Treino com cache de artefatos ({args.linhas:,} linhas, {args.estacoes} estações, {args.arvores} árvores):")
+        tempos_treino = []
+        for rodada in ('frio (treina)', 'quente (cache)'):
+            inicio = time.perf_counter()
+            modelo, veio_do_cache, chave = treinar_com_cache(construir_pipeline(args.arvores), X, y, diretorio_cache)
+            tempos_treino.append(time.perf_counter() - inicio)
+            print(f"  {rodada:<15} {tempos_treino[-1]:7.2f} s (do cache: {veio_do_cache}, chave {chave[:12]})")
+        print(f"  -> {tempos_treino[0] / tempos_treino[1]:.0f}x mais rápido com o artefato em cache\n")
+
+        # "Antes": pipeline joblib completo (como o treino salva) e importações antecipadas.
+        # "Depois": floresta compacta mapeada do arquivo e importações adiadas do simulador
+        import joblib
+        modelo_antes = os.path.join(diretorio, 'antes', NOME_MODELO)
+        modelo_depois = os.path.join(diretorio, 'depois', NOME_MODELO)
+        os.makedirs(os.path.dirname(modelo_antes))
+        os.makedirs(os.path.dirname(modelo_depois))
+        joblib.dump(modelo, modelo_antes)
+        joblib.dump(modelo, modelo_depois)
+        exportar_floresta_compacta(modelo, caminho_floresta_compacta(modelo_depois))
+        arquivos = [modelo_antes, modelo_depois, caminho_floresta_compacta(modelo_depois)]
+        print(f"Arquivos: pipeline joblib {os.path.getsize(modelo_antes) / 1e6:.1f} MB, "
+              f"floresta compacta {os.path.getsize(arquivos[2]) / 1e6:.1f} MB")
+        if not descartar_do_cache_de_paginas(arquivos):
+            print("Aviso: posix_fadvise indisponível; as partidas 'a frio' usam o cache de páginas do sistema.")
+
+        for frio in (True, False):
+            print(f"\nPartida {'a frio (arquivos fora do cache de páginas)' if frio else 'a quente'}, mediana de {args.repeticoes}:")
+            totais = []
+            for depois in (False, True):
+                codigo = codigo_partida(modelo_antes, modelo_depois, depois)
+                medicoes = [medir_partida(codigo, arquivos, frio) for _ in range(args.repeticoes)]
+                totais.append(imprimir_partida('depois' if depois else 'antes', medicoes))
+            print(f"  -> {totais[0] / totais[1]:.1f}x mais rápido")
+
+        if os.path.exists('/proc/self/smaps_rollup'):
+            print(f"\nMemória com {args.processos} processos simultâneos:")
+            for depois in (False, True):
+                pss_total, uss_medio = medir_memoria_processos(codigo_partida(modelo_antes, modelo_depois, depois, True),
+                                                               args.processos)
+                print(f"  {'depois' if depois else 'antes':<8} PSS somado {pss_total:7.1f} MB | privada por processo {uss_medio:6.1f} MB")
@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from floresta_compacta import carregar_floresta_compacta, exportar_floresta_compacta
+from perfilador_etapas import PerfiladorEtapas
+from rotulagem_risco import classificar_risco_vetorizado
+
+
+def medir_etapas_vazias(perfilador, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        with perfilador.etapa('vazia', linhas=1):
+            pass
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def medir_predicoes(perfilador, floresta, chuva, estacoes):
+    # Mesmo laço do simulador: uma leitura por vez, cada predição dentro de uma etapa
+    inicio = time.perf_counter()
+    for mm_h, cod in zip(chuva, estacoes):
+        with perfilador.etapa('predicao_ml', linhas=1):
+            floresta.prever([cod], [mm_h])
+    return (time.perf_counter() - inicio) / len(chuva)
+
+
+def treinar_floresta(n_estacoes, linhas, rng, diretorio):
+    codigos = np.array([f"35{i:06d}A" for i in range(n_estacoes)])
+    chuva = np.where(rng.random(linhas) < 0.8, 0.0, rng.gamma(0.7, 6.0, linhas))
+    X = pd.DataFrame({'acumulado_chuva_1_h_mm': chuva, 'cod_estacao': rng.choice(codigos, linhas)})
+    modelo = Pipeline(steps=[
+        ('preprocessor', ColumnTransformer(
+            transformers=[('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False), ['cod_estacao'])],
+            remainder='passthrough')),
+        ('classifier', RandomForestClassifier(random_state=42, n_estimators=100))
+    ]).fit(X, classificar_risco_vetorizado(chuva))
+    caminho = os.path.join(diretorio, 'modelo_compacto.npz')
+    exportar_floresta_compacta(modelo, caminho)
+    return carregar_floresta_compacta(caminho), codigos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Custo da instrumentação por etapa, desligada e ligada.")
+    parser.add_argument('--repeticoes', type=int, default=200_000, help="Etapas vazias medidas.")
+    parser.add_argument('--predicoes', type=int, default=5_000, help="Predições de uma leitura no laço do simulador.")
+    args = parser.parse_args()
+
+    desligado = PerfiladorEtapas('bench', ativo=False)
+    ligado = PerfiladorEtapas('bench', diretorio=tempfile.gettempdir()).iniciar()
+    print("Custo por etapa vazia:")
+    for descricao, perfilador in (('desligado', desligado), ('ligado', ligado)):
+        print(f"  {descricao:<10} {medir_etapas_vazias(perfilador, args.repeticoes) * 1e9:8.0f} ns")
+
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as diretorio:
+        floresta, codigos = treinar_floresta(200, 20_000, rng, diretorio)
+        chuva = rng.gamma(0.7, 6.0, args.predicoes)
+        estacoes = rng.choice(codigos, args.predicoes)
+        medir_predicoes(desligado, floresta, chuva[:100], estacoes[:100])  # aquecimento
+        sem_etapa = medir_predicoes(desligado, floresta, chuva, estacoes)
+        com_etapa = medir_predicoes(ligado, floresta, chuva, estacoes)
+    print(f"\nPredição de uma leitura (floresta compacta, {args.predicoes:,} leituras):")
+    print(f"  instrumentação desligada {sem_etapa * 1e6:8.1f} us/leitura")
+    print(f"  instrumentação ligada    {com_etapa * 1e6:8.1f} us/leitura ({(com_etapa / sem_etapa - 1) * 100:+.1f}%)")
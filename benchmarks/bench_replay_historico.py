@@ -0,0 +1,116 @@
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from gerador_dados_cemaden import gerar_arquivos_cemaden
+from juncao_eventos import carregar_eventos
+from motor_alertas import INTENSIDADES
+from replay_historico import ReplayHistorico, avaliar_alertas, carregar_leituras_10min, episodios_de_alerta
+from rotulagem_risco import classificar_risco_vetorizado
+
+simulador = importlib.import_module('3_run_simulation_with_local_sensor')
+
+
+def gerar_eventos(caminho, leituras, estacoes, n_eventos, rng):
+    # Eventos nas horas de chuva mais forte, um pouco depois do pico, perto da estação
+    horaria = (leituras.assign(hora=leituras['datahora_utc'].dt.floor('h'))
+               .groupby(['cod_estacao', 'hora'])['chuva_10min_mm'].sum().sort_values(ascending=False))
+    picos = horaria.index[:n_eventos * 50:50]
+    coordenadas = estacoes.set_index('cod_estacao').loc[picos.get_level_values(0), ['latitude', 'longitude']]
+    local = (picos.get_level_values(1) - pd.Timedelta(hours=3)
+             + pd.to_timedelta(rng.integers(0, 4, len(picos)), unit='h'))
+    pd.DataFrame({
+        'Data': local.strftime('%d/%m/%Y'), 'Horario': local.strftime('~%Hh%M'),
+        'Bairro_Localizacao': [f"Local {i}" for i in range(len(picos))],
+        'Latitude': (coordenadas['latitude'].to_numpy() + rng.normal(0, 0.02, len(picos))).round(4),
+        'Longitude': (coordenadas['longitude'].to_numpy() + rng.normal(0, 0.02, len(picos))).round(4),
+        'Vitimas_Desc': '0', 'Desabrigados_Desc': '0', 'Fontes': 'sintético',
+    }).to_csv(caminho, index=False)
+
+
+def treinar_modelo(leituras, n_linhas, rng):
+    horaria = (leituras.assign(datahora_utc_hora=leituras['datahora_utc'].dt.floor('h'))
+               .groupby(['cod_estacao', 'datahora_utc_hora'], as_index=False)['chuva_10min_mm'].sum()
+               .rename(columns={'chuva_10min_mm': 'acumulado_chuva_1_h_mm'}))
+    amostra = horaria.iloc[rng.choice(len(horaria), min(n_linhas, len(horaria)), replace=False)]
+    X = amostra[['acumulado_chuva_1_h_mm', 'cod_estacao']]
+    return Pipeline(steps=[
+        ('preprocessor', ColumnTransformer(
+            transformers=[('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False), ['cod_estacao'])],
+            remainder='passthrough')),
+        ('classifier', RandomForestClassifier(random_state=42, n_estimators=100, min_samples_leaf=5))
+    ]).fit(X, classificar_risco_vetorizado(X['acumulado_chuva_1_h_mm'].to_numpy()))
+
+
+def medir_laco_simulador(replay, modelo, amostra, rng):
+    # Caminho do simulador leitura a leitura: prever_risco_ml + determinar_risco_final
+    celulas = rng.choice(len(replay.estacao), amostra, replace=False)
+    cod = replay.cod_estacoes[replay.estacao[celulas]].tolist()
+    chuva = replay.chuva_1h[celulas].tolist()
+    intensidades = np.array(INTENSIDADES)[replay.intensidade[celulas]].tolist()
+    inicio = time.perf_counter()
+    for c, mm, intensidade in zip(cod, chuva, intensidades):
+        simulador.determinar_risco_final(simulador.prever_risco_ml(modelo, mm, c), intensidade, mm)
+    return (time.perf_counter() - inicio) / amostra
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay de um mês da rede estadual pelo caminho de alerta do simulador.")
+    parser.add_argument('--estacoes', type=int, default=800)
+    parser.add_argument('--mes', default='2025-01', help="Mês sintético reproduzido (AAAA-MM).")
+    parser.add_argument('--eventos', type=int, default=30)
+    parser.add_argument('--linhas-treino', type=int, default=100_000)
+    parser.add_argument('--amostra-laco', type=int, default=2_000, help="Leituras pontuadas pelo laço do simulador (extrapolado).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_csv, = gerar_arquivos_cemaden(diretorio, args.estacoes, 1, inicio=args.mes)
+        caminho_eventos = os.path.join(diretorio, 'eventos.csv')
+        print(f"Mês sintético: {args.estacoes} estações, CSV de {os.path.getsize(caminho_csv) / 1e6:.0f} MB")
+
+        tempos = {}
+        inicio = time.perf_counter()
+        leituras, estacoes = carregar_leituras_10min([caminho_csv])
+        tempos['leitura do CSV (10 min)'] = time.perf_counter() - inicio
+        gerar_eventos(caminho_eventos, leituras, estacoes, args.eventos, rng)
+        modelo = treinar_modelo(leituras, args.linhas_treino, rng)
+
+        inicio = time.perf_counter()
+        replay = ReplayHistorico(leituras, estacoes, modelo)
+        tempos['grade, features e predição em lote'] = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        linha_do_tempo = replay.executar()
+        tempos['laço por passo (MotorAlertas)'] = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        fim_replay = replay.datahora_do_passo(replay.n_passos)
+        avaliados, episodios, resumo = avaliar_alertas(episodios_de_alerta(linha_do_tempo, fim_replay), estacoes,
+                                                       carregar_eventos(caminho_eventos), replay.inicio, fim_replay)
+        tempos['episódios e avaliação dos eventos'] = time.perf_counter() - inicio
+
+    print(f"{len(leituras):,} leituras, {replay.n_passos:,} passos, {len(replay.estacao):,} avaliações, "
+          f"{len(linha_do_tempo):,} transições\n")
+    for descricao, segundos in tempos.items():
+        print(f"  {descricao:<38} {segundos:7.2f} s")
+    total = sum(tempos.values())
+    print(f"  {'total':<38} {total:7.2f} s")
+
+    por_leitura = medir_laco_simulador(replay, modelo, args.amostra_laco, rng)
+    print(f"\nLaço do simulador (prever_risco_ml + determinar_risco_final por leitura, {args.amostra_laco:,} amostras): "
+          f"{por_leitura * 1e6:.0f} us/leitura -> {por_leitura * len(replay.estacao) / 60:.0f} min para o mês "
+          f"({por_leitura * len(replay.estacao) / total:.0f}x mais lento)")
+    print("\nEstatísticas contra os eventos sintéticos:")
+    for chave, valor in resumo.items():
+        print(f"  {chave}: {valor if not isinstance(valor, float) else round(valor, 3)}")
@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from codificacao_estacao import construir_preprocessador
+from retreino_incremental import adicionar_arvores
+from rotulagem_risco import classificar_risco_vetorizado
+
+
+def gerar_lote(estacoes_ativas, fator_estacao, linhas, rng):
+    # Leituras horárias de um período; só as primeiras estacoes_ativas estações já existem
+    estacao = rng.integers(0, estacoes_ativas, linhas)
+    chuva = np.where(rng.random(linhas) < 0.7, 0.0, rng.gamma(0.8, 8.0, linhas)).round(2)
+    return pd.DataFrame({
+        'acumulado_chuva_1_h_mm': chuva,
+        'cod_estacao': np.char.add('35', np.char.zfill(estacao.astype(str), 8)),
+        'nivel_risco': classificar_risco_vetorizado(chuva * fator_estacao[estacao]).astype('int64'),
+    })
+
+
+def treinar_completo(df, arvores):
+    pipeline = Pipeline(steps=[
+        ('preprocessor', construir_preprocessador('onehot')),
+        ('classifier', RandomForestClassifier(random_state=42, n_estimators=arvores))
+    ])
+    pipeline.fit(df[['acumulado_chuva_1_h_mm', 'cod_estacao']], df['nivel_risco'])
+    return pipeline
+
+
+def acuracia(pipeline, df):
+    return (pipeline.predict(df[['acumulado_chuva_1_h_mm', 'cod_estacao']]) == df['nivel_risco'].to_numpy()).mean()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo de re-treino incremental (warm_start) versus re-treino completo.")
+    parser.add_argument('--historico', type=int, default=100_000, help="Linhas do treino inicial.")
+    parser.add_argument('--linhas-lote', type=int, default=20_000, help="Linhas novas por re-treino.")
+    parser.add_argument('--lotes', type=int, default=5)
+    parser.add_argument('--estacoes', type=int, default=200, help="Estações no treino inicial.")
+    parser.add_argument('--estacoes-novas-por-lote', type=int, default=10)
+    parser.add_argument('--arvores', type=int, default=100, help="Árvores do treino completo.")
+    parser.add_argument('--arvores-retreino', type=int, default=20)
+    parser.add_argument('--arvores-max', type=int, default=None, help="Limite da floresta incremental (descarta as mais antigas).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    total_estacoes = args.estacoes + args.lotes * args.estacoes_novas_por_lote
+    fator_estacao = rng.uniform(0.6, 1.6, total_estacoes)
+
+    historico = gerar_lote(args.estacoes, fator_estacao, args.historico, rng)
+    inicio = time.perf_counter()
+    modelo_incremental = treinar_completo(historico, args.arvores)
+    print(f"Treino inicial: {len(historico):,} linhas em {time.perf_counter() - inicio:.2f} s\n")
+
+    print(f"{'lote':>4} {'linhas acumuladas':>18} {'completo (s)':>13} {'incremental (s)':>16} {'árvores':>8} "
+          f"{'estações novas':>15} {'acur. completo':>15} {'acur. incremental':>18}")
+    for lote in range(1, args.lotes + 1):
+        estacoes_ativas = args.estacoes + lote * args.estacoes_novas_por_lote
+        novos = gerar_lote(estacoes_ativas, fator_estacao, args.linhas_lote, rng)
+        # Avaliação no período seguinte, ainda não visto por nenhum dos modelos
+        teste = gerar_lote(estacoes_ativas, fator_estacao, args.linhas_lote // 4, rng)
+        historico = pd.concat([historico, novos], ignore_index=True)
+
+        inicio = time.perf_counter()
+        modelo_completo = treinar_completo(historico, args.arvores)
+        tempo_completo = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        desconhecidas = adicionar_arvores(modelo_incremental, novos[['acumulado_chuva_1_h_mm', 'cod_estacao']],
+                                          novos['nivel_risco'], args.arvores_retreino, args.arvores_max)
+        tempo_incremental = time.perf_counter() - inicio
+        n_arvores = len(modelo_incremental.named_steps['classifier'].estimators_)
+
+        print(f"{lote:>4} {len(historico):>18,} {tempo_completo:>13.2f} {tempo_incremental:>16.2f} {n_arvores:>8} "
+              f"{desconhecidas:>15} {acuracia(modelo_completo, teste):>15.4f} {acuracia(modelo_incremental, teste):>18.4f}")
@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import collections
+import importlib.util
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+DIRETORIO_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, DIRETORIO_SRC)
+
+from gateway_ingestao import (CAMINHO_MODELO_PADRAO, ESPERA_MAX_MS_PADRAO, HOST_PADRAO, PORTA_PADRAO,
+                              TAMANHO_FILA_PADRAO, TAMANHO_MAX_LOTE_PADRAO, GatewayIngestao)
+
+# simular_evento_chuva vem do próprio simulador (o nome do arquivo começa com dígito)
+_spec = importlib.util.spec_from_file_location('simulador', os.path.join(DIRETORIO_SRC, '3_run_simulation_with_local_sensor.py'))
+simulador = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(simulador)
+
+
+class ConexaoSensores:
+    """Uma conexão TCP compartilhada por vários sensores; as respostas chegam na ordem dos envios."""
+
+    def __init__(self, leitor, escritor):
+        self.leitor, self.escritor = leitor, escritor
+        self.pendentes = collections.deque()
+        self._tarefa_leitura = asyncio.create_task(self._ler_respostas())
+
+    async def enviar(self, leitura):
+        futuro = asyncio.get_running_loop().create_future()
+        self.pendentes.append(futuro)
+        self.escritor.write((json.dumps(leitura) + '\n').encode())
+        # drain() espera quando o gateway deixa de ler o socket (backpressure)
+        await self.escritor.drain()
+        return await futuro
+
+    async def _ler_respostas(self):
+        while linha := await self.leitor.readline():
+            self.pendentes.popleft().set_result(json.loads(linha))
+
+    async def fechar(self):
+        self.escritor.close()
+        await self.escritor.wait_closed()
+        self._tarefa_leitura.cancel()
+
+
+async def sensor(indice, conexao, fim, intervalo, latencias, erros):
+    # Cada sensor envia uma leitura, espera o alerta e repete (após o intervalo, se houver)
+    cod_estacao = f"SP{indice:05d}"
+    while time.perf_counter() < fim:
+        intensidade, mm_h = simulador.simular_evento_chuva()
+        inicio = time.perf_counter()
+        resposta = await conexao.enviar({'cod_estacao': cod_estacao, 'acumulado_chuva_1_h_mm': mm_h,
+                                         'intensidade': intensidade})
+        latencias.append(time.perf_counter() - inicio)
+        if 'erro' in resposta:
+            erros.append(resposta['erro'])
+        if intervalo:
+            await asyncio.sleep(intervalo)
+
+
+# Leituras malformadas: cada uma deve receber {'erro': ...} sem afetar as leituras válidas vizinhas
+LEITURAS_INVALIDAS = [
+    {'cod_estacao': 'SP99999', 'acumulado_chuva_1_h_mm': float('nan'), 'intensidade': 'Leve'},
+    {'cod_estacao': 'SP99999', 'acumulado_chuva_1_h_mm': float('inf'), 'intensidade': 'Leve'},
+    {'cod_estacao': 'SP99999', 'acumulado_chuva_1_h_mm': -3.0, 'intensidade': 'Leve'},
+    {'cod_estacao': 'SP99999', 'acumulado_chuva_1_h_mm': 'muita', 'intensidade': 'Leve'},
+    {'cod_estacao': 'SP99999', 'acumulado_chuva_1_h_mm': 2.0, 'intensidade': 7},
+    {'cod_estacao': 'SP99999', 'acumulado_chuva_1_h_mm': 2.0, 'intensidade': 'Nenhuma'},
+    {'acumulado_chuva_1_h_mm': 2.0},
+]
+
+
+async def verificar_leituras_invalidas(conexao):
+    # Intercala leituras válidas e malformadas na mesma conexão e confere as respostas
+    valida = {'cod_estacao': 'SP99999', 'acumulado_chuva_1_h_mm': 2.0, 'intensidade': 'Leve'}
+    falhas = []
+    for leitura in LEITURAS_INVALIDAS:
+        respostas = await asyncio.gather(conexao.enviar(valida), conexao.enviar(leitura), conexao.enviar(valida))
+        if 'erro' not in respostas[1]:
+            falhas.append(f"{json.dumps(leitura)} respondida com {respostas[1]}")
+        if any('erro' in resposta for resposta in (respostas[0], respostas[2])):
+            falhas.append(f"leitura válida vizinha de {json.dumps(leitura)} recusada")
+    return falhas
+
+
+async def executar_carga(args):
+    gateway = None
+    host, porta = args.host, args.porta
+    if args.embutido:
+        # Gateway no mesmo processo, em uma porta livre
+        gateway = GatewayIngestao(joblib.load(args.modelo), args.tamanho_fila, args.tamanho_lote, args.espera_ms)
+        porta = await gateway.iniciar(host, 0)
+
+    n_conexoes = min(args.conexoes, args.sensores)
+    conexoes = [ConexaoSensores(*await asyncio.open_connection(host, porta)) for _ in range(n_conexoes)]
+    latencias, erros = [], []
+    inicio = time.perf_counter()
+    fim = inicio + args.duracao
+    await asyncio.gather(*(sensor(i, conexoes[i % n_conexoes], fim, args.intervalo, latencias, erros)
+                           for i in range(args.sensores)))
+    duracao = time.perf_counter() - inicio
+    falhas_validacao = await verificar_leituras_invalidas(conexoes[0])
+    for conexao in conexoes:
+        await conexao.fechar()
+
+    latencias_ms = np.array(latencias) * 1e3
+    p50, p95, p99 = np.percentile(latencias_ms, [50, 95, 99])
+    print(f"{args.sensores} sensores em {n_conexoes} conexões por {duracao:.1f} s")
+    print(f"Leituras respondidas: {len(latencias):,} ({len(latencias) / duracao:,.0f} leituras/s sustentadas), erros: {len(erros)}")
+    print(f"Leituras malformadas ({len(LEITURAS_INVALIDAS)} casos): "
+          f"{'todas recusadas individualmente' if not falhas_validacao else 'FALHAS'}")
+    for falha in falhas_validacao:
+        print(f"  {falha}")
+    print(f"Latência ponta a ponta até o alerta: p50 {p50:.1f} ms | p95 {p95:.1f} ms | p99 {p99:.1f} ms | máx {latencias_ms.max():.1f} ms")
+    if gateway is not None:
+        e = gateway.estatisticas()
+        print(f"Gateway: {e['lotes']:,} lotes ({e['leituras_por_lote']:.1f} leituras/lote), latência interna p50 "
+              f"{e['latencia_interna_p50_ms']:.1f} ms p99 {e['latencia_interna_p99_ms']:.1f} ms, "
+              f"alertas por nível {e['alertas_por_nivel']}")
+        await gateway.encerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerador de carga: N sensores simulados enviando leituras ao gateway de ingestão.")
+    parser.add_argument('--sensores', type=int, default=2000)
+    parser.add_argument('--conexoes', type=int, default=100, help="Conexões TCP compartilhadas pelos sensores.")
+    parser.add_argument('--duracao', type=float, default=20.0, help="Duração do teste em segundos.")
+    parser.add_argument('--intervalo', type=float, default=0.0, help="Pausa de cada sensor entre leituras (0 = o mais rápido possível).")
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--embutido', action='store_true', help="Sobe o gateway no próprio processo em vez de usar um já em execução.")
+    parser.add_argument('--modelo', default=CAMINHO_MODELO_PADRAO, help="Modelo do gateway embutido.")
+    parser.add_argument('--tamanho-fila', type=int, default=TAMANHO_FILA_PADRAO)
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_MAX_LOTE_PADRAO)
+    parser.add_argument('--espera-ms', type=float, default=ESPERA_MAX_MS_PADRAO)
+    args = parser.parse_args()
+    asyncio.run(executar_carga(args))
@@ -0,0 +1,157 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Nomes esperados por 1_process_official_data.py para janeiro a maio de 2025; demais meses
+# seguem o mesmo padrão (cemaden_sp_<mês>_<aa>.csv)
+NOMES_MESES = ['jan', 'fev', 'marco', 'abril', 'maio', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+COLUNAS_CEMADEN = ['municipio', 'codEstacao', 'uf', 'nomeEstacao', 'latitude', 'longitude', 'datahora', 'valorMedida']
+
+# Extensão aproximada do estado de São Paulo
+LATITUDES_SP = (-25.3, -19.8)
+LONGITUDES_SP = (-53.1, -44.2)
+KM_POR_GRAU = 111.0
+
+# Resolução dos pluviômetros de báscula do CEMADEN
+RESOLUCAO_MM = 0.2
+# Tempestades por dia no estado, por mês (verão chuvoso, inverno seco)
+TEMPESTADES_POR_DIA = [70, 60, 50, 30, 18, 10, 8, 8, 15, 28, 40, 60]
+# Pico de intensidade de uma célula (mm/h); a cauda pesada é limitada aos extremos observados
+PICO_MAXIMO_MM_H = 120.0
+ESTACOES_POR_MUNICIPIO = 3
+
+
+def nome_arquivo_mensal(mes):
+    """Nome do CSV mensal de um pd.Period mensal, no padrão dos arquivos do CEMADEN usados no projeto."""
+    uf = 'SP' if (mes.year, mes.month) == (2025, 1) else 'sp'
+    return f"cemaden_{uf}_{NOMES_MESES[mes.month - 1]}_{mes.year % 100:02d}.csv"
+
+
+def gerar_cadastro_estacoes(n_estacoes, rng):
+    """Estações com código no formato do CEMADEN (IBGE do município + sequencial + 'A'), município e coordenadas."""
+    n_municipios = max(1, -(-n_estacoes // ESTACOES_POR_MUNICIPIO))
+    municipio = rng.integers(0, n_municipios, n_estacoes)
+    municipio[:n_municipios] = np.arange(min(n_municipios, n_estacoes))
+    ibge = 3500000 + np.sort(rng.choice(99_999, n_municipios, replace=False)).astype('int64')
+    sequencial = pd.Series(municipio).groupby(municipio).cumcount().to_numpy() + 1
+    # Estações de um município ficam a poucos km do seu centro
+    centro_lat = rng.uniform(*LATITUDES_SP, n_municipios)
+    centro_lon = rng.uniform(*LONGITUDES_SP, n_municipios)
+    cadastro = pd.DataFrame({
+        'municipio': [f"MUNICÍPIO {m + 1:04d}" for m in municipio],
+        'codEstacao': [f"{ibge[m]}{s:02d}A" for m, s in zip(municipio, sequencial)],
+        'uf': 'SP',
+        'nomeEstacao': [f"Estação {s:02d} - MUNICÍPIO {m + 1:04d}" for m, s in zip(municipio, sequencial)],
+        'latitude': np.round(centro_lat[municipio] + rng.normal(0, 0.04, n_estacoes), 5),
+        'longitude': np.round(centro_lon[municipio] + rng.normal(0, 0.04, n_estacoes), 5),
+    })
+    return cadastro.sort_values('codEstacao', ignore_index=True)
+
+
+def _gerar_tempestades(inicio_dia, minutos_dia, mes, rng):
+    # Células convectivas: centro, raio, início (preferência pelo fim da tarde em Brasília),
+    # duração e pico de intensidade com cauda pesada
+    n = rng.poisson(TEMPESTADES_POR_DIA[mes - 1])
+    hora_local = np.where(rng.random(n) < 0.7, rng.normal(17.0, 2.5, n), rng.uniform(0, 24, n))
+    inicio = (hora_local + 3.0) * 60 % minutos_dia
+    return {
+        'lat': rng.uniform(*LATITUDES_SP, n), 'lon': rng.uniform(*LONGITUDES_SP, n),
+        'raio_km': rng.uniform(8, 45, n),
+        'inicio_min': inicio, 'duracao_min': rng.gamma(2.0, 60.0, n) + 20,
+        'pico_mm_h': np.minimum(rng.pareto(3.0, n) * 15 + 5, PICO_MAXIMO_MM_H),
+    }
+
+
+def gerar_chuva_dia(cadastro, inicio_dia, intervalo_minutos, rng, fora_do_ar):
+    """
+    Chuva (mm por intervalo) de um dia em todas as estações, shape (passos, estações), e a máscara das
+    leituras presentes. A chuva vem em pancadas: cada tempestade atinge as estações dentro do seu
+    raio com um perfil triangular no tempo e ruído log-normal por leitura, sobre uma garoa fraca e rara.
+    """
+    passos = 24 * 60 // intervalo_minutos
+    minutos = np.arange(passos) * intervalo_minutos
+    lat = cadastro['latitude'].to_numpy()
+    lon = cadastro['longitude'].to_numpy()
+    tempestades = _gerar_tempestades(inicio_dia, 24 * 60, inicio_dia.month, rng)
+
+    intensidade = np.zeros((passos, len(cadastro)))
+    for i in range(len(tempestades['lat'])):
+        distancia = np.hypot((lat - tempestades['lat'][i]) * KM_POR_GRAU,
+                             (lon - tempestades['lon'][i]) * KM_POR_GRAU * np.cos(np.radians(lat)))
+        atingidas = np.flatnonzero(distancia < 2 * tempestades['raio_km'][i])
+        if len(atingidas) == 0:
+            continue
+        espacial = np.exp(-(distancia[atingidas] / tempestades['raio_km'][i]) ** 2)
+        fase = (minutos - tempestades['inicio_min'][i]) / tempestades['duracao_min'][i]
+        temporal = np.clip(1 - np.abs(2 * fase - 1), 0, None)
+        intensidade[:, atingidas] += tempestades['pico_mm_h'][i] * temporal[:, None] * espacial[None, :]
+
+    garoa = rng.random(intensidade.shape) < 0.01
+    intensidade += np.where(garoa, rng.exponential(1.5, intensidade.shape), 0.0)
+    chuva = intensidade * intervalo_minutos / 60 * rng.lognormal(0, 0.5, intensidade.shape)
+    chuva = np.round(np.floor(chuva / RESOLUCAO_MM) * RESOLUCAO_MM, 2)
+
+    # Leituras ausentes: estações fora do ar por horas seguidas e falhas isoladas de transmissão
+    cai = rng.random(len(cadastro)) < 0.02
+    fora_do_ar[cai] = rng.integers(1, 3 * passos, cai.sum())
+    presente = (np.arange(passos)[:, None] >= fora_do_ar[None, :]) & (rng.random(chuva.shape) > 0.02)
+    fora_do_ar[:] = np.maximum(fora_do_ar - passos, 0)
+    return chuva, presente
+
+
+def gerar_arquivos_cemaden(diretorio, estacoes=100, meses=5, intervalo_minutos=10, inicio='2025-01', semente=42):
+    """
+    Escreve um CSV por mês no formato do CEMADEN (';' como separador, vírgula decimal, BOM e as
+    colunas municipio;codEstacao;uf;nomeEstacao;latitude;longitude;datahora;valorMedida), um dia
+    por vez, com a memória limitada a um dia de leituras. Retorna os caminhos gerados.
+    """
+    rng = np.random.default_rng(semente)
+    os.makedirs(diretorio, exist_ok=True)
+    cadastro = gerar_cadastro_estacoes(estacoes, rng)
+    colunas_cadastro = {c: cadastro[c].to_numpy(dtype=object) for c in COLUNAS_CEMADEN[:4]}
+    lat, lon = cadastro['latitude'].to_numpy(), cadastro['longitude'].to_numpy()
+    fora_do_ar = np.zeros(estacoes, dtype='int64')
+
+    caminhos = []
+    for mes in pd.period_range(pd.Period(inicio, 'M'), periods=meses, freq='M'):
+        caminho = os.path.join(diretorio, nome_arquivo_mensal(mes))
+        with open(caminho, 'w', encoding='utf-8-sig', newline='') as arquivo:
+            arquivo.write(';'.join(COLUNAS_CEMADEN) + '\n')
+            for dia in pd.date_range(mes.start_time, mes.end_time.normalize(), freq='D'):
+                chuva, presente = gerar_chuva_dia(cadastro, dia, intervalo_minutos, rng, fora_do_ar)
+                instantes = pd.date_range(dia, periods=chuva.shape[0], freq=f'{intervalo_minutos}min')
+                # Dentro de cada dia: por estação e, em cada estação, em ordem cronológica
+                estacao, passo = np.nonzero(presente.T)
+                textos_instante = np.asarray(instantes.strftime('%Y-%m-%d %H:%M:%S.0'), dtype=object)
+                pd.DataFrame({
+                    **{c: valores[estacao] for c, valores in colunas_cadastro.items()},
+                    'latitude': lat[estacao], 'longitude': lon[estacao],
+                    'datahora': textos_instante[passo], 'valorMedida': chuva[passo, estacao],
+                }).to_csv(arquivo, sep=';', decimal=',', index=False, header=False)
+        caminhos.append(caminho)
+    return caminhos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera CSVs mensais sintéticos no formato do CEMADEN.")
+    parser.add_argument('--diretorio', default='data')
+    parser.add_argument('--estacoes', type=int, default=100)
+    parser.add_argument('--meses', type=int, default=5)
+    parser.add_argument('--intervalo-minutos', type=int, default=10, help="Intervalo entre leituras de cada estação.")
+    parser.add_argument('--inicio', default='2025-01', help="Primeiro mês (AAAA-MM).")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    if (24 * 60) % args.intervalo_minutos:
+        print("Erro: --intervalo-minutos deve dividir um dia (ex.: 5, 10, 15, 30, 60).")
+        exit()
+    inicio = time.perf_counter()
+    caminhos = gerar_arquivos_cemaden(args.diretorio, args.estacoes, args.meses, args.intervalo_minutos,
+                                      args.inicio, args.semente)
+    tamanho = sum(os.path.getsize(c) for c in caminhos)
+    print(f"{len(caminhos)} arquivo(s), {tamanho / 1e6:.0f} MB, gerados em {time.perf_counter() - inicio:.1f} s:")
+    for caminho in caminhos:
+        print(f"  {caminho}")
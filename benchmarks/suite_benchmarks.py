@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+DIRETORIO_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIRETORIO_SRC = os.path.join(DIRETORIO_BENCHMARKS, '..', 'src')
+sys.path.insert(0, DIRETORIO_SRC)
+
+from gerador_dados_cemaden import gerar_arquivos_cemaden
+
+# Tamanhos da suíte: estações x meses de leituras de 10 minutos (o processamento lê janeiro a maio de 2025)
+TAMANHOS = {
+    'pequeno': {'estacoes': 30, 'meses': 1},
+    'medio': {'estacoes': 120, 'meses': 2},
+    'grande': {'estacoes': 300, 'meses': 3},
+}
+CAMINHO_LINHA_DE_BASE = os.path.join(DIRETORIO_BENCHMARKS, 'linha_de_base.json')
+CAMINHO_RESULTADOS = os.path.join('metricas', 'suite_benchmarks.json')
+TOLERANCIA_PADRAO = 0.30
+TOLERANCIA_MEMORIA_PADRAO = 0.20
+# Etapas mais curtas que isso na linha de base oscilam demais para comparar tempo/vazão
+TEMPO_MINIMO_COMPARAVEL_S = 0.2
+# Variações de memória abaixo disso (MB) não contam como regressão
+FOLGA_MEMORIA_MB = 25.0
+LEITURAS_PREDICAO_LOTE = 100_000
+LEITURAS_PREDICAO_UNITARIA = 2_000
+CAMINHO_MODELO = "ml_model/cemaden_flood_risk_model_pipeline.joblib"
+
+
+def medir_predicao(diretorio_metricas, leituras_lote, leituras_unitarias):
+    """
+    Executada em um processo próprio, no diretório de trabalho: pontua leituras do dataset horário
+    em um lote (preditor do simulador) e uma a uma por prever_risco_ml, com métricas por etapa.
+    """
+    import importlib
+
+    import numpy as np
+    from armazenamento_horario import carregar_dados_horarios
+    from inferencia_lote import obter_preditor
+    from perfilador_etapas import PerfiladorEtapas
+
+    simulador = importlib.import_module('3_run_simulation_with_local_sensor')
+    perfilador = PerfiladorEtapas('predicao', diretorio=diretorio_metricas).iniciar()
+    with perfilador.etapa('carga_modelo'):
+        modelo = simulador.carregar_modelo(CAMINHO_MODELO)
+    df = carregar_dados_horarios(['cod_estacao', 'acumulado_chuva_1_h_mm'])
+    amostra = np.random.default_rng(42).choice(len(df), leituras_lote)
+    cod = df['cod_estacao'].astype(str).to_numpy()[amostra]
+    chuva = df['acumulado_chuva_1_h_mm'].to_numpy(dtype='float64')[amostra]
+    with perfilador.etapa('predicao_lote', linhas=len(cod)):
+        obter_preditor(modelo).prever(cod, chuva)
+    for c, mm in zip(cod[:leituras_unitarias].tolist(), chuva[:leituras_unitarias].tolist()):
+        with perfilador.etapa('prever_risco_ml', linhas=1):
+            simulador.prever_risco_ml(modelo, mm, c)
+    perfilador.finalizar()
+
+
+def executar_script(argumentos, diretorio, execucao, diretorio_metricas):
+    """Roda um script em um processo novo no diretório de trabalho e lê o JSON de métricas que ele grava."""
+    caminho_log = os.path.join(diretorio, f"{execucao}.log")
+    inicio = time.perf_counter()
+    with open(caminho_log, 'w') as log:
+        retorno = subprocess.run([sys.executable, *argumentos], cwd=diretorio, stdout=log, stderr=subprocess.STDOUT)
+    duracao = time.perf_counter() - inicio
+    caminho_metricas = os.path.join(diretorio_metricas, f"{execucao}_metricas.json")
+    if retorno.returncode != 0 or not os.path.exists(caminho_metricas):
+        print(f"  Erro: '{execucao}' terminou com código {retorno.returncode}; veja {caminho_log}")
+        return None
+    with open(caminho_metricas) as f:
+        relatorio = json.load(f)
+    print(f"  {execucao:<14} {duracao:8.1f} s | pico RSS {relatorio['pico_rss_processo_mb']:8.1f} MB")
+    return {
+        'duracao_s': relatorio['duracao_s'],
+        'pico_rss_mb': relatorio['pico_rss_processo_mb'],
+        'etapas': {etapa['nome']: {'tempo_parede_s': etapa['tempo_parede_s'], 'linhas_por_s': etapa['linhas_por_s'],
+                                   'pico_rss_mb': etapa['pico_rss_mb']}
+                   for etapa in relatorio['etapas']},
+    }
+
+
+def executar_tamanho(nome, parametros, diretorio, args):
+    """Gera os dados de um tamanho e mede processamento, treino e predição, cada um em um processo novo."""
+    print(f"\n[{nome}] {parametros['estacoes']} estações x {parametros['meses']} mês(es), "
+          f"leituras a cada {args.intervalo_minutos} min")
+    diretorio_metricas = os.path.join(diretorio, 'metricas')
+    inicio = time.perf_counter()
+    caminhos = gerar_arquivos_cemaden(os.path.join(diretorio, 'data'), parametros['estacoes'], parametros['meses'],
+                                      args.intervalo_minutos)
+    tempo_geracao = time.perf_counter() - inicio
+    megabytes = sum(os.path.getsize(c) for c in caminhos) / 1e6
+    print(f"  {'geracao':<14} {tempo_geracao:8.1f} s | {megabytes:.0f} MB de CSV")
+    execucoes = {'geracao': {'duracao_s': round(tempo_geracao, 6), 'pico_rss_mb': None, 'megabytes_csv': round(megabytes, 1),
+                             'etapas': {'gerar_csv': {'tempo_parede_s': round(tempo_geracao, 6), 'linhas_por_s': None,
+                                                      'pico_rss_mb': None}}}}
+
+    metricas = ['--metricas', '--diretorio-metricas', diretorio_metricas]
+    scripts = {
+        'processamento': [os.path.join(DIRETORIO_SRC, '1_process_official_data.py'), *args.args_processamento, *metricas],
+        'treino': [os.path.join(DIRETORIO_SRC, '2_train_model.py'), '--sem-cache', *args.args_treino, *metricas],
+        'predicao': [os.path.abspath(__file__), '--medir-predicao', '--diretorio-metricas', diretorio_metricas],
+    }
+    for execucao, argumentos in scripts.items():
+        execucoes[execucao] = executar_script(argumentos, diretorio, execucao, diretorio_metricas)
+    return execucoes
+
+
+def comparar(resultados, linha_de_base, tolerancia, tolerancia_memoria):
+    """
+    Compara cada etapa com a linha de base: vazão (linhas/s) ou, sem linhas, tempo de parede, e o pico
+    de RSS. Retorna a lista de regressões (texto); etapas curtas demais só têm a memória comparada.
+    """
+    regressoes = []
+    print(f"\n{'tamanho/execução/etapa':<46} {'métrica':<14} {'base':>11} {'atual':>11} {'variação':>9}")
+    for tamanho, execucoes in resultados['tamanhos'].items():
+        base_tamanho = linha_de_base['tamanhos'].get(tamanho)
+        if base_tamanho is None:
+            print(f"{tamanho}: sem linha de base para este tamanho.")
+            continue
+        for execucao, medida in execucoes.items():
+            base_execucao = base_tamanho.get(execucao)
+            if medida is None:
+                regressoes.append(f"{tamanho}/{execucao}: a execução falhou")
+                continue
+            if base_execucao is None:
+                continue
+            for etapa, atual in medida['etapas'].items():
+                base = base_execucao['etapas'].get(etapa)
+                if base is None:
+                    continue
+                chave = f"{tamanho}/{execucao}/{etapa}"
+                comparacoes = []
+                if base['tempo_parede_s'] >= TEMPO_MINIMO_COMPARAVEL_S:
+                    if base['linhas_por_s'] and atual['linhas_por_s']:
+                        # Vazão: regressão quando cai mais que a tolerância
+                        comparacoes.append(('linhas/s', base['linhas_por_s'], atual['linhas_por_s'],
+                                            atual['linhas_por_s'] < base['linhas_por_s'] * (1 - tolerancia)))
+                    else:
+                        comparacoes.append(('tempo (s)', base['tempo_parede_s'], atual['tempo_parede_s'],
+                                            atual['tempo_parede_s'] > base['tempo_parede_s'] * (1 + tolerancia)))
+                if base['pico_rss_mb'] and atual['pico_rss_mb']:
+                    limite = max(base['pico_rss_mb'] * (1 + tolerancia_memoria), base['pico_rss_mb'] + FOLGA_MEMORIA_MB)
+                    comparacoes.append(('pico RSS (MB)', base['pico_rss_mb'], atual['pico_rss_mb'], atual['pico_rss_mb'] > limite))
+                for metrica, valor_base, valor_atual, regrediu in comparacoes:
+                    variacao = (valor_atual / valor_base - 1) * 100 if valor_base else 0.0
+                    marca = "  <- REGRESSÃO" if regrediu else ""
+                    print(f"{chave:<46} {metrica:<14} {valor_base:>11,.1f} {valor_atual:>11,.1f} {variacao:>+8.1f}%{marca}")
+                    if regrediu:
+                        regressoes.append(f"{chave}: {metrica} {valor_base:,.1f} -> {valor_atual:,.1f} ({variacao:+.1f}%)")
+    return regressoes
+
+
+def salvar_json(dados, caminho):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    with open(caminho, 'w') as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks ponta a ponta (processamento, treino e predição) "
+                                                 "com dados sintéticos do CEMADEN em vários tamanhos.")
+    parser.add_argument('--tamanhos', nargs='+', choices=list(TAMANHOS), default=list(TAMANHOS))
+    parser.add_argument('--intervalo-minutos', type=int, default=10)
+    parser.add_argument('--linha-de-base', default=CAMINHO_LINHA_DE_BASE)
+    parser.add_argument('--gravar-linha-de-base', action='store_true',
+                        help="Grava os resultados desta execução como a nova linha de base (sem comparar).")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="Queda de vazão (ou aumento de tempo) aceita antes de acusar regressão, ex.: 0.3 = 30%%.")
+    parser.add_argument('--tolerancia-memoria', type=float, default=TOLERANCIA_MEMORIA_PADRAO)
+    parser.add_argument('--args-processamento', nargs='*', default=[], metavar='ARG',
+                        help="Argumentos extras de 1_process_official_data.py, ex.: --args-processamento=--streaming.")
+    parser.add_argument('--args-treino', nargs='*', default=[], metavar='ARG',
+                        help="Argumentos extras de 2_train_model.py, ex.: --args-treino=--codificacao-estacao=onehot_esparso.")
+    parser.add_argument('--diretorio-trabalho', help="Onde gerar os dados e rodar os scripts (padrão: diretório temporário).")
+    parser.add_argument('--saida', default=CAMINHO_RESULTADOS, help="JSON com os resultados desta execução.")
+    parser.add_argument('--medir-predicao', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--diretorio-metricas', default='metricas', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir_predicao:
+        medir_predicao(args.diretorio_metricas, LEITURAS_PREDICAO_LOTE, LEITURAS_PREDICAO_UNITARIA)
+        sys.exit(0)
+
+    resultados = {'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'python': platform.python_version(),
+                  'plataforma': platform.platform(), 'cpus': os.cpu_count(), 'intervalo_minutos': args.intervalo_minutos,
+                  'tamanhos': {}}
+    with tempfile.TemporaryDirectory() as temporario:
+        for nome in args.tamanhos:
+            diretorio = os.path.join(args.diretorio_trabalho or temporario, nome)
+            os.makedirs(diretorio, exist_ok=True)
+            resultados['tamanhos'][nome] = executar_tamanho(nome, TAMANHOS[nome], diretorio, args)
+    salvar_json(resultados, args.saida)
+    print(f"\nResultados salvos em {args.saida}")
+
+    falhas = [f"{t}/{e}" for t, execucoes in resultados['tamanhos'].items() for e, m in execucoes.items() if m is None]
+    if args.gravar_linha_de_base:
+        if falhas:
+            print(f"Linha de base não gravada: execuções com erro ({', '.join(falhas)}).")
+            sys.exit(1)
+        salvar_json(resultados, args.linha_de_base)
+        print(f"Linha de base gravada em {args.linha_de_base}")
+        sys.exit(0)
+    if not os.path.exists(args.linha_de_base):
+        print(f"Sem linha de base em {args.linha_de_base}; grave uma com --gravar-linha-de-base.")
+        sys.exit(1 if falhas else 0)
+
+    with open(args.linha_de_base) as f:
+        linha_de_base = json.load(f)
+    regressoes = comparar(resultados, linha_de_base, args.tolerancia, args.tolerancia_memoria)
+    if regressoes:
+        print(f"\n{len(regressoes)} regressão(ões) além da tolerância:")
+        for regressao in regressoes:
+            print(f"  {regressao}")
+        sys.exit(1)
+    print("\nNenhuma regressão além da tolerância.")
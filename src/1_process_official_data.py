@@ -1,41 +1,34 @@
 import pandas as pd
+import argparse
 import glob
 import os
 
-def processar_dados_cemaden_oficiais():
-    """
-    Lê os arquivos CSV mensais do CEMADEN, unifica, padroniza colunas,
-    agrega para dados horários e salva o resultado.
-    """
-    # Ajustar o padrão se os nomes dos arquivos variarem muito ou estiverem em outra pasta
-    arquivos_mensais = [
-        "data/cemaden_SP_jan_25.csv",  # Nome diferente (SP maiúsculo)
-        "data/cemaden_sp_fev_25.csv",
-        "data/cemaden_sp_marco_25.csv",
-        "data/cemaden_sp_abril_25.csv",
-        "data/cemaden_sp_maio_25.csv"
-    ]
-    
-    # Verificar se os arquivos existem
-    arquivos_encontrados = []
-    for f_nome in arquivos_mensais:
-        if os.path.exists(f_nome):
-            arquivos_encontrados.append(f_nome)
-        else:
-            print(f"Aviso: Arquivo {f_nome} não encontrado e será ignorado.")
-
-    if not arquivos_encontrados:
-        print("Nenhum arquivo de dados mensal encontrado. Encerrando o script.")
-        return
+from agregados_horarios import agregados_atualizados, atualizar_agregados, construir_agregados
+from armazenamento_horario import (assinatura_dados_horarios, atualizar_dados_horarios, caminho_dados_horarios,
+                                   dados_horarios_existem, salvar_dados_horarios)
+from cubo_horario import COLUNA_PADRAO, PREENCHIMENTOS, construir_cubo_horario, cubo_atualizado, salvar_cubo_horario
+from ingestao_cemaden import (TAMANHO_BLOCO_PADRAO, TAMANHO_FATIA_PADRAO,
+                              agregar_arquivos_em_paralelo, agregar_arquivos_em_streaming)
+from ingestao_incremental import descartar_parciais, preparar_atualizacao_incremental, salvar_manifesto
+from perfilador_etapas import PERFILADOR_INATIVO, adicionar_argumentos_metricas, criar_perfilador
+from rotulagem_risco import (PERFIL_PADRAO, calcular_features_calendario, classificar_risco_vetorizado,
+                             interpretar_perfil, obter_limiares, rotular_multiplos_perfis)
 
-    print(f"Arquivos encontrados para processamento: {arquivos_encontrados}")
 
+def agregar_em_memoria(arquivos_encontrados, perfilador=None):
+    """
+    Lê os arquivos mensais inteiros em memória, concatena e agrega para dados horários.
+    Retorna o DataFrame horário (antes da renomeação de 'hora_utc_agrupada') ou None em caso de erro.
+    """
+    perfilador = perfilador or PERFILADOR_INATIVO
     lista_dfs_mensais = []
 
     for arquivo_csv in arquivos_encontrados:
         try:
             # Usar sep=';' e decimal=',' diretamente, pois foi o que funcionou.
-            df_mes = pd.read_csv(arquivo_csv, encoding='utf-8', sep=';', decimal=',', engine='python')
+            with perfilador.etapa('leitura_csv') as etapa:
+                df_mes = pd.read_csv(arquivo_csv, encoding='utf-8', sep=';', decimal=',', engine='python')
+                etapa.linhas = len(df_mes)
             print(f"Lido {arquivo_csv} com sep=';' e decimal=',' ({len(df_mes)} linhas).")
             
             # Renomear colunas aqui para inspecionar 'chuva_10min_mm' com nome padronizado
@@ -66,7 +59,7 @@ def processar_dados_cemaden_oficiais():
 
     if not lista_dfs_mensais:
         print("Nenhum DataFrame mensal foi carregado. Encerrando.")
-        return
+        return None
 
     df_completo = pd.concat(lista_dfs_mensais, ignore_index=True)
     print(f"Total de {len(df_completo)} linhas após concatenação.")
@@ -99,30 +92,42 @@ def processar_dados_cemaden_oficiais():
         if col not in df_completo.columns:
             print(f"Erro: Coluna essencial '{col}' não encontrada após renomeação. Verifique os nomes das colunas nos arquivos CSV.")
             print(f"Colunas disponíveis: {df_completo.columns.tolist()}")
-            return
+            return None
 
     # Conversão de tipos
-    df_completo['datahora_utc'] = pd.to_datetime(df_completo['datahora_utc'])
-    df_completo['chuva_10min_mm'] = pd.to_numeric(df_completo['chuva_10min_mm'], errors='coerce').fillna(0)
-
-    # Criar datahora_brasilia (UTC-3)
-    df_completo['datahora_brasilia'] = df_completo['datahora_utc'] - pd.Timedelta(hours=3)
-
-    # Agregação para dados horários
-    # Arredondar datahora_utc para a hora cheia para agrupar
-    df_completo['hora_utc_agrupada'] = df_completo['datahora_utc'].dt.floor('h') # Corrigido de 'H' para 'h'
-
-    df_horario = df_completo.groupby(['cod_estacao', 'hora_utc_agrupada']).agg(
-        acumulado_chuva_1_h_mm=('chuva_10min_mm', 'sum'),
-        # Preservar outras informações da primeira ocorrência na hora (ou da mais relevante)
-        municipio=('municipio', 'first'),
-        uf=('uf', 'first'),
-        nome_estacao=('nome_estacao', 'first'),
-        latitude=('latitude', 'first'),
-        longitude=('longitude', 'first'),
-        datahora_brasilia_ref=('datahora_brasilia', 'first') # Referência para features temporais
-    ).reset_index()
-    
+    with perfilador.etapa('conversao_tipos', linhas=len(df_completo)):
+        df_completo['datahora_utc'] = pd.to_datetime(df_completo['datahora_utc'])
+        df_completo['chuva_10min_mm'] = pd.to_numeric(df_completo['chuva_10min_mm'], errors='coerce').fillna(0)
+
+        # Criar datahora_brasilia (UTC-3)
+        df_completo['datahora_brasilia'] = df_completo['datahora_utc'] - pd.Timedelta(hours=3)
+
+        # Agregação para dados horários
+        # Arredondar datahora_utc para a hora cheia para agrupar
+        df_completo['hora_utc_agrupada'] = df_completo['datahora_utc'].dt.floor('h') # Corrigido de 'H' para 'h'
+
+    with perfilador.etapa('agregacao_horaria', linhas=len(df_completo)):
+        df_horario = df_completo.groupby(['cod_estacao', 'hora_utc_agrupada']).agg(
+            acumulado_chuva_1_h_mm=('chuva_10min_mm', 'sum'),
+            # Preservar outras informações da primeira ocorrência na hora (ou da mais relevante)
+            municipio=('municipio', 'first'),
+            uf=('uf', 'first'),
+            nome_estacao=('nome_estacao', 'first'),
+            latitude=('latitude', 'first'),
+            longitude=('longitude', 'first'),
+            datahora_brasilia_ref=('datahora_brasilia', 'first') # Referência para features temporais
+        ).reset_index()
+
+    return df_horario
+
+
+def adicionar_features_e_risco(df_horario, perfil_risco=PERFIL_PADRAO, perfis_adicionais=None, perfilador=None):
+    """
+    Renomeia a hora agrupada, adiciona as features temporais (horário de Brasília) e a coluna
+    nivel_risco ao DataFrame horário agregado. Cada linha é tratada de forma independente.
+    perfis_adicionais ({nome: perfil}) gera colunas 'nivel_risco_<nome>' com outros limiares.
+    """
+    perfilador = perfilador or PERFILADOR_INATIVO
     df_horario.rename(columns={'hora_utc_agrupada': 'datahora_utc_hora'}, inplace=True)
 
     # Adicionar features temporais baseadas em datahora_brasilia_ref (que é a primeira ocorrência na hora UTC)
@@ -134,44 +139,194 @@ def processar_dados_cemaden_oficiais():
         df_horario['datahora_brasilia_ref_fallback'] = df_horario['datahora_utc_hora'] - pd.Timedelta(hours=3)
         ref_dt_col = df_horario['datahora_brasilia_ref_fallback']
 
-    df_horario['ano'] = ref_dt_col.dt.year
-    df_horario['mes'] = ref_dt_col.dt.month
-    df_horario['dia'] = ref_dt_col.dt.day
-    df_horario['hora_brasilia'] = ref_dt_col.dt.hour
-    df_horario['dia_semana_brasilia'] = ref_dt_col.dt.dayofweek # Segunda=0, Domingo=6
+    # Features de calendário em uma única passada vetorizada
+    with perfilador.etapa('features_calendario', linhas=len(df_horario)):
+        features_calendario = calcular_features_calendario(ref_dt_col)
+        for coluna in features_calendario.columns:
+            df_horario[coluna] = features_calendario[coluna]
 
     # Adicionar coluna nivel_risco com base em limiares ajustados após EDA (3ª rodada)
     # Baixo=0: <5.5mm/h; Moderado=1: 5.5mm <= chuva < 18mm/h; Alto=2: chuva >= 18mm/h
-    limiares_risco = {
-        'baixo_max': 5.5,  # Chuva < 5.5mm/h é Baixo Risco
-        'moderado_max': 18  # Chuva >= 5.5mm/h e < 18mm/h é Moderado Risco
-                            # Chuva >= 18mm/h é Alto Risco
-    }
+    # A classificação é uma busca binária vetorizada sobre os limiares do perfil (ver rotulagem_risco.py)
+    limiares_risco = obter_limiares(perfil_risco)
+    with perfilador.etapa('classificacao_risco', linhas=len(df_horario)):
+        df_horario['nivel_risco'] = classificar_risco_vetorizado(df_horario['acumulado_chuva_1_h_mm'], limiares_risco)
+    print(f"Coluna 'nivel_risco' adicionada com limiares ajustados (3ª rodada): Baixo (<{limiares_risco['baixo_max']}mm), Moderado (<{limiares_risco['moderado_max']}mm), Alto (>= {limiares_risco['moderado_max']}mm).")
+    print(df_horario['nivel_risco'].value_counts(normalize=True).sort_index().map('{:.2%}'.format))
+
+    # Rótulos adicionais com outros perfis de limiares, calculados de uma só vez
+    if perfis_adicionais:
+        with perfilador.etapa('classificacao_risco_perfis_adicionais', linhas=len(df_horario)):
+            rotulos = rotular_multiplos_perfis(df_horario['acumulado_chuva_1_h_mm'], perfis_adicionais)
+        for coluna in rotulos.columns:
+            df_horario[coluna] = rotulos[coluna]
+        print(f"Colunas de risco adicionais: {rotulos.columns.tolist()}")
+
+    return df_horario
 
-    def classificar_risco(chuva_h):
-        if chuva_h < limiares_risco['baixo_max']:
-            return 0 # Baixo
-        elif chuva_h < limiares_risco['moderado_max']:
-            return 1 # Moderado
+
+def processar_incrementalmente(arquivos_encontrados, tamanho_bloco=TAMANHO_BLOCO_PADRAO, formato='csv',
+                               perfis_adicionais=None, agregados=False, perfilador=None):
+    """
+    Processa apenas os arquivos novos ou alterados desde a última execução (segundo o manifesto
+    data/manifesto_ingestao.json) e mescla os grupos (estação, hora) recalculados no armazenamento
+    horário existente. Se o armazenamento ainda não existir, todos os arquivos são processados.
+    Com agregados=True os agregados diários e mensais, se estavam em dia com o armazenamento,
+    têm recalculados só os dias e meses afetados.
+    """
+    perfilador = perfilador or PERFILADOR_INATIVO
+    armazenamento_existe = dados_horarios_existem(formato)
+    agregados_em_dia = agregados and armazenamento_existe and agregados_atualizados()
+    if not armazenamento_existe:
+        print("Armazenamento horário não encontrado; todos os arquivos serão processados.")
+
+    with perfilador.etapa('leitura_e_agregacao_incremental'):
+        resultado = preparar_atualizacao_incremental(arquivos_encontrados, tamanho_bloco,
+                                                     reprocessar_tudo=not armazenamento_existe)
+    if resultado is None:
+        print("Nenhum arquivo novo ou alterado desde a última execução. Nada a fazer.")
+        return
+    df_afetado, chaves_removidas, manifesto, parciais_obsoletos = resultado
+
+    if df_afetado is not None:
+        df_afetado = adicionar_features_e_risco(df_afetado, perfis_adicionais=perfis_adicionais, perfilador=perfilador)
+    with perfilador.etapa('gravacao_dados_horarios', linhas=len(df_afetado) if df_afetado is not None else 0):
+        if armazenamento_existe:
+            atualizar_dados_horarios(df_afetado, chaves_removidas, formato)
+        elif df_afetado is not None:
+            salvar_dados_horarios(df_afetado, formato)
+    if agregados_em_dia:
+        with perfilador.etapa('atualizacao_agregados'):
+            dias = atualizar_agregados(df_afetado, chaves_removidas)
+        print(f"Agregados atualizados: {dias} estado(s) (estação, dia) recalculado(s).")
+
+    # O manifesto só é gravado depois que o armazenamento foi atualizado com sucesso
+    salvar_manifesto(manifesto)
+    descartar_parciais(parciais_obsoletos)
+
+
+def processar_dados_cemaden_oficiais(streaming=False, tamanho_bloco=TAMANHO_BLOCO_PADRAO, workers=1,
+                                     tamanho_fatia=TAMANHO_FATIA_PADRAO, formato='csv', incremental=False,
+                                     perfis_adicionais=None, cubo=None, agregados=False, perfilador=None):
+    """
+    Lê os arquivos CSV mensais do CEMADEN, unifica, padroniza colunas,
+    agrega para dados horários e salva o resultado.
+    Com streaming=True os arquivos são lidos em blocos de até tamanho_bloco linhas e
+    pré-agregados bloco a bloco, mantendo o uso de memória limitado.
+    Com workers > 1 os arquivos são divididos em fatias agregadas em paralelo por um pool de processos.
+    formato define o armazenamento da saída: 'csv', 'parquet' (particionado, tipos compactos) ou 'ambos'.
+    Com incremental=True apenas arquivos novos ou alterados são lidos (ver processar_incrementalmente).
+    perfis_adicionais ({nome: limiares}) adiciona colunas de risco rotuladas com outros limiares.
+    cubo ('nan' ou 'zero') grava também o cubo denso estações x horas (ver cubo_horario.py), com esse
+    preenchimento nas horas sem leitura.
+    agregados=True mantém os agregados diários e mensais por estação (ver agregados_horarios.py).
+    perfilador (PerfiladorEtapas) mede cada etapa: leitura, conversão, agregação, rotulagem e gravação.
+    """
+    perfilador = perfilador or PERFILADOR_INATIVO
+    # Ajustar o padrão se os nomes dos arquivos variarem muito ou estiverem em outra pasta
+    arquivos_mensais = [
+        "data/cemaden_SP_jan_25.csv",  # Nome diferente (SP maiúsculo)
+        "data/cemaden_sp_fev_25.csv",
+        "data/cemaden_sp_marco_25.csv",
+        "data/cemaden_sp_abril_25.csv",
+        "data/cemaden_sp_maio_25.csv"
+    ]
+    
+    # Verificar se os arquivos existem
+    arquivos_encontrados = []
+    for f_nome in arquivos_mensais:
+        if os.path.exists(f_nome):
+            arquivos_encontrados.append(f_nome)
         else:
-            return 2 # Alto
+            print(f"Aviso: Arquivo {f_nome} não encontrado e será ignorado.")
 
-    df_horario['nivel_risco'] = df_horario['acumulado_chuva_1_h_mm'].apply(classificar_risco)
-    print(f"Coluna 'nivel_risco' adicionada com limiares ajustados (3ª rodada): Baixo (<{limiares_risco['baixo_max']}mm), Moderado (<{limiares_risco['moderado_max']}mm), Alto (>= {limiares_risco['moderado_max']}mm).")
-    print(df_horario['nivel_risco'].value_counts(normalize=True).sort_index().map('{:.2%}'.format))
+    if not arquivos_encontrados:
+        print("Nenhum arquivo de dados mensal encontrado. Encerrando o script.")
+        return
+
+    print(f"Arquivos encontrados para processamento: {arquivos_encontrados}")
+
+    if incremental:
+        processar_incrementalmente(arquivos_encontrados, tamanho_bloco, formato, perfis_adicionais, agregados,
+                                   perfilador)
+        # Agregados que não estavam em dia e o cubo são reconstruídos a partir do armazenamento já mesclado
+        if agregados and not agregados_atualizados():
+            with perfilador.etapa('gravacao_agregados'):
+                metadados = construir_agregados()
+            print(f"Agregados salvos: {metadados['estados_diarios']} estados diários, {metadados['estados_mensais']} mensais.")
+        if cubo is not None and not cubo_atualizado(coluna=COLUNA_PADRAO, preenchimento=cubo):
+            with perfilador.etapa('gravacao_cubo_horario'):
+                metadados = construir_cubo_horario(preenchimento=cubo)
+            print(f"Cubo horário salvo: {metadados['estacoes']} estações x {metadados['horas']} horas.")
+        return
 
+    # Nos modos paralelo e streaming leitura e agregação acontecem juntas, bloco a bloco; as linhas
+    # da etapa são as linhas horárias produzidas
+    if workers > 1:
+        print(f"Modo paralelo ativado ({workers} processos).")
+        with perfilador.etapa('leitura_e_agregacao_paralela') as etapa:
+            df_horario = agregar_arquivos_em_paralelo(arquivos_encontrados, workers, tamanho_bloco, tamanho_fatia)
+            etapa.linhas = len(df_horario) if df_horario is not None else None
+    elif streaming:
+        print(f"Modo streaming ativado (blocos de até {tamanho_bloco} linhas, parser C).")
+        with perfilador.etapa('leitura_e_agregacao_streaming') as etapa:
+            df_horario = agregar_arquivos_em_streaming(arquivos_encontrados, tamanho_bloco)
+            etapa.linhas = len(df_horario) if df_horario is not None else None
+    else:
+        df_horario = agregar_em_memoria(arquivos_encontrados, perfilador)
+
+    if df_horario is None:
+        return
+
+    df_horario = adicionar_features_e_risco(df_horario, perfis_adicionais=perfis_adicionais, perfilador=perfilador)
 
     print(f"Total de {len(df_horario)} linhas após agregação horária e adição de nivel_risco.")
 
-    # Salvar o arquivo processado
-    output_dir = "data"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    output_path = os.path.join(output_dir, "cemaden_official_processed_hourly.csv")
-    df_horario.to_csv(output_path, index=False, encoding='utf-8')
-    print(f"Dados processados e agregados salvos em: {output_path}")
+    # Salvar o arquivo processado (CSV e/ou dataset Parquet particionado)
+    with perfilador.etapa('gravacao_dados_horarios', linhas=len(df_horario)):
+        salvar_dados_horarios(df_horario, formato)
+
+    if cubo is not None:
+        with perfilador.etapa('gravacao_cubo_horario', linhas=len(df_horario)):
+            caminho, _ = caminho_dados_horarios()
+            metadados = salvar_cubo_horario(df_horario, preenchimento=cubo, assinatura=assinatura_dados_horarios(caminho))
+        print(f"Cubo horário salvo: {metadados['estacoes']} estações x {metadados['horas']} horas.")
+    if agregados:
+        with perfilador.etapa('gravacao_agregados', linhas=len(df_horario)):
+            caminho, _ = caminho_dados_horarios()
+            metadados = construir_agregados(df_horario, assinatura=assinatura_dados_horarios(caminho))
+        print(f"Agregados salvos: {metadados['estados_diarios']} estados diários, {metadados['estados_mensais']} mensais.")
 
 if __name__ == "__main__":
-    processar_dados_cemaden_oficiais()
+    parser = argparse.ArgumentParser(description="Processa os dados oficiais do CEMADEN para dados horários.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Lê os arquivos em blocos, com memória limitada, em vez de carregá-los inteiros.")
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO_PADRAO,
+                        help="Número de linhas por bloco no modo streaming.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Número de processos para a agregação paralela (1 = sequencial).")
+    parser.add_argument('--tamanho-fatia-mb', type=int, default=TAMANHO_FATIA_PADRAO // (1024 * 1024),
+                        help="Tamanho, em MB, das fatias de arquivo distribuídas entre os processos.")
+    parser.add_argument('--formato', choices=['csv', 'parquet', 'ambos'], default='csv',
+                        help="Formato de saída do dataset horário.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Processa apenas arquivos novos ou alterados e mescla o resultado no armazenamento existente "
+                             "(no CSV, correções de horas antigas regravam o arquivo inteiro; use --formato parquet).")
+    parser.add_argument('--perfil-risco-adicional', action='append', default=[], metavar='NOME=BAIXO_MAX,MODERADO_MAX',
+                        help="Adiciona a coluna nivel_risco_<NOME> com outros limiares (pode ser repetido), ex.: conservador=3,10.")
+    parser.add_argument('--cubo', nargs='?', const='nan', choices=PREENCHIMENTOS, default=None,
+                        help="Grava também o cubo denso estações x horas em data/cubo_horario; horas sem leitura "
+                             "ficam com NaN (padrão) ou 0 ('--cubo zero', com máscara das horas observadas).")
+    parser.add_argument('--agregados', action='store_true',
+                        help="Mantém em data/agregados_horarios os totais, máximos e horas por nível de risco por "
+                             "estação e dia/mês; com --incremental só os dias e meses afetados são recalculados.")
+    adicionar_argumentos_metricas(parser)
+    args = parser.parse_args()
+    perfis_adicionais = dict(interpretar_perfil(texto) for texto in args.perfil_risco_adicional)
+    perfilador = criar_perfilador('processamento', args)
+    processar_dados_cemaden_oficiais(streaming=args.streaming, tamanho_bloco=args.tamanho_bloco,
+                                     workers=args.workers, tamanho_fatia=args.tamanho_fatia_mb * 1024 * 1024,
+                                     formato=args.formato, incremental=args.incremental,
+                                     perfis_adicionais=perfis_adicionais, cubo=args.cubo,
+                                     agregados=args.agregados, perfilador=perfilador)
     print("Processamento concluído.")
@@ -2,21 +2,74 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split # Embora treinaremos com todos os dados, pode ser útil para consistência
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.compose import ColumnTransformer
+from sklearn.base import clone
 from sklearn.pipeline import Pipeline
 import joblib
+import argparse
 import os
+import time
+
+from armazenamento_horario import carregar_dados_horarios
+from cache_modelos import DIRETORIO_CACHE_PADRAO, LIMITE_CACHE_MB_PADRAO, limpar_cache, treinar_com_cache
+from features_chuva import adicionar_features_janelas, atualizar_features_janelas, janelas_do_modelo, nomes_features_janelas
+from codificacao_estacao import (MODOS_CODIFICACAO, MODO_PADRAO, colunas_extras_codificacao, construir_preprocessador,
+                                  modo_do_preprocessador)
+from floresta_compacta import caminho_floresta_compacta, exportar_floresta_compacta
+from perfilador_etapas import adicionar_argumentos_metricas, criar_perfilador
+from retreino_incremental import ARVORES_POR_RETREINO, adicionar_arvores
+from validacao_temporal import (LACUNA_HORAS_PADRAO, N_FOLDS_PADRAO, executar_validacao_temporal, interpretar_grade,
+                                relatorio_validacao_temporal)
+
+# Colunas efetivamente usadas no treino; só elas são lidas do dataset horário
+COLUNAS_TREINO = ['acumulado_chuva_1_h_mm', 'cod_estacao', 'nivel_risco']
+
+parser = argparse.ArgumentParser(description="Treina o modelo de risco de enchente com os dados horários do CEMADEN.")
+parser.add_argument('--inicio', default=None, help="Início (UTC) da janela de treino, ex.: 2025-01-01.")
+parser.add_argument('--fim', default=None, help="Fim (UTC) da janela de treino, ex.: 2025-05-31 23:00.")
+parser.add_argument('--janelas', type=int, nargs='+', default=None,
+                    help="Adiciona features de chuva acumulada/máxima por estação nessas janelas (horas), ex.: --janelas 3 6 24 72.")
+parser.add_argument('--codificacao-estacao', choices=MODOS_CODIFICACAO, default=MODO_PADRAO,
+                    help="Codificação de cod_estacao: one-hot denso (padrão) ou esparso, inteiro ordinal, "
+                         "média do alvo por estação ou latitude/longitude da estação.")
+parser.add_argument('--retreino-incremental', action='store_true',
+                    help="No teste de re-treinamento, acrescenta árvores treinadas só com os dados novos em vez de re-treinar tudo.")
+parser.add_argument('--arvores-retreino', type=int, default=ARVORES_POR_RETREINO,
+                    help="Árvores acrescentadas em cada re-treino incremental.")
+parser.add_argument('--validacao-temporal', action='store_true',
+                    help="Valida com folds temporais bloqueados (em vez do split aleatório) em paralelo ao treino do modelo final.")
+parser.add_argument('--folds', type=int, default=N_FOLDS_PADRAO, help="Número de folds da validação temporal.")
+parser.add_argument('--lacuna-horas', type=int, default=None,
+                    help=f"Horas descartadas do treino antes de cada bloco de teste (padrão: {LACUNA_HORAS_PADRAO} ou a maior janela).")
+parser.add_argument('--grade', nargs='+', default=None,
+                    help="Grade de hiperparâmetros do Random Forest na validação temporal, ex.: --grade n_estimators=50,100 max_depth=None,20.")
+parser.add_argument('--n-jobs', type=int, default=1, help="Processos que avaliam os folds e a grade em paralelo.")
+parser.add_argument('--sem-cache', action='store_true',
+                    help="Treina mesmo que o cache de artefatos já tenha um modelo com os mesmos dados e hiperparâmetros.")
+parser.add_argument('--diretorio-cache', default=DIRETORIO_CACHE_PADRAO, help="Diretório do cache de artefatos de modelos.")
+parser.add_argument('--limite-cache-mb', type=int, default=LIMITE_CACHE_MB_PADRAO,
+                    help="Tamanho máximo do cache; acima dele os artefatos usados há mais tempo são removidos.")
+parser.add_argument('--limpar-cache', action='store_true', help="Remove todos os artefatos do cache antes do treino.")
+adicionar_argumentos_metricas(parser)
+args = parser.parse_args()
+# Com --metricas, cada etapa do treino é medida e o relatório é salvo ao fim do script
+perfilador = criar_perfilador('treino', args)
 
 print("Iniciando o script de treinamento do modelo...")
+if args.limpar_cache:
+    removidos, liberados = limpar_cache(args.diretorio_cache)
+    print(f"Cache de artefatos limpo: {removidos} artefato(s), {liberados / 1e6:.1f} MB liberados.")
 
-# Carregar os dados processados
-print("Carregando dados de data/cemaden_official_processed_hourly.csv...")
+# Carregar os dados processados (dataset Parquet quando disponível, senão o CSV)
+print("Carregando dados processados (somente as colunas de treino)...")
 try:
-    df = pd.read_csv('data/cemaden_official_processed_hourly.csv')
+    colunas_carga = COLUNAS_TREINO + (['datahora_utc_hora'] if args.janelas or args.validacao_temporal else []) + \
+        colunas_extras_codificacao(args.codificacao_estacao)
+    with perfilador.etapa('carga_dados') as etapa:
+        df = carregar_dados_horarios(colunas_carga, inicio=args.inicio, fim=args.fim)
+        etapa.linhas = len(df)
     print(f"Dados carregados com sucesso. Formato: {df.shape}")
 except FileNotFoundError:
-    print("Erro: Arquivo data/cemaden_official_processed_hourly.csv não encontrado.")
+    print("Erro: Dataset processado (data/cemaden_official_processed_hourly.csv ou .parquet) não encontrado.")
     print("Certifique-se de que o script 1_process_official_data.py foi executado.")
     exit()
 except Exception as e:
@@ -30,20 +83,23 @@ if df.empty:
 
 # Seleção de Features (X) e Target (y)
 print("Preparando features (X) e target (y)...")
-X = df[['acumulado_chuva_1_h_mm', 'cod_estacao']]
-y = df['nivel_risco']
+colunas_features = ['acumulado_chuva_1_h_mm', 'cod_estacao']
+if args.janelas:
+    # Mesmo código usado pelo simulador para montar as features de janelas em tempo real
+    print(f"Calculando features de janelas móveis por estação: {sorted(set(args.janelas))} horas...")
+    with perfilador.etapa('features_janelas', linhas=len(df)):
+        df = adicionar_features_janelas(df, args.janelas)
+    colunas_features += nomes_features_janelas(sorted(set(args.janelas)))
+X = df[colunas_features]
+# int64 como no CSV original (o dataset Parquet guarda int8, que o TargetEncoder não aceita)
+y = df['nivel_risco'].astype('int64')
 print(f"Formato de X: {X.shape}, Formato de y: {y.shape}")
 
-# Definir o pré-processador para One-Hot Encoding da coluna 'cod_estacao'
+# Definir o pré-processador da coluna 'cod_estacao' (por padrão One-Hot Encoding denso)
 # remainder='passthrough' mantém as outras colunas (acumulado_chuva_1_h_mm)
-# sparse_output=False para compatibilidade com alguns estimadores ou para inspeção mais fácil
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False), ['cod_estacao'])
-    ],
-    remainder='passthrough'
-)
-print("Pré-processador definido.")
+# Com milhares de estações, 'onehot_esparso', 'ordinal', 'alvo' ou 'geo' evitam a matriz densa linhas x estações
+preprocessor = construir_preprocessador(args.codificacao_estacao, df)
+print(f"Pré-processador definido (codificação de estação: {args.codificacao_estacao}).")
 
 # Criar o pipeline para Random Forest com pré-processamento
 # Usaremos os mesmos hiperparâmetros do notebook para consistência
@@ -53,14 +109,52 @@ pipeline_rf_clf = Pipeline(steps=[
 ])
 print("Pipeline do Random Forest criado.")
 
+def treinar_pipeline(pipeline, X_treino, y_treino, nome_etapa='treino_modelo', cache=True):
+    # Dados e hiperparâmetros idênticos a um treino anterior: reaproveita o artefato do cache.
+    # cache=False (modelos descartáveis, como o de validação) treina sem consultar nem ocupar o cache
+    inicio = time.perf_counter()
+    with perfilador.etapa(nome_etapa, linhas=len(X_treino)):
+        pipeline, do_cache, chave = treinar_com_cache(pipeline, X_treino, y_treino, args.diretorio_cache,
+                                                     usar_cache=cache and not args.sem_cache, guardar=cache,
+                                                     limite_mb=args.limite_cache_mb)
+    if do_cache:
+        print(f"Modelo reaproveitado do cache de artefatos (chave {chave[:12]}) em {time.perf_counter() - inicio:.2f} s; "
+              f"treino ignorado (use --sem-cache para forçar).")
+    elif cache:
+        print(f"Treino concluído em {time.perf_counter() - inicio:.2f} s (artefato {chave[:12]} guardado no cache).")
+    else:
+        print(f"Treino concluído em {time.perf_counter() - inicio:.2f} s.")
+    return pipeline
+
+
+def treinar_pipeline_final(hiperparametros):
+    pipeline_rf_clf.set_params(**{f'classifier__{nome}': valor for nome, valor in hiperparametros.items()})
+    return treinar_pipeline(pipeline_rf_clf, X, y)
+
 # Treinar o modelo com todos os dados disponíveis
-print("Treinando o pipeline do Random Forest com todos os dados...")
-try:
-    pipeline_rf_clf.fit(X, y)
-    print("Pipeline treinado com sucesso.")
-except Exception as e:
-    print(f"Erro durante o treinamento do pipeline: {e}")
-    exit()
+if args.validacao_temporal:
+    # Folds temporais e grade em um pool de processos; o modelo final é treinado ao mesmo tempo
+    # no processo principal (ou logo após, com a melhor combinação, quando há grade)
+    lacuna_horas = args.lacuna_horas if args.lacuna_horas is not None else max([LACUNA_HORAS_PADRAO] + (args.janelas or []))
+    print("Treinando o pipeline do Random Forest com todos os dados e validação temporal...")
+    try:
+        grade = interpretar_grade(args.grade)
+        with perfilador.etapa('validacao_temporal', linhas=len(X)):
+            pipeline_rf_clf, resultados_cv, melhor_cv, folds_cv, tempo_final = executar_validacao_temporal(
+                X, y, df['datahora_utc_hora'], lambda: construir_preprocessador(args.codificacao_estacao, df),
+                treinar_pipeline_final, grade, args.folds, lacuna_horas, args.n_jobs)
+        print(f"Pipeline treinado com sucesso em {tempo_final:.2f} s (hiperparâmetros: {grade[melhor_cv]}).")
+    except Exception as e:
+        print(f"Erro durante o treinamento com validação temporal: {e}")
+        exit()
+else:
+    print("Treinando o pipeline do Random Forest com todos os dados...")
+    try:
+        pipeline_rf_clf = treinar_pipeline(pipeline_rf_clf, X, y)
+        print("Pipeline treinado com sucesso.")
+    except Exception as e:
+        print(f"Erro durante o treinamento do pipeline: {e}")
+        exit()
 
 # Salvar o pipeline treinado
 model_dir = 'ml_model'
@@ -71,63 +165,100 @@ if not os.path.exists(model_dir):
 model_filename = os.path.join(model_dir, 'cemaden_flood_risk_model_pipeline.joblib')
 print(f"Salvando o pipeline treinado em {model_filename}...")
 try:
-    joblib.dump(pipeline_rf_clf, model_filename)
+    with perfilador.etapa('gravacao_modelo'):
+        joblib.dump(pipeline_rf_clf, model_filename)
     print(f"Pipeline salvo com sucesso em {model_filename}")
 except Exception as e:
     print(f"Erro ao salvar o pipeline: {e}")
     exit()
 
+# Exportar a floresta compacta (árvores e one-hot em arrays contíguos) usada pelo simulador
+compact_filename = caminho_floresta_compacta(model_filename)
+try:
+    with perfilador.etapa('exportacao_floresta_compacta'):
+        exportar_floresta_compacta(pipeline_rf_clf, compact_filename)
+    print(f"Floresta compacta exportada em {compact_filename} ({os.path.getsize(compact_filename) / 1024:.0f} KB)")
+except ValueError as e:
+    # Codificações sem one-hot: o simulador usa o pipeline; remove uma exportação antiga, se houver
+    print(f"Floresta compacta não exportada: {e}")
+    if os.path.exists(compact_filename):
+        os.remove(compact_filename)
+except Exception as e:
+    print(f"Erro ao exportar a floresta compacta: {e}")
+
 # --- Seção de Geração de Relatório de Validação ---
 print("\nGerando relatório de validação...")
 
-# Dividir dados para avaliação (não afeta o modelo principal já treinado com todos os dados)
-# Usamos as mesmas features X e target y globais
-X_train_val, X_test_val, y_train_val, y_test_val = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
-
-# Criar e treinar um pipeline temporário para validação
-# (poderíamos também carregar o modelo salvo e prever, mas treinar um novo garante que as métricas são de um modelo treinado em um subset)
-print("Treinando um pipeline temporário para gerar métricas de validação...")
-pipeline_val = Pipeline(steps=[
-    ('preprocessor', preprocessor), # Reutiliza o preprocessor definido anteriormente
-    ('classifier', RandomForestClassifier(random_state=42, n_estimators=100))
-])
+if args.validacao_temporal:
+    # As métricas já vêm da validação temporal; nenhum modelo extra é treinado
+    report_content = f"Relatório de Validação do Modelo (Random Forest com Features de Localidade)\n"
+    report_content += f"-----------------------------------------------------------------------\n"
+    report_content += f"Data da Geração: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+    report_content += f"Codificação de Estação: {args.codificacao_estacao}\n"
+    report_content += f"Modelo final: {grade[melhor_cv]}, treinado com todos os dados em {tempo_final:.2f} s\n\n"
+    report_content += relatorio_validacao_temporal(resultados_cv, melhor_cv, grade, folds_cv, lacuna_horas)
+    report_filename = os.path.join(model_dir, 'model_validation_report.txt')
+    try:
+        with open(report_filename, 'w') as f:
+            f.write(report_content)
+        print(f"Relatório de validação salvo em {report_filename}")
+    except Exception as e:
+        print(f"Erro ao salvar o relatório de validação: {e}")
+else:
+    # Dividir dados para avaliação (não afeta o modelo principal já treinado com todos os dados)
+    # Usamos as mesmas features X e target y globais
+    X_train_val, X_test_val, y_train_val, y_test_val = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
 
-try:
-    pipeline_val.fit(X_train_val, y_train_val)
-    y_pred_val = pipeline_val.predict(X_test_val)
+    # Criar e treinar um pipeline temporário para validação
+    # (poderíamos também carregar o modelo salvo e prever, mas treinar um novo garante que as métricas são de um modelo treinado em um subset)
+    print("Treinando um pipeline temporário para gerar métricas de validação...")
+    pipeline_val = Pipeline(steps=[
+        ('preprocessor', construir_preprocessador(args.codificacao_estacao, df)), # Mesma codificação, sem alterar o pipeline salvo
+        ('classifier', RandomForestClassifier(random_state=42, n_estimators=100))
+    ])
 
-    # Gerar métricas
-    from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+    try:
+        pipeline_val = treinar_pipeline(pipeline_val, X_train_val, y_train_val, 'treino_validacao', cache=False)
+        with perfilador.etapa('predicao_validacao', linhas=len(X_test_val)):
+            y_pred_val = pipeline_val.predict(X_test_val)
 
-    accuracy_val = accuracy_score(y_test_val, y_pred_val)
-    conf_matrix_val = confusion_matrix(y_test_val, y_pred_val)
-    class_report_val = classification_report(y_test_val, y_pred_val)
+        # Gerar métricas
+        from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 
-    # Preparar conteúdo do relatório
-    report_content = f"Relatório de Validação do Modelo (Random Forest com Features de Localidade)\n"
-    report_content += f"-----------------------------------------------------------------------\n"
-    report_content += f"Data da Geração: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-    report_content += f"Modelo Avaliado em um Split de Teste (20% dos dados totais, estratificado)\n\n"
-    report_content += f"Acurácia no conjunto de teste de validação: {accuracy_val:.4f}\n\n"
-    report_content += f"Matriz de Confusão (Teste de Validação):\n{str(conf_matrix_val)}\n\n"
-    report_content += f"Relatório de Classificação (Teste de Validação):\n{class_report_val}\n"
+        accuracy_val = accuracy_score(y_test_val, y_pred_val)
+        conf_matrix_val = confusion_matrix(y_test_val, y_pred_val)
+        class_report_val = classification_report(y_test_val, y_pred_val)
 
-    # Salvar relatório
-    report_filename = os.path.join(model_dir, 'model_validation_report.txt')
-    with open(report_filename, 'w') as f:
-        f.write(report_content)
-    print(f"Relatório de validação salvo em {report_filename}")
+        # Preparar conteúdo do relatório
+        report_content = f"Relatório de Validação do Modelo (Random Forest com Features de Localidade)\n"
+        report_content += f"-----------------------------------------------------------------------\n"
+        report_content += f"Data da Geração: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        report_content += f"Codificação de Estação: {args.codificacao_estacao}\n"
+        report_content += f"Modelo Avaliado em um Split de Teste (20% dos dados totais, estratificado)\n\n"
+        report_content += f"Acurácia no conjunto de teste de validação: {accuracy_val:.4f}\n\n"
+        report_content += f"Matriz de Confusão (Teste de Validação):\n{str(conf_matrix_val)}\n\n"
+        report_content += f"Relatório de Classificação (Teste de Validação):\n{class_report_val}\n"
 
-except Exception as e:
-    print(f"Erro ao gerar ou salvar o relatório de validação: {e}")
+        # Salvar relatório
+        report_filename = os.path.join(model_dir, 'model_validation_report.txt')
+        with open(report_filename, 'w') as f:
+            f.write(report_content)
+        print(f"Relatório de validação salvo em {report_filename}")
+
+    except Exception as e:
+        print(f"Erro ao gerar ou salvar o relatório de validação: {e}")
 
 # --- Seção de Re-treinamento (Exemplo) ---
-def retrain_model_with_new_data(existing_model_path, new_data_path, output_model_path):
+def retrain_model_with_new_data(existing_model_path, new_data_path, output_model_path, incremental=False,
+                                arvores_novas=ARVORES_POR_RETREINO, arvores_max=None):
     """
     Carrega um modelo existente, adiciona novos dados, re-treina e salva o modelo atualizado.
     Assume que new_data_path aponta para um CSV com o mesmo formato dos dados originais.
+    Com incremental=True o modelo existente é reaproveitado: arvores_novas árvores são treinadas
+    só com os dados novos e somadas à floresta (limitada a arvores_max, se informado), sem reler
+    o histórico. Caso contrário um novo pipeline é treinado com o histórico mais os dados novos.
     """
     print(f"\nIniciando processo de re-treinamento...")
     print(f"Carregando modelo existente de: {existing_model_path}")
@@ -140,16 +271,25 @@ def retrain_model_with_new_data(existing_model_path, new_data_path, output_model
         print(f"Erro ao carregar o modelo existente: {e}. Abortando re-treinamento.")
         return
 
+    # Modelos treinados com --janelas precisam das mesmas features de janelas nos dados novos
+    # e o re-treino completo usa a mesma codificação de estação do modelo existente
+    janelas = janelas_do_modelo(pipeline_to_retrain)
+    colunas_modelo = list(getattr(pipeline_to_retrain, 'feature_names_in_', ['acumulado_chuva_1_h_mm', 'cod_estacao']))
+    modo_codificacao = modo_do_preprocessador(pipeline_to_retrain.named_steps['preprocessor'])
+    colunas_carga = COLUNAS_TREINO + (['datahora_utc_hora'] if janelas else [])
+
     print(f"Carregando novos dados de: {new_data_path}")
     try:
-        new_df = pd.read_csv(new_data_path)
+        new_df = carregar_dados_horarios(colunas_carga, caminho=new_data_path)
         if new_df.empty:
             print("Aviso: Arquivo de novos dados está vazio. Nenhum re-treinamento será feito.")
             return
         # Aqui, idealmente, você também processaria os novos dados da mesma forma que os originais
         # (ex: aplicar os mesmos limiares para 'nivel_risco' se não estiver presente)
         # Para este exemplo, assumimos que new_df já está no formato esperado para X_new e y_new.
-        X_new = new_df[['acumulado_chuva_1_h_mm', 'cod_estacao']]
+        if janelas:
+            new_df = pd.concat([new_df, _features_janelas_dados_novos(new_df, janelas)], axis=1)
+        X_new = new_df[colunas_modelo]
         y_new = new_df['nivel_risco']
         print(f"Novos dados carregados. Formato: {new_df.shape}")
     except FileNotFoundError:
@@ -159,49 +299,92 @@ def retrain_model_with_new_data(existing_model_path, new_data_path, output_model
         print(f"Erro ao carregar ou processar novos dados: {e}. Abortando re-treinamento.")
         return
 
-    # Para re-treinar, precisamos dos dados originais com os quais o pipeline foi treinado
-    # ou treinar do zero com dados combinados.
-    # A abordagem mais simples para este exemplo é treinar um NOVO pipeline com os dados combinados.
-    # Se o objetivo fosse ATUALIZAR o modelo existente de forma incremental, seria mais complexo
-    # e dependeria do modelo suportar 'warm_start' ou similar, e o pré-processador também.
+    if incremental:
+        print(f"Re-treinamento incremental: {arvores_novas} árvores novas treinadas apenas com os dados novos...")
+        inicio = time.perf_counter()
+        try:
+            n_desconhecidas = adicionar_arvores(pipeline_to_retrain, X_new, y_new, arvores_novas, arvores_max)
+        except Exception as e:
+            print(f"Erro durante o re-treinamento incremental: {e}")
+            return
+        n_arvores = len(pipeline_to_retrain.named_steps['classifier'].estimators_)
+        print(f"Re-treinamento incremental concluído em {time.perf_counter() - inicio:.2f} s "
+              f"({len(new_df)} linhas novas, floresta com {n_arvores} árvores).")
+        if n_desconhecidas:
+            print(f"Aviso: {n_desconhecidas} estação(ões) dos dados novos não eram conhecidas pelo codificador; "
+                  f"usam a codificação de estação desconhecida até o próximo re-treino completo.")
+        _salvar_pipeline_retreinado(pipeline_to_retrain, output_model_path)
+        return
+
+    # Para re-treinar do zero, precisamos dos dados originais com os quais o pipeline foi treinado
+    # combinados com os dados novos (o custo cresce com o histórico acumulado).
 
     print("Combinando dados existentes (usados no último treino completo) com novos dados...")
     # Recarregando os dados originais para combinar
     # NOTA: Esta é uma simplificação. Em um cenário real, você gerenciaria o dataset de treino de forma mais robusta.
+    inicio = time.perf_counter()
     try:
-        original_df_for_retrain = pd.read_csv('data/cemaden_official_processed_hourly.csv')
-        combined_df = pd.concat([original_df_for_retrain, new_df], ignore_index=True)
-        
-        X_combined = combined_df[['acumulado_chuva_1_h_mm', 'cod_estacao']]
-        y_combined = combined_df['nivel_risco']
+        # As coordenadas do modo geo vêm do dataset horário; as linhas novas não precisam trazê-las
+        original_df_for_retrain = carregar_dados_horarios(colunas_carga + colunas_extras_codificacao(modo_codificacao))
+        combined_df = pd.concat([original_df_for_retrain, new_df[colunas_carga]], ignore_index=True)
+        if janelas:
+            combined_df = adicionar_features_janelas(combined_df, janelas)
+
+        X_combined = combined_df[colunas_modelo]
+        y_combined = combined_df['nivel_risco'].astype('int64')
         print(f"Dados combinados. Formato total: {combined_df.shape}")
     except Exception as e:
         print(f"Erro ao carregar ou combinar dados originais para re-treinamento: {e}")
         return
 
-    print(f"Re-treinando o pipeline com dados combinados...")
-    # Reutiliza a definição do pipeline_rf_clf, mas treina com os dados combinados
-    # É importante que o preprocessor seja 'fitado' nos dados combinados também.
+    print(f"Re-treinando o pipeline com dados combinados (codificação de estação: {modo_codificacao}, "
+          f"janelas: {list(janelas) or 'nenhuma'})...")
+    # Mesmo pré-processador (remontado com os dados combinados) e mesmos hiperparâmetros do classificador
     pipeline_retrained = Pipeline(steps=[
-        ('preprocessor', ColumnTransformer(
-            transformers=[('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False), ['cod_estacao'])],
-            remainder='passthrough')),
-        ('classifier', RandomForestClassifier(random_state=42, n_estimators=100))
+        ('preprocessor', construir_preprocessador(modo_codificacao, combined_df)),
+        ('classifier', clone(pipeline_to_retrain.named_steps['classifier']).set_params(warm_start=False))
     ])
-    
+
     try:
         pipeline_retrained.fit(X_combined, y_combined)
-        print("Pipeline re-treinado com sucesso com dados combinados.")
+        print(f"Pipeline re-treinado com sucesso com dados combinados em {time.perf_counter() - inicio:.2f} s "
+              f"({len(combined_df)} linhas).")
     except Exception as e:
         print(f"Erro durante o re-treinamento do pipeline: {e}")
         return
 
+    _salvar_pipeline_retreinado(pipeline_retrained, output_model_path)
+
+
+def _features_janelas_dados_novos(new_df, janelas):
+    # As primeiras horas dos dados novos usam como contexto as últimas horas de cada estação no
+    # dataset horário (quando existe), como o treino original, em vez de começar as janelas do zero
+    horas_novas = pd.to_datetime(new_df['datahora_utc_hora'])
+    try:
+        historico = carregar_dados_horarios(['cod_estacao', 'datahora_utc_hora', 'acumulado_chuva_1_h_mm'],
+                                            inicio=horas_novas.min() - pd.Timedelta(hours=max(janelas) - 1),
+                                            fim=horas_novas.min() - pd.Timedelta(hours=1),
+                                            estacoes=new_df['cod_estacao'].astype(str).unique().tolist())
+        historico['datahora_utc_hora'] = pd.to_datetime(historico['datahora_utc_hora'])
+    except FileNotFoundError:
+        historico = None
+    features, _ = atualizar_features_janelas(historico, new_df.assign(datahora_utc_hora=horas_novas), janelas)
+    return features
+
+
+def _salvar_pipeline_retreinado(pipeline_retrained, output_model_path):
     print(f"Salvando o pipeline re-treinado em: {output_model_path}")
     try:
         joblib.dump(pipeline_retrained, output_model_path)
         print(f"Pipeline re-treinado salvo com sucesso em {output_model_path}")
     except Exception as e:
         print(f"Erro ao salvar o pipeline re-treinado: {e}")
+        return
+    # Mantém a floresta compacta do modelo re-treinado em dia com o pipeline
+    try:
+        exportar_floresta_compacta(pipeline_retrained, caminho_floresta_compacta(output_model_path))
+    except ValueError:
+        pass
 
 if __name__ == "__main__":
     print("\n--- Teste da Função de Re-treinamento ---")
@@ -210,7 +393,8 @@ if __name__ == "__main__":
     dummy_data_for_retrain = {
         'acumulado_chuva_1_h_mm': [10.0, 20.0, 3.0, 30.0],
         'cod_estacao': ['355030801A', '355030802A', '355030801A', '355030803A'], # Usar códigos de estação existentes ou novos
-        'nivel_risco': [1, 2, 0, 2]
+        'nivel_risco': [1, 2, 0, 2],
+        'datahora_utc_hora': ['2025-06-01 00:00:00', '2025-06-01 00:00:00', '2025-06-01 01:00:00', '2025-06-01 00:00:00']
     }
     dummy_df = pd.DataFrame(dummy_data_for_retrain)
     
@@ -231,11 +415,14 @@ if __name__ == "__main__":
         retrained_model_output_path = os.path.join(model_dir, 'cemaden_flood_risk_model_pipeline_retrained_dummy_test.joblib')
 
         if os.path.exists(main_model_path):
-            retrain_model_with_new_data(
-                existing_model_path=main_model_path, # Usa o modelo treinado com todos os dados
-                new_data_path=dummy_data_filename,
-                output_model_path=retrained_model_output_path
-            )
+            with perfilador.etapa('teste_retreino'):
+                retrain_model_with_new_data(
+                    existing_model_path=main_model_path, # Usa o modelo treinado com todos os dados
+                    new_data_path=dummy_data_filename,
+                    output_model_path=retrained_model_output_path,
+                    incremental=args.retreino_incremental,
+                    arvores_novas=args.arvores_retreino
+                )
             
             # Verificar se o modelo re-treinado foi salvo
             if os.path.exists(retrained_model_output_path):
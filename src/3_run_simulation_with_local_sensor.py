@@ -1,8 +1,14 @@
+import argparse
+import os
 import random
 import time
-import joblib
-import numpy as np
-import pandas as pd
+
+# Só NumPy é carregado na partida: joblib, pandas e o sklearn (via inferencia_lote) são importados
+# quando necessários, ou seja, sem floresta compacta ou com features de janelas móveis
+from features_chuva import BufferJanelas, atualizar_features_janelas, janelas_do_modelo, nomes_features_janelas
+from floresta_compacta import FlorestaCompacta, caminho_floresta_compacta, carregar_floresta_compacta
+from motor_alertas import MotorAlertas
+from perfilador_etapas import PERFILADOR_INATIVO, adicionar_argumentos_metricas, criar_perfilador
 
 # --- Configurações da Simulação ---
 INTENSIDADES = ["Leve", "Moderada", "Forte", "Extrema"]
@@ -23,15 +29,41 @@ def simular_evento_chuva():
 
 # --- Função para carregar modelo treinado ---
 def carregar_modelo(path_modelo):
-    return joblib.load(path_modelo)
+    # Usa a floresta compacta exportada no treino quando ela está ao lado do pipeline e não é mais
+    # antiga que ele: mesmas predições, carga mais rápida e sem percorrer as árvores do sklearn.
+    # Os arrays são mapeados do arquivo (mmap), então vários processos compartilham uma cópia
+    caminho_compacto = caminho_floresta_compacta(path_modelo)
+    if os.path.exists(caminho_compacto) and (not os.path.exists(path_modelo) or
+                                             os.path.getmtime(caminho_compacto) >= os.path.getmtime(path_modelo)):
+        return carregar_floresta_compacta(caminho_compacto, mmap=True)
+    import joblib
+    return joblib.load(path_modelo, mmap_mode='r')
 
 # --- Função para predição do modelo ML ---
-def prever_risco_ml(modelo, acumulado_chuva_1_h_mm, cod_estacao):
-    X = pd.DataFrame([{
-        "acumulado_chuva_1_h_mm": acumulado_chuva_1_h_mm,
-        "cod_estacao": cod_estacao
-    }])
-    pred = modelo.predict(X)[0]
+_AVISO_SEM_HISTORICO = False
+
+def prever_risco_ml(modelo, acumulado_chuva_1_h_mm, cod_estacao, features_janelas=None):
+    # features_janelas: dicionário com as features de janelas móveis, quando o modelo foi treinado com elas
+    # A predição usa o preditor em lote do modelo (mapa do one-hot em cache, sem DataFrame por chamada)
+    if isinstance(modelo, FlorestaCompacta):
+        preditor = modelo
+    else:
+        from inferencia_lote import obter_preditor
+        preditor = obter_preditor(modelo)
+    janelas = janelas_do_modelo(modelo)
+    if features_janelas is None and janelas:
+        # Sem histórico do sensor: as janelas contêm apenas a leitura atual (demais horas com 0 mm),
+        # o que no treino só acontece na primeira hora de cada estação. Quem pontua uma sequência de
+        # leituras deve passar as features de um histórico (atualizar_features_janelas ou BufferJanelas)
+        global _AVISO_SEM_HISTORICO
+        if not _AVISO_SEM_HISTORICO:
+            _AVISO_SEM_HISTORICO = True
+            print(f"Aviso: modelo com janelas móveis ({', '.join(f'{w} h' for w in janelas)}) pontuado sem histórico "
+                  f"do sensor; as janelas usam só a leitura atual e a predição pode divergir da do treino.")
+        features_janelas = {nome: (acumulado_chuva_1_h_mm if nome.endswith('_soma_mm') else max(acumulado_chuva_1_h_mm, 0.0))
+                            for nome in nomes_features_janelas(janelas)}
+    extras = {nome: [valor] for nome, valor in features_janelas.items()} if features_janelas else None
+    pred = preditor.prever([cod_estacao], [acumulado_chuva_1_h_mm], extras)[0]
     return int(pred)
 
 # --- Função para decisão combinada ---
@@ -52,27 +84,66 @@ def exibir_alerta(risco_final):
     print(f"ALERTA: Nível de risco = {risco_final} ({cores[risco_final]}) | Alerta sonoro: {sons[risco_final]}")
 
 # --- Loop principal de simulação ---
-def main():
+def main(perfilador=None):
+    # perfilador mede a carga do modelo e, por ciclo, as features e a predição (sem a pausa do ciclo)
+    perfilador = perfilador or PERFILADOR_INATIVO
     print("=== FloodGuard - Simulação de Sensor Local (ESP32 em Python) ===")
-    modelo = carregar_modelo("ml_model/cemaden_flood_risk_model_pipeline.joblib")
+    with perfilador.etapa('carga_modelo'):
+        modelo = carregar_modelo("ml_model/cemaden_flood_risk_model_pipeline.joblib")
+    # Se o modelo usa features de janelas móveis, elas são atualizadas incrementalmente a cada ciclo
+    # (cada ciclo representa uma nova hora do sensor) com o mesmo código usado no treino
+    janelas = janelas_do_modelo(modelo)
+    historico_janelas = None
+    # O alerta só é emitido quando o nível muda: sobe na hora, mas só desce depois de alguns ciclos
+    # abaixo dele (histerese), para não alertar a cada ciclo com a chuva oscilando em um limiar
+    motor_alertas = MotorAlertas([SENSOR_COD_ESTACAO])
+    if janelas:
+        import pandas as pd
+        hora_simulada = pd.Timestamp.now(tz='UTC').tz_localize(None).floor('h')
     for ciclo in range(SIM_DURATION):
         print(f"\n[Ciclo {ciclo+1}]")
         intensidade_local, mm_h_local = simular_evento_chuva()
         print(f"Chuva local: Intensidade = {intensidade_local} | Acumulado 1h = {mm_h_local} mm")
-        risco_ml = prever_risco_ml(modelo, mm_h_local, SENSOR_COD_ESTACAO)
+        features_janelas = None
+        if janelas:
+            nova_hora = pd.DataFrame([{'cod_estacao': SENSOR_COD_ESTACAO,
+                                       'datahora_utc_hora': hora_simulada + pd.Timedelta(hours=ciclo),
+                                       'acumulado_chuva_1_h_mm': mm_h_local}])
+            with perfilador.etapa('features_janelas', linhas=1):
+                features, historico_janelas = atualizar_features_janelas(historico_janelas, nova_hora, janelas)
+                features_janelas = features.iloc[0].to_dict()
+        with perfilador.etapa('predicao_ml', linhas=1):
+            risco_ml = prever_risco_ml(modelo, mm_h_local, SENSOR_COD_ESTACAO, features_janelas)
         print(f"Predição do modelo ML (dados locais simulados): Nível de risco = {risco_ml}")
         risco_final = determinar_risco_final(risco_ml, intensidade_local, mm_h_local)
-        exibir_alerta(risco_final)
+        transicoes = motor_alertas.processar_ciclo([risco_ml], [intensidade_local])
+        if len(transicoes):
+            exibir_alerta(int(transicoes.nivel_novo[0]))
+        else:
+            print(f"Alerta mantido: nível {motor_alertas.nivel[0]} (risco final do ciclo = {risco_final})")
         time.sleep(1)  # Pausa para simular tempo real
 
-import sys
-
-def testar_simulador():
+def testar_simulador(perfilador=None):
+    perfilador = perfilador or PERFILADOR_INATIVO
     print("=== Teste de Verificação do Simulador FloodGuard ===")
-    modelo = carregar_modelo("ml_model/cemaden_flood_risk_model_pipeline.joblib")
+    with perfilador.etapa('carga_modelo'):
+        modelo = carregar_modelo("ml_model/cemaden_flood_risk_model_pipeline.joblib")
+    # Os dois testes são horas seguidas do mesmo sensor; modelos com janelas recebem o histórico delas
+    janelas = janelas_do_modelo(modelo)
+    buffer_janelas = BufferJanelas(janelas) if janelas else None
+    hora_teste = int(time.time() // 3600)
+
+    def prever_hora(mm_h, hora):
+        features_janelas = None
+        if buffer_janelas is not None:
+            features = buffer_janelas.atualizar([SENSOR_COD_ESTACAO], [hora], [mm_h])
+            features_janelas = {nome: float(valores[0]) for nome, valores in features.items()}
+        return prever_risco_ml(modelo, mm_h, SENSOR_COD_ESTACAO, features_janelas)
+
     # Teste 1: Intensidade Leve (espera-se risco baixo)
     intensidade, mm_h = "Leve", 2.0
-    risco_ml = prever_risco_ml(modelo, mm_h, SENSOR_COD_ESTACAO)
+    with perfilador.etapa('predicao_ml', linhas=1):
+        risco_ml = prever_hora(mm_h, hora_teste)
     risco_final = determinar_risco_final(risco_ml, intensidade, mm_h)
     print(f"Teste 1 - Intensidade: {intensidade}, mm/h: {mm_h}")
     print(f"Risco ML: {risco_ml}, Risco Final: {risco_final}")
@@ -80,7 +151,8 @@ def testar_simulador():
 
     # Teste 2: Intensidade Extrema (espera-se risco alto)
     intensidade, mm_h = "Extrema", 50.0
-    risco_ml = prever_risco_ml(modelo, mm_h, SENSOR_COD_ESTACAO)
+    with perfilador.etapa('predicao_ml', linhas=1):
+        risco_ml = prever_hora(mm_h, hora_teste + 1)
     risco_final = determinar_risco_final(risco_ml, intensidade, mm_h)
     print(f"Teste 2 - Intensidade: {intensidade}, mm/h: {mm_h}")
     print(f"Risco ML: {risco_ml}, Risco Final: {risco_final}")
@@ -89,7 +161,12 @@ def testar_simulador():
     print("Todos os testes passaram com sucesso.")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "test":
-        testar_simulador()
+    parser = argparse.ArgumentParser(description="Simulação do sensor local FloodGuard.")
+    parser.add_argument('modo', nargs='?', choices=['test'], help="'test' roda a verificação do simulador.")
+    adicionar_argumentos_metricas(parser)
+    args = parser.parse_args()
+    perfilador = criar_perfilador('simulacao', args)
+    if args.modo == "test":
+        testar_simulador(perfilador)
     else:
-        main()
+        main(perfilador)
@@ -0,0 +1,239 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from armazenamento_horario import (MENSAGEM_DADOS_HORARIOS_AUSENTES, artefato_atualizado, assinatura_dados_horarios,
+                                   caminho_dados_horarios, carregar_dados_horarios, garantir_artefato_derivado,
+                                   ler_metadados_artefato, preparar_diretorio_temporario, publicar_artefato_derivado)
+
+# Agregados materializados do dataset horário por estação e dia e por estação e mês (dia e mês
+# civis de Brasília, como as colunas ano/mes/dia e as partições Parquet). Cada linha guarda um
+# estado combinável: soma e contagem de horas, máximo e histograma de nivel_risco. Estados de
+# períodos menores se combinam nos maiores (dias em meses, meses em anos) e estados de estações nos
+# dos municípios, de modo que as consultas nunca voltam às leituras horárias.
+DIRETORIO_AGREGADOS_PADRAO = os.path.join('data', 'agregados_horarios')
+VERSAO_AGREGADOS = 1
+COLUNAS_HISTOGRAMA = ['horas_risco_baixo', 'horas_risco_moderado', 'horas_risco_alto']
+COLUNAS_SOMAVEIS = ['soma_chuva_mm', 'horas'] + COLUNAS_HISTOGRAMA
+COLUNAS_ESTADO = ['soma_chuva_mm', 'horas', 'max_chuva_mm'] + COLUNAS_HISTOGRAMA
+COLUNAS_LEITURA = ['cod_estacao', 'municipio', 'datahora_utc_hora', 'acumulado_chuva_1_h_mm', 'nivel_risco']
+PERIODOS = ('dia', 'mes', 'ano')
+NIVEIS = ('estacao', 'municipio')
+
+_FUSO_BRASILIA = np.timedelta64(3, 'h')
+
+
+def _dia_brasilia(datahora_utc):
+    # Dia civil de Brasília (UTC-3) de cada hora UTC, como datetime64[ns] à meia-noite
+    horas = pd.to_datetime(pd.Series(datahora_utc)).to_numpy(dtype='datetime64[ns]')
+    return (horas - _FUSO_BRASILIA).astype('datetime64[D]').astype('datetime64[ns]')
+
+
+def _inicio_periodo(dias, periodo):
+    unidade = {'dia': 'D', 'mes': 'M', 'ano': 'Y'}[periodo]
+    return np.asarray(dias, dtype='datetime64[ns]').astype(f'datetime64[{unidade}]').astype('datetime64[ns]')
+
+
+def combinar_estados(estados, chaves):
+    """Combina estados agrupando pelas colunas chaves: somas e contagens somam, máximos pelo máximo."""
+    grupos = estados.groupby(chaves, sort=True, observed=True)
+    combinado = grupos[COLUNAS_SOMAVEIS].sum()
+    combinado['max_chuva_mm'] = grupos['max_chuva_mm'].max()
+    return combinado[COLUNAS_ESTADO]
+
+
+def estados_diarios(df_horario):
+    """Estados por (cod_estacao, dia) das linhas horárias, mais a tabela cod_estacao -> municipio."""
+    # Agrupa pelos códigos inteiros das estações; os textos só são montados para as linhas do resultado
+    codigos, estacoes = pd.factorize(df_horario['cod_estacao'])
+    estacoes = np.asarray(estacoes).astype(str)
+    nivel = df_horario['nivel_risco'].to_numpy()
+    chuva = df_horario['acumulado_chuva_1_h_mm'].to_numpy(dtype='float64')
+    linhas = pd.DataFrame({
+        'estacao': codigos, 'dia': _dia_brasilia(df_horario['datahora_utc_hora']),
+        'soma_chuva_mm': chuva, 'horas': np.ones(len(chuva), dtype='int32'), 'max_chuva_mm': chuva,
+        **{nome: (nivel == k).astype('int32') for k, nome in enumerate(COLUNAS_HISTOGRAMA)},
+    })
+    diario = combinar_estados(linhas, ['estacao', 'dia'])
+    diario.index = pd.MultiIndex.from_arrays([estacoes[diario.index.get_level_values(0)],
+                                              diario.index.get_level_values(1)], names=['cod_estacao', 'dia'])
+
+    ultima_linha = pd.Series(codigos).drop_duplicates(keep='last')
+    municipios = (df_horario['municipio'].iloc[ultima_linha.index].astype(str).to_numpy()
+                  if 'municipio' in df_horario else '')
+    estacoes = pd.Series(municipios, index=pd.Index(estacoes[ultima_linha.to_numpy()], name='cod_estacao'),
+                         name='municipio')
+    return diario.sort_index(), estacoes.sort_index()
+
+
+def estados_mensais(diario):
+    """Estados por (cod_estacao, mes) combinados a partir dos estados diários."""
+    dias = diario.reset_index()
+    dias['mes'] = _inicio_periodo(dias['dia'], 'mes')
+    return combinar_estados(dias, ['cod_estacao', 'mes'])
+
+
+def salvar_agregados(diario, mensal, estacoes, diretorio=DIRETORIO_AGREGADOS_PADRAO, assinatura=None):
+    """Grava os estados diários e mensais e a tabela de estações."""
+    temporario = preparar_diretorio_temporario(diretorio)
+    diario.to_pickle(os.path.join(temporario, 'diario.pkl'))
+    mensal.to_pickle(os.path.join(temporario, 'mensal.pkl'))
+    estacoes.to_pickle(os.path.join(temporario, 'estacoes.pkl'))
+    dias = diario.index.get_level_values('dia')
+    return publicar_artefato_derivado(temporario, diretorio, {
+        'versao': VERSAO_AGREGADOS, 'estacoes': len(estacoes), 'estados_diarios': len(diario),
+        'estados_mensais': len(mensal), 'horas': int(diario['horas'].sum()),
+        'primeiro_dia': str(dias.min().date()) if len(dias) else None,
+        'ultimo_dia': str(dias.max().date()) if len(dias) else None, 'origem': assinatura})
+
+
+def construir_agregados(df_horario=None, diretorio=DIRETORIO_AGREGADOS_PADRAO, caminho=None, assinatura=None):
+    """
+    Calcula todos os estados a partir de df_horario ou, sem ele, do dataset horário (lendo só as
+    colunas necessárias) e grava os agregados.
+    """
+    if df_horario is None:
+        caminho, _ = caminho_dados_horarios(caminho)
+        assinatura = assinatura_dados_horarios(caminho)
+        df_horario = carregar_dados_horarios(colunas=COLUNAS_LEITURA, caminho=caminho)
+    diario, estacoes = estados_diarios(df_horario)
+    return salvar_agregados(diario, estados_mensais(diario), estacoes, diretorio, assinatura)
+
+
+def atualizar_agregados(df_afetado, chaves_removidas, diretorio=DIRETORIO_AGREGADOS_PADRAO, caminho=None):
+    """
+    Recalcula apenas os dias (estação, dia) que contêm grupos (estação, hora) recalculados ou
+    removidos pela ingestão incremental e os meses que contêm esses dias. Deve ser chamada depois que
+    o dataset horário foi atualizado: as horas desses dias são lidas dele (no Parquet, só as
+    partições e estações envolvidas); os meses são recombinados a partir dos estados diários.
+    Retorna o número de estados diários recalculados.
+    """
+    agregados = AgregadosHorarios(diretorio)
+    codigos, horas = [chaves_removidas.get_level_values(0).astype(str)], [chaves_removidas.get_level_values(1)]
+    if df_afetado is not None:
+        codigos.append(df_afetado['cod_estacao'].astype(str))
+        horas.append(pd.to_datetime(df_afetado['datahora_utc_hora']))
+    codigos = np.concatenate([np.asarray(c) for c in codigos])
+    if len(codigos) == 0:
+        return 0
+    dias = _dia_brasilia(np.concatenate([np.asarray(h, dtype='datetime64[ns]') for h in horas]))
+    caminho, _ = caminho_dados_horarios(caminho)
+    dias_afetados = pd.MultiIndex.from_arrays([codigos, dias], names=['cod_estacao', 'dia']).unique()
+
+    inicio = dias.min() + _FUSO_BRASILIA
+    fim = dias.max() + np.timedelta64(1, 'D') + _FUSO_BRASILIA - np.timedelta64(1, 'h')
+    df_horas = carregar_dados_horarios(colunas=COLUNAS_LEITURA, inicio=inicio, fim=fim,
+                                       estacoes=np.unique(codigos).tolist(), caminho=caminho)
+    chaves_linhas = pd.MultiIndex.from_arrays([df_horas['cod_estacao'].astype(str).to_numpy(),
+                                               _dia_brasilia(df_horas['datahora_utc_hora'])])
+    novos_diarios, novas_estacoes = estados_diarios(df_horas[chaves_linhas.isin(dias_afetados)])
+
+    # Dias que ficaram sem nenhuma hora simplesmente somem
+    diario = agregados.diario[~agregados.diario.index.isin(dias_afetados)]
+    diario = pd.concat([diario, novos_diarios]).sort_index()
+    meses_afetados = pd.MultiIndex.from_arrays([dias_afetados.get_level_values(0),
+                                                _inicio_periodo(dias_afetados.get_level_values(1), 'mes')]).unique()
+    dias_do_diario = diario.index
+    meses_do_diario = pd.MultiIndex.from_arrays([dias_do_diario.get_level_values(0),
+                                                 _inicio_periodo(dias_do_diario.get_level_values(1), 'mes')])
+    novos_mensais = estados_mensais(diario[meses_do_diario.isin(meses_afetados)])
+    mensal = pd.concat([agregados.mensal[~agregados.mensal.index.isin(meses_afetados)], novos_mensais]).sort_index()
+    estacoes = pd.concat([agregados.estacoes[~agregados.estacoes.index.isin(novas_estacoes.index)],
+                          novas_estacoes]).sort_index()
+
+    salvar_agregados(diario, mensal, estacoes, diretorio, assinatura_dados_horarios(caminho))
+    return len(dias_afetados)
+
+
+def agregados_atualizados(diretorio=DIRETORIO_AGREGADOS_PADRAO, caminho=None):
+    """True se os agregados existem, têm a versão atual e correspondem ao dataset horário como ele está."""
+    return artefato_atualizado(diretorio, VERSAO_AGREGADOS, caminho)
+
+
+def abrir_agregados(diretorio=DIRETORIO_AGREGADOS_PADRAO, caminho=None):
+    """Abre os agregados, reconstruindo-os antes se o dataset horário mudou desde a última atualização."""
+    metadados = garantir_artefato_derivado(diretorio, VERSAO_AGREGADOS,
+                                           lambda: construir_agregados(diretorio=diretorio, caminho=caminho),
+                                           "os agregados horários", caminho)
+    if metadados is not None:
+        print(f"Agregados construídos: {metadados['estados_diarios']} estados diários, "
+              f"{metadados['estados_mensais']} mensais.")
+    return AgregadosHorarios(diretorio)
+
+
+class AgregadosHorarios:
+    """
+    Consultas de totais, máximos e contagens de horas por nível de risco por estação ou município e
+    por dia, mês ou ano, respondidas só com os estados materializados (dezenas de milhares de linhas
+    por ano de dados, carregadas inteiras na memória).
+    """
+
+    def __init__(self, diretorio=DIRETORIO_AGREGADOS_PADRAO):
+        self.metadados = ler_metadados_artefato(diretorio)
+        if self.metadados is None:
+            raise FileNotFoundError(f"Agregados não encontrados em {diretorio}.")
+        self.diario = pd.read_pickle(os.path.join(diretorio, 'diario.pkl'))
+        self.mensal = pd.read_pickle(os.path.join(diretorio, 'mensal.pkl'))
+        self.estacoes = pd.read_pickle(os.path.join(diretorio, 'estacoes.pkl'))
+
+    def consultar(self, periodo='mes', nivel='estacao', inicio=None, fim=None, estacoes=None, municipios=None):
+        """
+        Uma linha por (estação ou município, início do período) com inicio <= período <= fim (datas de
+        Brasília, arredondadas para o início do período): soma, horas com leitura, máximo, média
+        por hora com leitura e horas em cada nível de risco.
+        """
+        if periodo not in PERIODOS:
+            raise ValueError(f"Período '{periodo}' inválido. Use um de: {PERIODOS}")
+        if nivel not in NIVEIS:
+            raise ValueError(f"Nível '{nivel}' inválido. Use um de: {NIVEIS}")
+        estados = (self.diario if periodo == 'dia' else self.mensal).reset_index()
+        estados = estados.rename(columns={estados.columns[1]: periodo})
+        if periodo == 'ano':
+            estados[periodo] = _inicio_periodo(estados[periodo], 'ano')
+
+        mascara = np.ones(len(estados), dtype=bool)
+        if inicio is not None:
+            mascara &= estados[periodo].to_numpy() >= _inicio_periodo([pd.Timestamp(inicio).to_datetime64()], periodo)[0]
+        if fim is not None:
+            mascara &= estados[periodo].to_numpy() <= _inicio_periodo([pd.Timestamp(fim).to_datetime64()], periodo)[0]
+        if estacoes is not None:
+            mascara &= estados['cod_estacao'].isin([str(e) for e in estacoes]).to_numpy()
+        estados = estados[mascara]
+        estados['municipio'] = self.estacoes.reindex(estados['cod_estacao']).to_numpy()
+        if municipios is not None:
+            estados = estados[estados['municipio'].isin(municipios)]
+
+        chave = 'cod_estacao' if nivel == 'estacao' else 'municipio'
+        if periodo == 'ano' or nivel == 'municipio':
+            resultado = combinar_estados(estados, [chave, periodo]).reset_index()
+        else:
+            resultado = estados[[chave, periodo] + COLUNAS_ESTADO].reset_index(drop=True)
+        resultado.insert(resultado.columns.get_loc('max_chuva_mm') + 1, 'media_chuva_mm_h',
+                         resultado['soma_chuva_mm'] / resultado['horas'])
+        return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Totais, máximos e horas por nível de risco por estação ou município, a partir dos agregados materializados.")
+    parser.add_argument('--diretorio', default=DIRETORIO_AGREGADOS_PADRAO, help="Diretório dos agregados.")
+    parser.add_argument('--reconstruir', action='store_true', help="Reconstrói os agregados mesmo que estejam atualizados.")
+    parser.add_argument('--periodo', choices=PERIODOS, default='mes')
+    parser.add_argument('--nivel', choices=NIVEIS, default='municipio')
+    parser.add_argument('--inicio', default=None, help="Primeiro período (data de Brasília), ex.: 2025-02-01.")
+    parser.add_argument('--fim', default=None, help="Último período (data de Brasília), ex.: 2025-04-30.")
+    parser.add_argument('--estacao', action='append', default=None, help="Restringe a uma estação (pode ser repetido).")
+    parser.add_argument('--municipio', action='append', default=None, help="Restringe a um município (pode ser repetido).")
+    args = parser.parse_args()
+
+    try:
+        if args.reconstruir:
+            construir_agregados(diretorio=args.diretorio)
+        agregados = abrir_agregados(args.diretorio)
+    except FileNotFoundError:
+        print(MENSAGEM_DADOS_HORARIOS_AUSENTES)
+        raise SystemExit(1)
+    resultado = agregados.consultar(args.periodo, args.nivel, args.inicio, args.fim, args.estacao, args.municipio)
+    print(f"{len(resultado)} linhas ({args.nivel} x {args.periodo}):")
+    print(resultado.to_string(max_rows=30))
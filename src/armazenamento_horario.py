@@ -0,0 +1,362 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 (necessário para o backend Parquet)
+except ImportError:
+    pyarrow = None
+
+CAMINHO_CSV_HORARIO = os.path.join("data", "cemaden_official_processed_hourly.csv")
+CAMINHO_PARQUET_HORARIO = os.path.join("data", "cemaden_official_processed_hourly.parquet")
+
+# Partições do dataset Parquet (ano/mês de Brasília); dentro de cada partição as linhas ficam
+# ordenadas por estação e hora, o que permite pular row groups inteiros ao filtrar por estação.
+COLUNAS_PARTICAO = ['ano', 'mes']
+LINHAS_POR_ROW_GROUP = 128 * 1024
+
+# Tipos compactos usados no armazenamento colunar
+TIPOS_COMPACTOS = {
+    'cod_estacao': 'category',
+    'municipio': 'category',
+    'uf': 'category',
+    'nome_estacao': 'category',
+    'acumulado_chuva_1_h_mm': 'float32',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'ano': 'int16',
+    'mes': 'int8',
+    'dia': 'int8',
+    'hora_brasilia': 'int8',
+    'dia_semana_brasilia': 'int8',
+    'nivel_risco': 'int8',
+}
+
+
+def parquet_disponivel():
+    return pyarrow is not None
+
+
+def compactar_tipos(df):
+    """
+    Converte as colunas conhecidas do dataset horário para os tipos compactos de TIPOS_COMPACTOS
+    (códigos categóricos, inteiros pequenos e float32). Colunas ausentes são ignoradas.
+    """
+    tipos = {col: tipo for col, tipo in TIPOS_COMPACTOS.items() if col in df.columns}
+    df = df.astype(tipos)
+    for col in ['datahora_utc_hora', 'datahora_brasilia_ref']:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def salvar_dados_horarios(df_horario, formato='csv', caminho_csv=CAMINHO_CSV_HORARIO,
+                          caminho_parquet=CAMINHO_PARQUET_HORARIO):
+    """
+    Salva o dataset horário em CSV, em Parquet particionado por ano/mês ou em ambos
+    (formato = 'csv', 'parquet' ou 'ambos'). O dataset Parquet é reescrito por completo.
+    """
+    if formato in ('csv', 'ambos'):
+        os.makedirs(os.path.dirname(caminho_csv) or '.', exist_ok=True)
+        df_horario.to_csv(caminho_csv, index=False, encoding='utf-8')
+        _registrar_ultima_hora_csv(caminho_csv, pd.to_datetime(df_horario['datahora_utc_hora']).max())
+        print(f"Dados processados e agregados salvos em: {caminho_csv}")
+
+    if formato in ('parquet', 'ambos'):
+        if not parquet_disponivel():
+            print("Aviso: pyarrow não está instalado; dataset Parquet não foi gerado (instale com 'pip install pyarrow').")
+            return
+        df_compacto = compactar_tipos(df_horario).sort_values(['ano', 'mes', 'cod_estacao', 'datahora_utc_hora'])
+        if os.path.exists(caminho_parquet):
+            shutil.rmtree(caminho_parquet)
+        df_compacto.to_parquet(caminho_parquet, engine='pyarrow', index=False, partition_cols=COLUNAS_PARTICAO,
+                               max_rows_per_group=LINHAS_POR_ROW_GROUP, min_rows_per_group=LINHAS_POR_ROW_GROUP // 2)
+        print(f"Dados processados salvos em Parquet particionado por {COLUNAS_PARTICAO}: {caminho_parquet}")
+
+
+def _filtros_parquet(inicio, fim, estacoes):
+    # Monta os filtros em forma normal disjuntiva: uma conjunção por mês de Brasília coberto pela
+    # janela, para que o pyarrow descarte partições inteiras antes de ler qualquer arquivo.
+    filtros_comuns = []
+    if inicio is not None:
+        filtros_comuns.append(('datahora_utc_hora', '>=', pd.Timestamp(inicio)))
+    if fim is not None:
+        filtros_comuns.append(('datahora_utc_hora', '<=', pd.Timestamp(fim)))
+    if estacoes is not None:
+        filtros_comuns.append(('cod_estacao', 'in', [str(e) for e in estacoes]))
+
+    if inicio is None or fim is None:
+        return [filtros_comuns] if filtros_comuns else None
+
+    meses = pd.period_range(pd.Timestamp(inicio) - pd.Timedelta(hours=3),
+                            pd.Timestamp(fim) - pd.Timedelta(hours=3), freq='M')
+    return [[('ano', '=', p.year), ('mes', '=', p.month)] + filtros_comuns for p in meses]
+
+
+def caminho_dados_horarios(caminho=None):
+    """
+    Caminho do dataset horário a ler e se ele é Parquet: sem caminho explícito, o dataset Parquet
+    quando ele existe (e o pyarrow está instalado), senão o CSV.
+    """
+    if caminho is None:
+        usar_parquet = parquet_disponivel() and os.path.exists(CAMINHO_PARQUET_HORARIO)
+        return (CAMINHO_PARQUET_HORARIO if usar_parquet else CAMINHO_CSV_HORARIO), usar_parquet
+    return caminho, not caminho.endswith('.csv')
+
+
+def assinatura_dados_horarios(caminho):
+    """
+    Tamanho e data de modificação do CSV ou de todos os arquivos do dataset Parquet: identifica a
+    versão do dataset a partir da qual um artefato derivado (índice de consulta, cubo) foi gerado.
+    """
+    if os.path.isdir(caminho):
+        arquivos = [os.path.join(raiz, nome) for raiz, _, nomes in os.walk(caminho) for nome in nomes]
+    else:
+        arquivos = [caminho]
+    estados = [os.stat(arquivo) for arquivo in arquivos]
+    return {'caminho': os.path.abspath(caminho), 'arquivos': len(estados),
+            'bytes': sum(e.st_size for e in estados), 'mtime_ns': max((e.st_mtime_ns for e in estados), default=0)}
+
+
+def substituir_diretorio(temporario, diretorio):
+    """
+    Troca diretorio pelo temporario já completo. Quem tem os arquivos antigos abertos (mmap)
+    continua lendo-os até reabrir, e novos leitores nunca veem um diretório pela metade.
+    """
+    antigo = diretorio.rstrip(os.sep) + '.antigo'
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(diretorio):
+        os.replace(diretorio, antigo)
+    os.replace(temporario, diretorio)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+
+# Artefatos derivados do dataset horário (índice de consulta, cubo, agregados): cada um é um diretório
+# com um metadados.json que registra a versão do formato e a assinatura do dataset de origem
+MENSAGEM_DADOS_HORARIOS_AUSENTES = "Erro: Dataset horário não encontrado. Execute primeiro o script 1_process_official_data.py."
+
+
+def preparar_diretorio_temporario(diretorio):
+    """Diretório vazio ao lado de diretorio, onde um artefato derivado é montado antes de ser publicado."""
+    temporario = diretorio.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    return temporario
+
+
+def publicar_artefato_derivado(temporario, diretorio, metadados):
+    """
+    Grava metadados.json no temporário já completo e o troca por diretorio, de modo que leitores
+    nunca veem um artefato pela metade.
+    """
+    with open(os.path.join(temporario, 'metadados.json'), 'w') as arquivo:
+        json.dump(metadados, arquivo, indent=2)
+    substituir_diretorio(temporario, diretorio)
+    return metadados
+
+
+def ler_metadados_artefato(diretorio):
+    """Metadados de um artefato derivado, ou None se ele não existir."""
+    caminho_metadados = os.path.join(diretorio, 'metadados.json')
+    if not os.path.exists(caminho_metadados):
+        return None
+    with open(caminho_metadados) as arquivo:
+        return json.load(arquivo)
+
+
+def artefato_atualizado(diretorio, versao, caminho=None, **esperados):
+    """
+    True se o artefato derivado existe, tem a versão dada, foi gerado a partir do dataset horário
+    como ele está e tem nos metadados os valores de esperados (valores None não são conferidos).
+    """
+    metadados = ler_metadados_artefato(diretorio)
+    if metadados is None or metadados.get('versao') != versao:
+        return False
+    if any(valor is not None and metadados.get(chave) != valor for chave, valor in esperados.items()):
+        return False
+    caminho, _ = caminho_dados_horarios(caminho)
+    return os.path.exists(caminho) and metadados.get('origem') == assinatura_dados_horarios(caminho)
+
+
+def garantir_artefato_derivado(diretorio, versao, construir, descricao, caminho=None, **esperados):
+    """
+    Reconstrói o artefato com construir() (que o grava e devolve os metadados) se ele não estiver em
+    dia segundo artefato_atualizado. Retorna os metadados novos, ou None se nada foi reconstruído.
+    """
+    if artefato_atualizado(diretorio, versao, caminho, **esperados):
+        return None
+    print(f"Construindo {descricao} em {diretorio} (ausente ou desatualizado)...")
+    return construir()
+
+
+def carregar_dados_horarios(colunas=None, inicio=None, fim=None, estacoes=None, caminho=None):
+    """
+    Carrega o dataset horário lendo apenas as colunas pedidas e, opcionalmente, apenas a janela
+    [inicio, fim] de 'datahora_utc_hora' e as estações informadas.
+    Sem caminho explícito usa o dataset Parquet quando ele existe (com projeção de colunas e
+    filtros empurrados para a leitura) e cai para o CSV caso contrário.
+    """
+    caminho, usar_parquet = caminho_dados_horarios(caminho)
+
+    if usar_parquet:
+        if not parquet_disponivel():
+            raise ImportError("pyarrow é necessário para ler datasets Parquet (pip install pyarrow).")
+        df = pd.read_parquet(caminho, engine='pyarrow', columns=colunas,
+                             filters=_filtros_parquet(inicio, fim, estacoes))
+        # Colunas de partição voltam como categóricas; restaura os inteiros compactos
+        for col in COLUNAS_PARTICAO:
+            if col in df.columns:
+                df[col] = df[col].astype(TIPOS_COMPACTOS[col])
+        return df
+
+    filtrar_janela = inicio is not None or fim is not None
+    colunas_leitura = None
+    if colunas is not None:
+        colunas_leitura = list(colunas)
+        if filtrar_janela and 'datahora_utc_hora' not in colunas_leitura:
+            colunas_leitura.append('datahora_utc_hora')
+        if estacoes is not None and 'cod_estacao' not in colunas_leitura:
+            colunas_leitura.append('cod_estacao')
+    df = pd.read_csv(caminho, usecols=colunas_leitura)
+
+    mascara = pd.Series(True, index=df.index)
+    if filtrar_janela:
+        horas = pd.to_datetime(df['datahora_utc_hora'])
+        if inicio is not None:
+            mascara &= horas >= pd.Timestamp(inicio)
+        if fim is not None:
+            mascara &= horas <= pd.Timestamp(fim)
+    if estacoes is not None:
+        mascara &= df['cod_estacao'].astype(str).isin([str(e) for e in estacoes])
+    if not mascara.all():
+        df = df[mascara].reset_index(drop=True)
+    return df[colunas] if colunas is not None else df
+
+
+def dados_horarios_existem(formato='csv', caminho_csv=CAMINHO_CSV_HORARIO, caminho_parquet=CAMINHO_PARQUET_HORARIO):
+    existe_csv = os.path.exists(caminho_csv)
+    existe_parquet = os.path.exists(caminho_parquet)
+    if formato == 'csv':
+        return existe_csv
+    if formato == 'parquet':
+        return existe_parquet
+    return existe_csv and existe_parquet
+
+
+def _indice_chaves(df):
+    return pd.MultiIndex.from_arrays([df['cod_estacao'].astype(str), pd.to_datetime(df['datahora_utc_hora'])])
+
+
+def _caminho_ultima_hora_csv(caminho_csv):
+    return caminho_csv + '.ultima_hora.json'
+
+
+def _registrar_ultima_hora_csv(caminho_csv, ultima_hora):
+    # Última hora do CSV, validada pelo tamanho e mtime do arquivo: permite decidir se uma
+    # atualização pode ser anexada ao fim sem reler o CSV
+    estado = os.stat(caminho_csv)
+    with open(_caminho_ultima_hora_csv(caminho_csv), 'w', encoding='utf-8') as f:
+        json.dump({'ultima_hora': None if pd.isna(ultima_hora) else str(ultima_hora),
+                   'bytes': estado.st_size, 'mtime_ns': estado.st_mtime_ns}, f)
+
+
+def _ultima_hora_csv(caminho_csv):
+    estado = os.stat(caminho_csv)
+    try:
+        with open(_caminho_ultima_hora_csv(caminho_csv), encoding='utf-8') as f:
+            registro = json.load(f)
+        if registro['bytes'] == estado.st_size and registro['mtime_ns'] == estado.st_mtime_ns:
+            return pd.Timestamp(registro['ultima_hora']) if registro['ultima_hora'] else pd.NaT
+    except (OSError, ValueError, KeyError):
+        pass
+    # Registro ausente ou de outra versão do arquivo: lê só a coluna de hora
+    return pd.to_datetime(pd.read_csv(caminho_csv, usecols=['datahora_utc_hora'])['datahora_utc_hora']).max()
+
+
+def _atualizar_csv(df_afetado, chaves, caminho_csv):
+    # O CSV não tem partições. Quando todas as chaves afetadas são posteriores à última hora do
+    # arquivo (o caso das atualizações diárias) as linhas novas são só anexadas ao fim; caso
+    # contrário (arquivos antigos corrigidos ou removidos) o CSV inteiro é relido e regravado.
+    # Para que toda atualização incremental custe só o tamanho das partições afetadas, use o
+    # armazenamento Parquet (--formato parquet).
+    ultima_hora = _ultima_hora_csv(caminho_csv)
+    colunas_arquivo = pd.read_csv(caminho_csv, nrows=0).columns
+    horas_chaves = chaves.get_level_values(1)
+    if (not pd.isna(ultima_hora) and (horas_chaves > ultima_hora).all()
+            and (df_afetado is None or set(df_afetado.columns) == set(colunas_arquivo))):
+        if df_afetado is not None and len(df_afetado):
+            df_afetado.sort_values(['cod_estacao', 'datahora_utc_hora'], kind='stable')[list(colunas_arquivo)].to_csv(
+                caminho_csv, mode='a', header=False, index=False, encoding='utf-8')
+        _registrar_ultima_hora_csv(caminho_csv, horas_chaves.max())
+        print(f"CSV horário atualizado: {caminho_csv} ({0 if df_afetado is None else len(df_afetado)} linhas anexadas).")
+        return
+
+    # float_precision='round_trip' garante que os acumulados não mudem na última casa ao regravar
+    df_existente = pd.read_csv(caminho_csv, parse_dates=['datahora_utc_hora', 'datahora_brasilia_ref'],
+                               float_precision='round_trip')
+    df_existente = df_existente[~_indice_chaves(df_existente).isin(chaves)]
+    df_atualizado = pd.concat([df_existente, df_afetado], ignore_index=True) if df_afetado is not None else df_existente
+    df_atualizado.sort_values(['cod_estacao', 'datahora_utc_hora'], inplace=True, kind='stable')
+    df_atualizado.to_csv(caminho_csv, index=False, encoding='utf-8')
+    _registrar_ultima_hora_csv(caminho_csv, pd.to_datetime(df_atualizado['datahora_utc_hora']).max())
+    print(f"CSV horário atualizado: {caminho_csv} ({len(df_atualizado)} linhas, arquivo regravado).")
+
+
+def _atualizar_parquet(df_afetado, chaves, caminho_parquet):
+    # Apenas as partições (ano, mês) que contêm grupos afetados são reescritas
+    horas_brasilia = chaves.get_level_values(1) - pd.Timedelta(hours=3)
+    particoes = sorted(set(zip(horas_brasilia.year, horas_brasilia.month)))
+    df_novo = compactar_tipos(df_afetado) if df_afetado is not None else None
+
+    for ano, mes in particoes:
+        diretorio = os.path.join(caminho_parquet, f"ano={ano}", f"mes={mes}")
+        partes = []
+        if os.path.exists(diretorio):
+            df_existente = pd.read_parquet(diretorio, engine='pyarrow')
+            partes.append(df_existente[~_indice_chaves(df_existente).isin(chaves)])
+        if df_novo is not None:
+            partes.append(df_novo[(df_novo['ano'] == ano) & (df_novo['mes'] == mes)].drop(columns=COLUNAS_PARTICAO))
+        df_particao = pd.concat(partes, ignore_index=True)
+        df_particao = compactar_tipos(df_particao).sort_values(['cod_estacao', 'datahora_utc_hora'])
+
+        # A partição nova é gravada em um temporário no mesmo diretório (o pyarrow ignora nomes
+        # iniciados por '.') e só então substitui parte-0.parquet; as partes antigas são removidas
+        # depois, de modo que uma falha no meio nunca deixa o mês sem dados
+        os.makedirs(diretorio, exist_ok=True)
+        antigas = [nome for nome in os.listdir(diretorio) if nome != 'parte-0.parquet']
+        if len(df_particao):
+            temporario = os.path.join(diretorio, '.parte-0.parquet.tmp')
+            df_particao.to_parquet(temporario, engine='pyarrow', index=False, row_group_size=LINHAS_POR_ROW_GROUP)
+            os.replace(temporario, os.path.join(diretorio, 'parte-0.parquet'))
+        else:
+            antigas.append('parte-0.parquet')
+        for nome in antigas:
+            caminho_antigo = os.path.join(diretorio, nome)
+            if os.path.exists(caminho_antigo):
+                os.remove(caminho_antigo)
+    print(f"Dataset Parquet atualizado: {len(particoes)} partição(ões) reescrita(s) em {caminho_parquet}.")
+
+
+def atualizar_dados_horarios(df_afetado, chaves_removidas, formato='csv', caminho_csv=CAMINHO_CSV_HORARIO,
+                             caminho_parquet=CAMINHO_PARQUET_HORARIO):
+    """
+    Mescla no armazenamento existente as linhas horárias recalculadas (df_afetado, já com features e
+    nivel_risco) e remove os grupos de chaves_removidas (índice (estação, hora) que deixaram de existir).
+    Linhas existentes com as mesmas chaves são substituídas.
+    """
+    chaves = chaves_removidas.set_names(['cod_estacao', 'datahora_utc_hora'])
+    chaves = pd.MultiIndex.from_arrays([chaves.get_level_values(0).astype(str), chaves.get_level_values(1)])
+    if df_afetado is not None:
+        chaves = chaves.append(_indice_chaves(df_afetado))
+    if len(chaves) == 0:
+        return
+
+    if formato in ('csv', 'ambos'):
+        _atualizar_csv(df_afetado, chaves, caminho_csv)
+    if formato in ('parquet', 'ambos'):
+        if not parquet_disponivel():
+            print("Aviso: pyarrow não está instalado; dataset Parquet não foi atualizado.")
+            return
+        _atualizar_parquet(df_afetado, chaves, caminho_parquet)
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+
+import joblib
+import pandas as pd
+import sklearn
+
+# Artefatos treinados, um arquivo por chave (hash dos dados de treino + hiperparâmetros)
+DIRETORIO_CACHE_PADRAO = os.path.join('ml_model', 'cache')
+# Muda quando o formato dos artefatos muda, invalidando o cache antigo
+VERSAO_FORMATO = 1
+# Tamanho máximo do cache; acima dele os artefatos usados há mais tempo são removidos (LRU)
+LIMITE_CACHE_MB_PADRAO = 2048
+
+
+def chave_artefato(modelo, X, y):
+    """
+    Hash SHA-256 (hex) que identifica um treino: conteúdo de X e y (valores, nomes e tipos das
+    colunas), todos os parâmetros do pipeline ainda não treinado e a versão do sklearn. Qualquer
+    mudança em um deles gera outra chave; dados e parâmetros iguais reencontram o mesmo artefato.
+    """
+    hash_treino = hashlib.sha256()
+    for dados in (X, pd.Series(y, name='y').to_frame()):
+        hash_treino.update(json.dumps({str(c): str(t) for c, t in dados.dtypes.items()}).encode())
+        hash_treino.update(pd.util.hash_pandas_object(dados, index=False).to_numpy().tobytes())
+    # Valores simples entram direto; estimadores aninhados entram pelo repr (seus parâmetros
+    # também aparecem individualmente como 'passo__parametro')
+    hash_treino.update(json.dumps(modelo.get_params(deep=True), sort_keys=True, default=repr).encode())
+    hash_treino.update(f"{sklearn.__version__}|{VERSAO_FORMATO}".encode())
+    return hash_treino.hexdigest()
+
+
+def caminho_artefato(chave, diretorio=DIRETORIO_CACHE_PADRAO):
+    return os.path.join(diretorio, f"{chave}.joblib")
+
+
+def carregar_artefato(chave, diretorio=DIRETORIO_CACHE_PADRAO, mmap_mode='r'):
+    """Modelo salvo sob a chave, com os arrays mapeados do arquivo (mmap_mode), ou None se não existir."""
+    caminho = caminho_artefato(chave, diretorio)
+    if not os.path.exists(caminho):
+        return None
+    return joblib.load(caminho, mmap_mode=mmap_mode)
+
+
+def salvar_artefato(modelo, chave, diretorio=DIRETORIO_CACHE_PADRAO):
+    """Salva o modelo sem compressão (requisito do mmap) com troca atômica do arquivo."""
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = caminho_artefato(chave, diretorio)
+    temporario = caminho + '.tmp'
+    joblib.dump(modelo, temporario, compress=0)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def _artefatos(diretorio):
+    # (caminho, tamanho, último uso) de cada artefato; o último uso é o mtime, renovado a cada acerto
+    if not os.path.isdir(diretorio):
+        return []
+    artefatos = []
+    for nome in os.listdir(diretorio):
+        if nome.endswith('.joblib'):
+            caminho = os.path.join(diretorio, nome)
+            try:
+                estado = os.stat(caminho)
+            except OSError:
+                continue
+            artefatos.append((caminho, estado.st_size, estado.st_mtime))
+    return artefatos
+
+
+def podar_cache(diretorio=DIRETORIO_CACHE_PADRAO, limite_mb=LIMITE_CACHE_MB_PADRAO, preservar=()):
+    """
+    Remove os artefatos usados há mais tempo até o cache caber em limite_mb (None desativa o limite).
+    As chaves em preservar nunca são removidas. Retorna (artefatos_removidos, bytes_liberados).
+    """
+    if limite_mb is None:
+        return 0, 0
+    artefatos = _artefatos(diretorio)
+    total = sum(tamanho for _, tamanho, _ in artefatos)
+    limite = limite_mb * 1024 * 1024
+    preservados = {caminho_artefato(chave, diretorio) for chave in preservar}
+    removidos, liberados = 0, 0
+    for caminho, tamanho, _ in sorted(artefatos, key=lambda artefato: artefato[2]):
+        if total <= limite:
+            break
+        if caminho in preservados:
+            continue
+        try:
+            os.remove(caminho)
+        except OSError:
+            continue
+        total -= tamanho
+        removidos += 1
+        liberados += tamanho
+    return removidos, liberados
+
+
+def limpar_cache(diretorio=DIRETORIO_CACHE_PADRAO):
+    """Remove todos os artefatos (e temporários de gravações interrompidas). Retorna (artefatos, bytes)."""
+    if not os.path.isdir(diretorio):
+        return 0, 0
+    removidos, liberados = 0, 0
+    for nome in os.listdir(diretorio):
+        if nome.endswith(('.joblib', '.joblib.tmp')):
+            caminho = os.path.join(diretorio, nome)
+            liberados += os.path.getsize(caminho)
+            os.remove(caminho)
+            removidos += nome.endswith('.joblib')
+    return removidos, liberados
+
+
+def treinar_com_cache(modelo, X, y, diretorio=DIRETORIO_CACHE_PADRAO, usar_cache=True, guardar=True,
+                      limite_mb=LIMITE_CACHE_MB_PADRAO):
+    """
+    Reaproveita o artefato de um treino idêntico (mesmos dados e hiperparâmetros) ou treina o
+    modelo e, com guardar=True, o guarda no cache, removendo os artefatos usados há mais tempo
+    se o cache passar de limite_mb. Retorna (modelo_treinado, veio_do_cache, chave).
+    """
+    chave = chave_artefato(modelo, X, y)
+    if usar_cache:
+        try:
+            em_cache = carregar_artefato(chave, diretorio)
+        except Exception as e:
+            print(f"Aviso: artefato {chave[:12]} ilegível ({e}); o modelo será treinado novamente.")
+            em_cache = None
+        if em_cache is not None:
+            # Renova o último uso do artefato (ordem de remoção do LRU)
+            try:
+                os.utime(caminho_artefato(chave, diretorio))
+            except OSError:
+                pass
+            return em_cache, True, chave
+    modelo.fit(X, y)
+    if guardar:
+        try:
+            salvar_artefato(modelo, chave, diretorio)
+            podar_cache(diretorio, limite_mb, preservar=[chave])
+        except Exception as e:
+            print(f"Aviso: não foi possível salvar o artefato {chave[:12]} no cache: {e}")
+    return modelo, False, chave
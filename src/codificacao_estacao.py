@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, TargetEncoder
+from sklearn.utils.fixes import parse_version
+
+# Modos de codificação de 'cod_estacao' disponíveis no treino
+# onehot:         one-hot denso (comportamento original; matriz linhas x estações)
+# onehot_esparso: o mesmo one-hot em matriz esparsa CSR (o RandomForest aceita entrada esparsa)
+# ordinal:        um único inteiro por estação (-1 para estações desconhecidas)
+# alvo:           média do nivel_risco por estação e classe (TargetEncoder, com validação cruzada interna)
+# geo:            latitude/longitude da estação, obtidas dos próprios dados de treino
+MODOS_CODIFICACAO = ('onehot', 'onehot_esparso', 'ordinal', 'alvo', 'geo')
+MODO_PADRAO = 'onehot'
+
+
+class CoordenadasEstacao(BaseEstimator, TransformerMixin):
+    """
+    Substitui 'cod_estacao' pela latitude e longitude da estação. A tabela de coordenadas é
+    passada na construção, de modo que o pipeline continua recebendo só o código da estação.
+    Estações fora da tabela viram NaN, que o RandomForest trata como valor ausente.
+    """
+
+    def __init__(self, coordenadas=None):
+        self.coordenadas = coordenadas
+
+    def fit(self, X, y=None):
+        tabela = pd.DataFrame(self.coordenadas or {}, index=['latitude', 'longitude']).T
+        self.indice_ = pd.Index(tabela.index.astype(str))
+        self.valores_ = tabela.to_numpy(dtype='float64')
+        return self
+
+    def transform(self, X):
+        codigos = np.asarray(X)[:, 0].astype(str)
+        posicao = self.indice_.get_indexer(codigos)
+        saida = np.full((len(codigos), 2), np.nan)
+        encontrada = posicao >= 0
+        saida[encontrada] = self.valores_[posicao[encontrada]]
+        return saida
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array(['latitude_estacao', 'longitude_estacao'], dtype=object)
+
+
+def tabela_coordenadas(df):
+    """{cod_estacao: (latitude, longitude)} a partir da primeira ocorrência de cada estação em df."""
+    primeira = df.groupby(df['cod_estacao'].astype(str), observed=True)[['latitude', 'longitude']].first()
+    return {cod: (float(lat), float(lon)) for cod, (lat, lon) in primeira.iterrows()}
+
+
+def colunas_extras_codificacao(modo):
+    """Colunas a mais que o treino precisa carregar para o modo (só o geo usa latitude/longitude)."""
+    return ['latitude', 'longitude'] if modo == 'geo' else []
+
+
+def construir_preprocessador(modo=MODO_PADRAO, df=None):
+    """
+    ColumnTransformer que codifica 'cod_estacao' segundo o modo e repassa as demais colunas
+    (remainder='passthrough'), como no pipeline original. O modo 'geo' exige df com
+    cod_estacao/latitude/longitude para montar a tabela de coordenadas.
+    """
+    if modo == 'onehot':
+        codificador = OneHotEncoder(handle_unknown='ignore', sparse_output=False)
+    elif modo == 'onehot_esparso':
+        codificador = OneHotEncoder(handle_unknown='ignore', sparse_output=True)
+    elif modo == 'ordinal':
+        codificador = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1, dtype=np.float64)
+    elif modo == 'alvo':
+        # Embaralhamento fixo na validação cruzada interna; a partir do sklearn 1.9 ele vai no próprio cv
+        if parse_version(sklearn.__version__) >= parse_version('1.9'):
+            codificador = TargetEncoder(cv=KFold(n_splits=5, shuffle=True, random_state=42))
+        else:
+            codificador = TargetEncoder(random_state=42)
+    elif modo == 'geo':
+        if df is None:
+            raise ValueError("O modo 'geo' precisa dos dados de treino (latitude/longitude por estação).")
+        codificador = CoordenadasEstacao(tabela_coordenadas(df))
+    else:
+        raise ValueError(f"Codificação de estação desconhecida: {modo}. Disponíveis: {list(MODOS_CODIFICACAO)}")
+
+    nome = 'onehot' if modo.startswith('onehot') else modo
+    opcoes = {}
+    if modo == 'onehot_esparso':
+        # Mantém a saída esparsa mesmo com a coluna de chuva densa ao lado
+        opcoes['sparse_threshold'] = 1.0
+    return ColumnTransformer(transformers=[(nome, codificador, ['cod_estacao'])], remainder='passthrough', **opcoes)
+
+
+def modo_do_preprocessador(preprocessador):
+    """Modo de codificação (um de MODOS_CODIFICACAO) de um ColumnTransformer montado por construir_preprocessador."""
+    codificador = preprocessador.transformers[0][1]
+    if isinstance(codificador, OneHotEncoder):
+        return 'onehot_esparso' if codificador.sparse_output else 'onehot'
+    if isinstance(codificador, OrdinalEncoder):
+        return 'ordinal'
+    if isinstance(codificador, TargetEncoder):
+        return 'alvo'
+    if isinstance(codificador, CoordenadasEstacao):
+        return 'geo'
+    raise ValueError(f"Codificador de estação não reconhecido: {type(codificador).__name__}")
@@ -0,0 +1,246 @@
+import argparse
+import collections
+import os
+
+import numpy as np
+import pandas as pd
+
+from armazenamento_horario import (MENSAGEM_DADOS_HORARIOS_AUSENTES, artefato_atualizado, assinatura_dados_horarios,
+                                   caminho_dados_horarios, carregar_dados_horarios, garantir_artefato_derivado,
+                                   ler_metadados_artefato, preparar_diretorio_temporario, publicar_artefato_derivado)
+
+# Índice de consulta do dataset horário: cada coluna em um .npy próprio, com as linhas ordenadas por
+# (cod_estacao, datahora_utc_hora), lido com mmap. Colunas numéricas e de data ficam por linha;
+# colunas de texto (municipio, nome_estacao, ...) são constantes por estação e ficam uma vez por estação
+DIRETORIO_INDICE_PADRAO = os.path.join('data', 'indice_consulta_horaria')
+VERSAO_INDICE = 2
+TAMANHO_CACHE_PADRAO = 256
+CHAVES = ['cod_estacao', 'datahora_utc_hora']
+# Atributos cadastrais, constantes em cada estação: guardados uma vez por estação. As demais colunas
+# ficam por linha; as de data chegam como texto do CSV e são convertidas antes.
+COLUNAS_POR_ESTACAO = ['municipio', 'uf', 'nome_estacao']
+COLUNAS_DATA = ['datahora_brasilia_ref']
+
+
+def _inicios_de_grupo(valores_ordenados):
+    # Posições onde começa cada grupo de valores iguais em um array ordenado, mais o total no fim
+    n = len(valores_ordenados)
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    mudancas = np.flatnonzero(valores_ordenados[1:] != valores_ordenados[:-1]) + 1
+    return np.concatenate([[0], mudancas, [n]]).astype(np.int64)
+
+
+def salvar_indice_consulta(df_horario, diretorio=DIRETORIO_INDICE_PADRAO, assinatura=None):
+    """
+    Grava o índice de consulta de um DataFrame horário: linhas ordenadas por (estação, hora), o
+    início de cada estação (estacoes/inicio_estacao) e, para as consultas por hora, a ordem das
+    linhas por (hora, estação) com o início de cada hora (horas/inicio_hora).
+    """
+    df = df_horario.copy()
+    df['cod_estacao'] = df['cod_estacao'].astype(str)
+    df['datahora_utc_hora'] = pd.to_datetime(df['datahora_utc_hora']).astype('datetime64[ns]')
+    for coluna in COLUNAS_DATA:
+        if coluna in df.columns:
+            df[coluna] = pd.to_datetime(df[coluna]).astype('datetime64[ns]')
+    df.sort_values(CHAVES, inplace=True, kind='stable')
+
+    codigos = df['cod_estacao'].to_numpy(dtype=str)
+    horas = df['datahora_utc_hora'].to_numpy()
+    inicio_estacao = _inicios_de_grupo(codigos)
+    ordem_por_hora = np.argsort(horas, kind='stable').astype(np.int64)
+    inicio_hora = _inicios_de_grupo(horas[ordem_por_hora])
+
+    arrays = {'estacoes': codigos[inicio_estacao[:-1]], 'inicio_estacao': inicio_estacao,
+              'datahora_utc_hora': horas, 'ordem_por_hora': ordem_por_hora,
+              'horas': horas[ordem_por_hora][inicio_hora[:-1]], 'inicio_hora': inicio_hora}
+    colunas_linha, colunas_estacao = [], []
+    estacao_da_linha = np.repeat(np.arange(len(inicio_estacao) - 1), np.diff(inicio_estacao))
+    for coluna in df.columns.drop(CHAVES):
+        serie = df[coluna]
+        if coluna in COLUNAS_POR_ESTACAO:
+            valores = serie.astype(str).to_numpy(dtype=str)
+            por_estacao = valores[inicio_estacao[:-1]]
+            variaveis = np.unique(codigos[valores != por_estacao[estacao_da_linha]])
+            if len(variaveis):
+                raise ValueError(f"Coluna '{coluna}' varia dentro da estação em {len(variaveis)} estação(ões), "
+                                 f"ex.: {variaveis[:5].tolist()}.")
+            arrays[f"estacao_{coluna}"] = por_estacao
+            colunas_estacao.append(coluna)
+        elif pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_datetime64_any_dtype(serie):
+            arrays[f"linha_{coluna}"] = serie.to_numpy()
+            colunas_linha.append(coluna)
+        else:
+            arrays[f"linha_{coluna}"] = serie.astype(str).to_numpy(dtype=str)
+            colunas_linha.append(coluna)
+
+    temporario = preparar_diretorio_temporario(diretorio)
+    for nome, array in arrays.items():
+        np.save(os.path.join(temporario, f"{nome}.npy"), np.ascontiguousarray(array))
+    return publicar_artefato_derivado(temporario, diretorio, {
+        'versao': VERSAO_INDICE, 'linhas': len(df), 'estacoes': len(inicio_estacao) - 1,
+        'colunas_linha': colunas_linha, 'colunas_estacao': colunas_estacao, 'origem': assinatura})
+
+
+def construir_indice_consulta(diretorio=DIRETORIO_INDICE_PADRAO, caminho=None):
+    """Lê o dataset horário inteiro (uma única vez) e grava o índice de consulta."""
+    caminho, _ = caminho_dados_horarios(caminho)
+    assinatura = assinatura_dados_horarios(caminho)
+    df = carregar_dados_horarios(caminho=caminho)
+    return salvar_indice_consulta(df, diretorio, assinatura)
+
+
+def indice_atualizado(diretorio=DIRETORIO_INDICE_PADRAO, caminho=None):
+    """True se o índice existe, tem a versão atual e foi gerado a partir do dataset horário como ele está."""
+    return artefato_atualizado(diretorio, VERSAO_INDICE, caminho)
+
+
+def abrir_consulta_horaria(diretorio=DIRETORIO_INDICE_PADRAO, caminho=None, tamanho_cache=TAMANHO_CACHE_PADRAO):
+    """Abre o índice de consulta, reconstruindo-o antes se o dataset horário mudou desde a última construção."""
+    metadados = garantir_artefato_derivado(diretorio, VERSAO_INDICE, lambda: construir_indice_consulta(diretorio, caminho),
+                                           "o índice de consulta", caminho)
+    if metadados is not None:
+        print(f"Índice construído: {metadados['linhas']} linhas, {metadados['estacoes']} estações.")
+    return ConsultaHoraria(diretorio, tamanho_cache)
+
+
+class ConsultaHoraria:
+    """
+    Consultas ao dataset horário por busca binária sobre os arrays do índice (mapeados do disco,
+    só as páginas tocadas são lidas): uma estação em uma janela de tempo ou todas as estações em
+    uma hora. Os resultados recentes ficam em um cache LRU de até tamanho_cache consultas; cada
+    chamada devolve uma cópia rasa do DataFrame em cache (com copy-on-write, alterá-la não afeta o cache).
+    """
+
+    def __init__(self, diretorio=DIRETORIO_INDICE_PADRAO, tamanho_cache=TAMANHO_CACHE_PADRAO):
+        self.metadados = ler_metadados_artefato(diretorio)
+        if self.metadados is None:
+            raise FileNotFoundError(f"Índice de consulta não encontrado em {diretorio}.")
+        carregar = lambda nome: np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode='r')
+        self.estacoes = carregar('estacoes')
+        self.inicio_estacao = carregar('inicio_estacao')
+        self.datahora = carregar('datahora_utc_hora')
+        self.ordem_por_hora = carregar('ordem_por_hora')
+        self.horas = carregar('horas')
+        self.inicio_hora = carregar('inicio_hora')
+        self.colunas_linha = {coluna: carregar(f"linha_{coluna}") for coluna in self.metadados['colunas_linha']}
+        self.colunas_estacao = {coluna: carregar(f"estacao_{coluna}") for coluna in self.metadados['colunas_estacao']}
+        self.tamanho_cache = tamanho_cache
+        self._cache = collections.OrderedDict()
+        self.acertos_cache = 0
+        self.faltas_cache = 0
+
+    @property
+    def colunas(self):
+        return CHAVES + list(self.colunas_linha) + list(self.colunas_estacao)
+
+    def _posicao_estacao(self, cod_estacao):
+        cod_estacao = str(cod_estacao)
+        posicao = int(np.searchsorted(self.estacoes, cod_estacao))
+        if posicao == len(self.estacoes) or self.estacoes[posicao] != cod_estacao:
+            return None
+        return posicao
+
+    def intervalo_estacao(self, cod_estacao, inicio=None, fim=None):
+        """Linhas [primeira, última) da estação com inicio <= datahora_utc_hora <= fim."""
+        posicao = self._posicao_estacao(cod_estacao)
+        if posicao is None:
+            return 0, 0
+        primeira, ultima = int(self.inicio_estacao[posicao]), int(self.inicio_estacao[posicao + 1])
+        horas = self.datahora[primeira:ultima]
+        if inicio is not None:
+            primeira += int(np.searchsorted(horas, pd.Timestamp(inicio).to_datetime64(), side='left'))
+        if fim is not None:
+            ultima -= len(horas) - int(np.searchsorted(horas, pd.Timestamp(fim).to_datetime64(), side='right'))
+        return primeira, max(primeira, ultima)
+
+    def linhas_da_hora(self, hora):
+        """Posições (no índice) das linhas de todas as estações na hora, em ordem de estação."""
+        hora = pd.Timestamp(hora).to_datetime64()
+        posicao = int(np.searchsorted(self.horas, hora))
+        if posicao == len(self.horas) or self.horas[posicao] != hora:
+            return np.empty(0, dtype=np.int64)
+        return np.asarray(self.ordem_por_hora[self.inicio_hora[posicao]:self.inicio_hora[posicao + 1]])
+
+    def _montar(self, linhas, estacao_das_linhas, colunas):
+        # linhas: slice ou posições das linhas; estacao_das_linhas: posição da estação de cada linha
+        colunas = self.colunas if colunas is None else list(colunas)
+        dados = {}
+        for coluna in colunas:
+            if coluna == 'cod_estacao':
+                dados[coluna] = self.estacoes[estacao_das_linhas]
+            elif coluna == 'datahora_utc_hora':
+                dados[coluna] = self.datahora[linhas]
+            elif coluna in self.colunas_linha:
+                dados[coluna] = self.colunas_linha[coluna][linhas]
+            elif coluna in self.colunas_estacao:
+                dados[coluna] = self.colunas_estacao[coluna][estacao_das_linhas]
+            else:
+                raise KeyError(f"Coluna '{coluna}' não está no índice de consulta. Colunas disponíveis: {self.colunas}")
+        # np.array copia os trechos do mmap: o DataFrame não depende dos arquivos do índice
+        return pd.DataFrame({coluna: np.array(valores) for coluna, valores in dados.items()}, columns=colunas)
+
+    def _consultar(self, chave, calcular):
+        if self.tamanho_cache <= 0:
+            return calcular()
+        resultado = self._cache.get(chave)
+        if resultado is None:
+            self.faltas_cache += 1
+            resultado = self._cache[chave] = calcular()
+            if len(self._cache) > self.tamanho_cache:
+                self._cache.popitem(last=False)
+        else:
+            self.acertos_cache += 1
+            self._cache.move_to_end(chave)
+        return resultado.copy(deep=False)
+
+    def estacao(self, cod_estacao, inicio=None, fim=None, colunas=None):
+        """Leituras horárias da estação com inicio <= datahora_utc_hora <= fim (limites opcionais)."""
+        def calcular():
+            primeira, ultima = self.intervalo_estacao(cod_estacao, inicio, fim)
+            posicao = self._posicao_estacao(cod_estacao) or 0
+            return self._montar(slice(primeira, ultima), np.full(ultima - primeira, posicao), colunas)
+        inicio_chave = None if inicio is None else pd.Timestamp(inicio)
+        fim_chave = None if fim is None else pd.Timestamp(fim)
+        return self._consultar(('estacao', str(cod_estacao), inicio_chave, fim_chave,
+                                None if colunas is None else tuple(colunas)), calcular)
+
+    def hora(self, hora, colunas=None):
+        """Leituras de todas as estações na hora (UTC) informada."""
+        def calcular():
+            linhas = self.linhas_da_hora(hora)
+            estacao_das_linhas = np.searchsorted(self.inicio_estacao, linhas, side='right') - 1
+            return self._montar(linhas, estacao_das_linhas, colunas)
+        return self._consultar(('hora', pd.Timestamp(hora), None if colunas is None else tuple(colunas)), calcular)
+
+    def limpar_cache(self):
+        self._cache.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas por estação/janela ou por hora no dataset horário, via índice com mmap.")
+    parser.add_argument('--diretorio', default=DIRETORIO_INDICE_PADRAO, help="Diretório do índice de consulta.")
+    parser.add_argument('--reconstruir', action='store_true', help="Reconstrói o índice mesmo que ele esteja atualizado.")
+    parser.add_argument('--estacao', default=None, help="Código da estação consultada.")
+    parser.add_argument('--inicio', default=None, help="Início (UTC) da janela da estação, ex.: 2025-03-01.")
+    parser.add_argument('--fim', default=None, help="Fim (UTC) da janela da estação, ex.: 2025-03-07 23:00.")
+    parser.add_argument('--hora', default=None, help="Hora (UTC) consultada em todas as estações, ex.: '2025-03-01 15:00'.")
+    args = parser.parse_args()
+
+    try:
+        if args.reconstruir:
+            metadados = construir_indice_consulta(args.diretorio)
+            print(f"Índice construído em {args.diretorio}: {metadados['linhas']} linhas, {metadados['estacoes']} estações.")
+        consulta = abrir_consulta_horaria(args.diretorio)
+    except FileNotFoundError:
+        print(MENSAGEM_DADOS_HORARIOS_AUSENTES)
+        raise SystemExit(1)
+
+    if args.estacao is not None:
+        resultado = consulta.estacao(args.estacao, args.inicio, args.fim)
+        print(f"Estação {args.estacao}: {len(resultado)} horas")
+        print(resultado.to_string(max_rows=20))
+    if args.hora is not None:
+        resultado = consulta.hora(args.hora)
+        print(f"Hora {args.hora}: {len(resultado)} estações")
+        print(resultado.to_string(max_rows=20))
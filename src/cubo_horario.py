@@ -0,0 +1,221 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from armazenamento_horario import (MENSAGEM_DADOS_HORARIOS_AUSENTES, artefato_atualizado, assinatura_dados_horarios,
+                                   caminho_dados_horarios, carregar_dados_horarios, garantir_artefato_derivado,
+                                   ler_metadados_artefato, preparar_diretorio_temporario, publicar_artefato_derivado)
+from features_chuva import _NS_POR_HORA, JANELAS_PADRAO, _somas_e_maximos, nomes_features_janelas
+
+# Cubo denso do dataset horário: uma matriz float32 estações x horas (UTC, da primeira à última hora
+# do dataset) em valores.npy, lida com mmap. A linha de cada estação é a sua posição em estacoes.npy
+# (códigos em ordem) e a coluna de cada hora é o número de horas desde hora_inicial. Horas sem
+# leitura ficam com NaN ou com 0 (preenchimento 'zero', com a máscara das horas observadas em observada.npy).
+DIRETORIO_CUBO_PADRAO = os.path.join('data', 'cubo_horario')
+VERSAO_CUBO = 1
+COLUNA_PADRAO = 'acumulado_chuva_1_h_mm'
+PREENCHIMENTOS = ('nan', 'zero')
+
+
+def salvar_cubo_horario(df_horario, diretorio=DIRETORIO_CUBO_PADRAO, coluna=COLUNA_PADRAO, preenchimento='nan',
+                        assinatura=None):
+    """
+    Grava o cubo estações x horas de uma coluna do DataFrame horário. A matriz é escrita direto no
+    arquivo (open_memmap), sem cópia densa em memória.
+    """
+    if preenchimento not in PREENCHIMENTOS:
+        raise ValueError(f"Preenchimento '{preenchimento}' inválido. Use um de: {PREENCHIMENTOS}")
+    codigos, estacoes = pd.factorize(df_horario['cod_estacao'].astype(str), sort=True)
+    horas = pd.to_datetime(df_horario['datahora_utc_hora']).to_numpy(dtype='datetime64[h]').astype('int64')
+    hora_inicial = int(horas.min()) if len(horas) else 0
+    n_horas = int(horas.max()) - hora_inicial + 1 if len(horas) else 0
+    colunas_cubo = horas - hora_inicial
+
+    temporario = preparar_diretorio_temporario(diretorio)
+    valores = open_memmap(os.path.join(temporario, 'valores.npy'), mode='w+', dtype=np.float32,
+                          shape=(len(estacoes), n_horas))
+    valores[:] = np.nan if preenchimento == 'nan' else 0.0
+    valores[codigos, colunas_cubo] = df_horario[coluna].to_numpy(dtype=np.float32)
+    valores.flush()
+    del valores
+    if preenchimento == 'zero':
+        observada = open_memmap(os.path.join(temporario, 'observada.npy'), mode='w+', dtype=bool,
+                                shape=(len(estacoes), n_horas))
+        observada[codigos, colunas_cubo] = True
+        observada.flush()
+        del observada
+    np.save(os.path.join(temporario, 'estacoes.npy'), np.asarray(estacoes, dtype=str))
+
+    return publicar_artefato_derivado(temporario, diretorio, {
+        'versao': VERSAO_CUBO, 'coluna': coluna, 'preenchimento': preenchimento,
+        'estacoes': len(estacoes), 'horas': n_horas, 'leituras': len(df_horario),
+        'hora_inicial': str(pd.Timestamp(hora_inicial, unit='h')), 'origem': assinatura})
+
+
+def construir_cubo_horario(diretorio=DIRETORIO_CUBO_PADRAO, caminho=None, coluna=COLUNA_PADRAO, preenchimento='nan'):
+    """Lê do dataset horário apenas as colunas necessárias e grava o cubo."""
+    caminho, _ = caminho_dados_horarios(caminho)
+    assinatura = assinatura_dados_horarios(caminho)
+    df = carregar_dados_horarios(colunas=['cod_estacao', 'datahora_utc_hora', coluna], caminho=caminho)
+    return salvar_cubo_horario(df, diretorio, coluna, preenchimento, assinatura)
+
+
+def cubo_atualizado(diretorio=DIRETORIO_CUBO_PADRAO, caminho=None, coluna=None, preenchimento=None):
+    """
+    True se o cubo existe, tem a versão atual, foi gerado a partir do dataset horário como ele está
+    e, quando informados, tem a coluna e o preenchimento pedidos.
+    """
+    return artefato_atualizado(diretorio, VERSAO_CUBO, caminho, coluna=coluna, preenchimento=preenchimento)
+
+
+def abrir_cubo_horario(diretorio=DIRETORIO_CUBO_PADRAO, caminho=None, coluna=None, preenchimento=None):
+    """
+    Abre o cubo, reconstruindo-o antes se o dataset horário mudou desde a última construção ou se a
+    coluna ou o preenchimento pedidos são outros. Sem coluna/preenchimento, mantém os do cubo existente.
+    """
+    anterior = ler_metadados_artefato(diretorio) or {}
+    coluna = coluna or anterior.get('coluna', COLUNA_PADRAO)
+    preenchimento = preenchimento or anterior.get('preenchimento', 'nan')
+    metadados = garantir_artefato_derivado(
+        diretorio, VERSAO_CUBO, lambda: construir_cubo_horario(diretorio, caminho, coluna, preenchimento),
+        f"o cubo horário (coluna '{coluna}', preenchimento '{preenchimento}')", caminho,
+        coluna=coluna, preenchimento=preenchimento)
+    if metadados is not None:
+        print(f"Cubo construído: {metadados['estacoes']} estações x {metadados['horas']} horas.")
+    return CuboHorario(diretorio)
+
+
+class CuboHorario:
+    """
+    Acesso ao cubo estações x horas mapeado do disco: o valor de uma (estação, hora), a série de uma
+    estação e o instantâneo de todas as estações em uma hora são fatias da matriz, e só as páginas
+    tocadas são lidas. Séries e instantâneos são copiados do mmap e não dependem dos arquivos do cubo.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_CUBO_PADRAO):
+        self.metadados = ler_metadados_artefato(diretorio)
+        if self.metadados is None:
+            raise FileNotFoundError(f"Cubo horário não encontrado em {diretorio}.")
+        self.valores = np.load(os.path.join(diretorio, 'valores.npy'), mmap_mode='r')
+        self.estacoes = np.load(os.path.join(diretorio, 'estacoes.npy'))
+        self._posicao_estacao = {cod: i for i, cod in enumerate(self.estacoes.tolist())}
+        caminho_observada = os.path.join(diretorio, 'observada.npy')
+        self._observada = np.load(caminho_observada, mmap_mode='r') if os.path.exists(caminho_observada) else None
+        self.hora_inicial = pd.Timestamp(self.metadados['hora_inicial'])
+        self._hora_inicial_h = self.hora_inicial.value // _NS_POR_HORA
+        # Rótulos das linhas e colunas, montados uma vez para as séries e instantâneos
+        self.horas = pd.date_range(self.hora_inicial, periods=self.valores.shape[1], freq='h')
+        self._indice_estacoes = pd.Index(self.estacoes.tolist(), name='cod_estacao')
+
+    def indice_estacao(self, cod_estacao):
+        try:
+            return self._posicao_estacao[str(cod_estacao)]
+        except KeyError:
+            raise KeyError(f"Estação '{cod_estacao}' não está no cubo horário.") from None
+
+    def indice_hora(self, hora):
+        """Coluna da hora (UTC) no cubo; KeyError se ela estiver fora do período coberto."""
+        coluna = pd.Timestamp(hora).value // _NS_POR_HORA - self._hora_inicial_h
+        if not 0 <= coluna < self.valores.shape[1]:
+            raise KeyError(f"Hora {hora} fora do período do cubo ({self.hora_inicial} a {self.horas[-1]}).")
+        return int(coluna)
+
+    def _colunas(self, inicio, fim):
+        # Fatia [primeira, última] das colunas com inicio <= hora <= fim, limitada ao período do cubo
+        n_horas = self.valores.shape[1]
+        primeira = 0 if inicio is None else -(-pd.Timestamp(inicio).value // _NS_POR_HORA) - self._hora_inicial_h
+        ultima = n_horas - 1 if fim is None else pd.Timestamp(fim).value // _NS_POR_HORA - self._hora_inicial_h
+        primeira = max(int(primeira), 0)
+        return primeira, max(min(int(ultima), n_horas - 1), primeira - 1)
+
+    def valor(self, cod_estacao, hora):
+        """Leitura da estação na hora (NaN ou 0, conforme o preenchimento, se não houve leitura)."""
+        return float(self.valores[self.indice_estacao(cod_estacao), self.indice_hora(hora)])
+
+    def observadas(self, linhas=slice(None), colunas=slice(None)):
+        """Máscara das posições com leitura, na mesma fatia de valores[linhas, colunas]."""
+        if self._observada is not None:
+            return np.array(self._observada[linhas, colunas])
+        return ~np.isnan(self.valores[linhas, colunas])
+
+    def serie(self, cod_estacao, inicio=None, fim=None):
+        """Série horária densa da estação com inicio <= hora <= fim, indexada pela hora."""
+        linha = self.indice_estacao(cod_estacao)
+        primeira, ultima = self._colunas(inicio, fim)
+        return pd.Series(np.array(self.valores[linha, primeira:ultima + 1]), name=str(cod_estacao),
+                         index=self.horas[primeira:ultima + 1])
+
+    def instantaneo(self, hora):
+        """Valores de todas as estações na hora, indexados pelo código da estação."""
+        coluna = self.indice_hora(hora)
+        return pd.Series(np.array(self.valores[:, coluna]), index=self._indice_estacoes, name=self.horas[coluna])
+
+    def janelas_moveis(self, janelas=JANELAS_PADRAO, inicio=None, fim=None):
+        """
+        Soma e máximo da chuva nas últimas w horas (inclusive a atual) para cada w em janelas, em
+        todas as estações e horas com inicio <= hora <= fim. Horas sem leitura contam como 0 mm,
+        como em features_chuva.calcular_features_janelas. Retorna {nome_feature: matriz estações x horas}.
+        """
+        janelas = tuple(sorted(set(int(w) for w in janelas)))
+        historico = max(janelas) - 1
+        primeira, ultima = self._colunas(inicio, fim)
+        if ultima < primeira:
+            return {nome: np.empty((self.valores.shape[0], 0)) for nome in nomes_features_janelas(janelas)}
+        # Cada linha leva as historico horas anteriores ao intervalo (com zeros antes do início do
+        # cubo): achatada, nenhuma janela das colunas mantidas atravessa a fronteira entre estações
+        faltantes = max(historico - primeira, 0)
+        bloco = np.zeros((self.valores.shape[0], faltantes + ultima + 1 - max(primeira - historico, 0)))
+        bloco[:, faltantes:] = self.valores[:, max(primeira - historico, 0):ultima + 1]
+        np.nan_to_num(bloco, copy=False, nan=0.0)
+        return {nome: resultado.reshape(bloco.shape)[:, historico:]
+                for nome, resultado in _somas_e_maximos(bloco.ravel(), janelas).items()}
+
+    def para_dataframe(self, apenas_observadas=True):
+        """Volta ao formato longo (cod_estacao, datahora_utc_hora, valor), por estação e hora."""
+        mascara = self.observadas() if apenas_observadas else np.ones(self.valores.shape, dtype=bool)
+        linhas, colunas = np.nonzero(mascara)
+        return pd.DataFrame({
+            'cod_estacao': self.estacoes[linhas],
+            'datahora_utc_hora': self.hora_inicial + pd.to_timedelta(colunas, unit='h'),
+            self.metadados['coluna']: self.valores[linhas, colunas],
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cubo denso estações x horas do dataset horário, lido com mmap.")
+    parser.add_argument('--diretorio', default=DIRETORIO_CUBO_PADRAO, help="Diretório do cubo.")
+    parser.add_argument('--reconstruir', action='store_true', help="Reconstrói o cubo mesmo que ele esteja atualizado.")
+    parser.add_argument('--preenchimento', choices=PREENCHIMENTOS, default=None,
+                        help="Valor das horas sem leitura ('zero' grava também a máscara observada.npy); um cubo "
+                             "com outro preenchimento é reconstruído. Padrão: o do cubo existente, ou 'nan'.")
+    parser.add_argument('--estacao', default=None, help="Código da estação consultada.")
+    parser.add_argument('--inicio', default=None, help="Início (UTC) da série da estação, ex.: 2025-03-01.")
+    parser.add_argument('--fim', default=None, help="Fim (UTC) da série da estação, ex.: 2025-03-07 23:00.")
+    parser.add_argument('--hora', default=None, help="Hora (UTC) consultada em todas as estações, ex.: '2025-03-01 15:00'.")
+    args = parser.parse_args()
+
+    try:
+        if args.reconstruir:
+            construir_cubo_horario(args.diretorio, preenchimento=args.preenchimento or 'nan')
+        cubo = abrir_cubo_horario(args.diretorio, preenchimento=args.preenchimento)
+    except FileNotFoundError:
+        print(MENSAGEM_DADOS_HORARIOS_AUSENTES)
+        raise SystemExit(1)
+    print(f"Cubo {args.diretorio}: {cubo.valores.shape[0]} estações x {cubo.valores.shape[1]} horas "
+          f"a partir de {cubo.hora_inicial} ({cubo.valores.nbytes / 1e6:.1f} MB, preenchimento "
+          f"'{cubo.metadados['preenchimento']}', {cubo.metadados['leituras']} leituras).")
+
+    try:
+        if args.estacao is not None:
+            serie = cubo.serie(args.estacao, args.inicio, args.fim)
+            print(f"Estação {args.estacao}: {len(serie)} horas, {int(serie.notna().sum())} com valor")
+            print(serie.to_string(max_rows=20))
+        if args.hora is not None:
+            instantaneo = cubo.instantaneo(args.hora)
+            print(f"Hora {args.hora}: {len(instantaneo)} estações")
+            print(instantaneo.to_string(max_rows=20))
+    except KeyError as erro:
+        print(f"Erro: {erro.args[0]}")
@@ -0,0 +1,256 @@
+import re
+
+import numpy as np
+
+# pandas é importado só nas funções que o usam: o simulador precisa apenas de janelas_do_modelo
+# e nomes_features_janelas e parte mais rápido sem ele
+
+# Janelas (em horas) das features de chuva acumulada
+JANELAS_PADRAO = (3, 6, 24, 72)
+
+COLUNAS_BASE = ['cod_estacao', 'datahora_utc_hora', 'acumulado_chuva_1_h_mm']
+
+_NS_POR_HORA = 3600 * 10**9
+_PADRAO_COLUNA = re.compile(r'^chuva_(\d+)h_(soma|max)_mm$')
+
+
+def nomes_features_janelas(janelas=JANELAS_PADRAO):
+    return [f'chuva_{w}h_{tipo}_mm' for w in janelas for tipo in ('soma', 'max')]
+
+
+def janelas_do_modelo(modelo):
+    """Janelas exigidas por um pipeline treinado, deduzidas dos nomes de suas features de entrada."""
+    nomes = getattr(modelo, 'feature_names_in_', [])
+    return tuple(sorted({int(m.group(1)) for m in map(_PADRAO_COLUNA.match, nomes) if m}))
+
+
+def _montar_grade_densa(cod_estacao, horas, valores, janela_max):
+    """
+    Distribui as leituras em um vetor denso com uma posição por hora de cada estação, do primeiro
+    ao último registro, precedido de janela_max - 1 posições de preenchimento por estação. Assim
+    nenhuma janela atravessa a fronteira entre estações. Horas sem leitura ficam com 0.
+    Retorna (grade, posicao_de_cada_linha, codigos_da_grade, horas_da_grade, observada).
+    """
+    import pandas as pd
+
+    codigos, estacoes = pd.factorize(cod_estacao, sort=True)
+    ordem = np.lexsort((horas, codigos))
+    codigos_ord, horas_ord = codigos[ordem], horas[ordem]
+
+    inicio_estacao = np.flatnonzero(np.r_[True, codigos_ord[1:] != codigos_ord[:-1]])
+    fim_estacao = np.r_[inicio_estacao[1:], len(ordem)] - 1
+    hora_min = horas_ord[inicio_estacao]
+    tamanho = horas_ord[fim_estacao] - hora_min + 1
+    preenchimento = janela_max - 1
+    deslocamento = np.r_[0, np.cumsum(tamanho + preenchimento)[:-1]]
+
+    estacao_ord = np.repeat(np.arange(len(inicio_estacao)), np.diff(np.r_[inicio_estacao, len(ordem)]))
+    posicao = np.empty(len(ordem), dtype='int64')
+    posicao[ordem] = deslocamento[estacao_ord] + preenchimento + (horas_ord - hora_min[estacao_ord])
+
+    total = int((tamanho + preenchimento).sum())
+    grade = np.zeros(total, dtype='float64')
+    grade[posicao] = valores
+    observada = np.zeros(total, dtype=bool)
+    observada[posicao] = True
+
+    # Estação e hora de cada posição da grade (inclusive as preenchidas)
+    estacao_grade = np.repeat(np.arange(len(inicio_estacao)), tamanho + preenchimento)
+    horas_grade = (np.arange(total) - deslocamento[estacao_grade] - preenchimento) + hora_min[estacao_grade]
+    valida = horas_grade >= hora_min[estacao_grade]
+    estacoes_grade = np.asarray(estacoes)[codigos_ord[inicio_estacao]][estacao_grade]
+    return grade, posicao, estacoes_grade, horas_grade, observada, valida
+
+
+def _somas_e_maximos(grade, janelas):
+    """
+    Somas e máximos móveis sobre a grade densa para todas as janelas de uma vez. Blocos de tamanho
+    2^k (somas e máximos que terminam em cada posição) são construídos por duplicação; cada janela
+    combina no máximo log2(janela) blocos, sempre relativos à posição, de modo que o resultado de
+    uma hora depende apenas das leituras dentro da sua janela.
+    """
+    janela_max = max(janelas)
+    somas_bloco, maximos_bloco = [grade], [grade]
+    tamanho_bloco = 1
+    while tamanho_bloco * 2 <= janela_max:
+        anterior_soma, anterior_max = somas_bloco[-1], maximos_bloco[-1]
+        soma, maximo = anterior_soma.copy(), anterior_max.copy()
+        soma[tamanho_bloco:] += anterior_soma[:-tamanho_bloco]
+        np.maximum(maximo[tamanho_bloco:], anterior_max[:-tamanho_bloco], out=maximo[tamanho_bloco:])
+        somas_bloco.append(soma)
+        maximos_bloco.append(maximo)
+        tamanho_bloco *= 2
+
+    def deslocar(valores, passo):
+        if passo == 0:
+            return valores
+        deslocado = np.zeros_like(valores)
+        deslocado[passo:] = valores[:-passo]
+        return deslocado
+
+    resultado = {}
+    for w in janelas:
+        soma = np.zeros_like(grade)
+        passo = 0
+        for k in range(len(somas_bloco) - 1, -1, -1):
+            if w & (1 << k):
+                soma += deslocar(somas_bloco[k], passo)
+                passo += 1 << k
+        k = w.bit_length() - 1
+        maximo = np.maximum(maximos_bloco[k], deslocar(maximos_bloco[k], w - (1 << k)))
+        resultado[f'chuva_{w}h_soma_mm'] = soma
+        resultado[f'chuva_{w}h_max_mm'] = maximo
+    return resultado
+
+
+def calcular_features_janelas(df_horario, janelas=JANELAS_PADRAO, incluir_horas_preenchidas=False):
+    """
+    Calcula, por estação, a soma e o máximo da chuva horária nas últimas w horas (inclusive a atual)
+    para cada w em janelas, em uma única passada vetorizada sobre todas as estações.
+    Horas sem registro entre a primeira e a última hora de cada estação são preenchidas com 0 mm.
+    Retorna as features alinhadas às linhas de df_horario (mesmo índice); com
+    incluir_horas_preenchidas=True retorna a grade completa, com a coluna 'hora_preenchida'.
+    """
+    import pandas as pd
+
+    janelas = tuple(sorted(set(int(w) for w in janelas)))
+    horas = pd.to_datetime(df_horario['datahora_utc_hora']).to_numpy(dtype='datetime64[ns]').view('int64') // _NS_POR_HORA
+    valores = df_horario['acumulado_chuva_1_h_mm'].to_numpy(dtype='float64')
+    grade, posicao, estacoes_grade, horas_grade, observada, valida = _montar_grade_densa(
+        df_horario['cod_estacao'].to_numpy(), horas, valores, max(janelas))
+    features = _somas_e_maximos(grade, janelas)
+
+    if not incluir_horas_preenchidas:
+        return pd.DataFrame({nome: valores_feature[posicao] for nome, valores_feature in features.items()},
+                            index=df_horario.index)
+
+    df_grade = pd.DataFrame({
+        'cod_estacao': estacoes_grade[valida],
+        'datahora_utc_hora': pd.to_datetime(horas_grade[valida] * _NS_POR_HORA),
+        'acumulado_chuva_1_h_mm': grade[valida],
+        'hora_preenchida': ~observada[valida],
+    })
+    for nome, valores_feature in features.items():
+        df_grade[nome] = valores_feature[valida]
+    return df_grade
+
+
+def adicionar_features_janelas(df_horario, janelas=JANELAS_PADRAO):
+    """Retorna uma cópia de df_horario com as colunas de features de janelas adicionadas."""
+    import pandas as pd
+
+    return pd.concat([df_horario, calcular_features_janelas(df_horario, janelas)], axis=1)
+
+
+def atualizar_features_janelas(historico_recente, df_novas_horas, janelas=JANELAS_PADRAO):
+    """
+    Modo incremental: calcula as features apenas das horas novas usando, como contexto, o histórico
+    recente de cada estação (as últimas max(janelas) - 1 horas), sem recalcular o passado.
+    Os valores são idênticos aos do cálculo completo. Retorna (features_das_horas_novas,
+    novo_historico_recente); historico_recente pode ser None na primeira chamada.
+    Levanta ValueError se alguma hora nova não for posterior à última hora conhecida da estação.
+    """
+    import pandas as pd
+
+    janelas = tuple(sorted(set(int(w) for w in janelas)))
+    novas = df_novas_horas[COLUNAS_BASE].copy()
+    novas['datahora_utc_hora'] = pd.to_datetime(novas['datahora_utc_hora'])
+
+    if historico_recente is not None and len(historico_recente):
+        ultima_hora = historico_recente.groupby('cod_estacao', observed=True)['datahora_utc_hora'].max()
+        limite = novas['cod_estacao'].map(ultima_hora)
+        if (novas['datahora_utc_hora'] <= limite).any():
+            raise ValueError("Horas novas devem ser posteriores à última hora conhecida de cada estação; "
+                             "recalcule o histórico com calcular_features_janelas.")
+        combinado = pd.concat([historico_recente[COLUNAS_BASE], novas], ignore_index=True)
+    else:
+        combinado = novas.reset_index(drop=True)
+
+    features = calcular_features_janelas(combinado, janelas)
+    features_novas = features.iloc[len(combinado) - len(novas):]
+    features_novas.index = df_novas_horas.index
+
+    # Mantém só as horas que ainda podem entrar na janela de uma hora futura
+    hora_max = combinado.groupby('cod_estacao', observed=True)['datahora_utc_hora'].transform('max')
+    recente = combinado['datahora_utc_hora'] > hora_max - pd.Timedelta(hours=max(janelas) - 1)
+    return features_novas, combinado[recente].reset_index(drop=True)
+
+
+class BufferJanelas:
+    """
+    Últimas max(janelas) horas de chuva de cada estação, para pontuar leituras em tempo real
+    (gateway, simulador) com as mesmas features de calcular_features_janelas sem manter o histórico
+    inteiro nem montar DataFrames. Cada estação ocupa uma linha de um buffer circular indexado pela
+    hora. Uma nova leitura de uma hora já registrada substitui a anterior (o acumulado da hora é
+    atualizado ao longo dela) e horas sem leitura contam 0 mm, como no treino.
+    """
+
+    def __init__(self, janelas=JANELAS_PADRAO):
+        self.janelas = tuple(sorted(set(int(w) for w in janelas)))
+        self.tamanho = max(self.janelas)
+        self._linhas = {}
+        self._chuva = np.zeros((0, self.tamanho), dtype='float64')
+        self._ultima_hora = np.zeros(0, dtype='int64')
+
+    def __len__(self):
+        return len(self._linhas)
+
+    def atualizar(self, cod_estacoes, horas, chuva):
+        """
+        Registra as leituras (horas como números inteiros de horas UTC desde a época, ou datetime64) e
+        devolve {nome_feature: array} com as features de janelas de cada leitura, na ordem recebida.
+        Levanta ValueError se alguma leitura for de hora anterior à última registrada da estação.
+        """
+        horas = np.asarray(horas)
+        if horas.dtype.kind == 'M':
+            horas = horas.astype('datetime64[ns]').view('int64') // _NS_POR_HORA
+        horas = horas.astype('int64')
+        chuva = np.asarray(chuva, dtype='float64')
+        linhas = self._linhas_estacoes(cod_estacoes)
+        features = {nome: np.empty(len(linhas), dtype='float64') for nome in nomes_features_janelas(self.janelas)}
+        if not len(linhas):
+            return features
+
+        # Leituras repetidas de uma estação no mesmo lote são aplicadas em rodadas, na ordem recebida
+        ordem = np.argsort(linhas, kind='stable')
+        linhas_ord = linhas[ordem]
+        inicio_grupo = np.maximum.accumulate(np.where(np.r_[True, linhas_ord[1:] != linhas_ord[:-1]],
+                                                      np.arange(len(linhas)), 0))
+        rodada = np.empty(len(linhas), dtype='int64')
+        rodada[ordem] = np.arange(len(linhas)) - inicio_grupo
+        for r in range(int(rodada.max()) + 1):
+            selecao = np.flatnonzero(rodada == r)
+            self._aplicar(linhas[selecao], horas[selecao], chuva[selecao], features, selecao)
+        return features
+
+    def _linhas_estacoes(self, cod_estacoes):
+        linhas = np.fromiter((self._linhas.setdefault(c, len(self._linhas)) for c in cod_estacoes),
+                             dtype='int64', count=len(cod_estacoes))
+        if len(self._linhas) > len(self._ultima_hora):
+            # Capacidade dobrada a cada crescimento; linhas além de len(self) ficam sem uso
+            capacidade = max(len(self._linhas), 2 * len(self._ultima_hora))
+            chuva = np.zeros((capacidade, self.tamanho), dtype='float64')
+            chuva[:len(self._chuva)] = self._chuva
+            ultima_hora = np.full(capacidade, np.iinfo('int64').min, dtype='int64')
+            ultima_hora[:len(self._ultima_hora)] = self._ultima_hora
+            self._chuva, self._ultima_hora = chuva, ultima_hora
+        return linhas
+
+    def _aplicar(self, linhas, horas, chuva, features, selecao):
+        ultima = self._ultima_hora[linhas]
+        if (horas < ultima).any():
+            raise ValueError("Leitura de hora anterior à última hora registrada da estação.")
+        # Janela da hora atual para trás; horas ainda não vistas (inclusive as puladas) valem 0 mm
+        horas_janela = horas[:, None] - np.arange(self.tamanho)
+        posicoes = horas_janela % self.tamanho
+        valores = self._chuva[linhas[:, None], posicoes]
+        valores[horas_janela > ultima[:, None]] = 0.0
+        valores[:, 0] = chuva
+        self._chuva[linhas[:, None], posicoes] = valores
+        self._ultima_hora[linhas] = horas
+
+        somas = np.cumsum(valores, axis=1)
+        maximos = np.maximum.accumulate(valores, axis=1)
+        for w in self.janelas:
+            features[f'chuva_{w}h_soma_mm'][selecao] = somas[:, w - 1]
+            features[f'chuva_{w}h_max_mm'][selecao] = maximos[:, w - 1]
@@ -0,0 +1,268 @@
+import mmap
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+# Leituras pontuadas por vez; limita os vetores (leitura x árvore) em lotes muito grandes
+TAMANHO_BLOCO_PREDICAO = 16384
+
+
+def caminho_floresta_compacta(caminho_pipeline):
+    """Arquivo da floresta compacta exportada ao lado do pipeline .joblib."""
+    return os.path.splitext(caminho_pipeline)[0] + '_compacto.npz'
+
+
+def extrair_layout_entrada(modelo):
+    """
+    Lê do ColumnTransformer do pipeline onde cada entrada vai parar na matriz do classificador:
+    retorna (categorias_estacao, coluna_inicial_onehot, colunas_numericas, posicoes_numericas,
+    n_colunas). Só o one-hot de 'cod_estacao' e as colunas numéricas repassadas (remainder) são
+    suportados (modos 'onehot' e 'onehot_esparso' de codificacao_estacao); outros levantam ValueError.
+    """
+    from sklearn.preprocessing import OneHotEncoder
+
+    preprocessador = modelo.named_steps['preprocessor']
+    n_colunas = sum(fatia.stop - fatia.start for fatia in preprocessador.output_indices_.values())
+    categorias, coluna_inicial_onehot = None, None
+    colunas_numericas, posicoes_numericas = [], []
+    for nome, transformador, colunas in preprocessador.transformers_:
+        fatia = preprocessador.output_indices_[nome]
+        if fatia.stop == fatia.start:
+            continue
+        if isinstance(transformador, OneHotEncoder) and list(colunas) == ['cod_estacao']:
+            categorias = np.asarray(transformador.categories_[0]).astype(str)
+            coluna_inicial_onehot = fatia.start
+        elif nome == 'remainder':
+            colunas_numericas += list(colunas)
+            posicoes_numericas += list(range(fatia.start, fatia.stop))
+        else:
+            raise ValueError(f"Codificação '{nome}' não suportada fora do pipeline do sklearn.")
+    if categorias is None:
+        raise ValueError("Pipeline sem o one-hot de 'cod_estacao'; use modelo.predict.")
+    return categorias, coluna_inicial_onehot, colunas_numericas, np.array(posicoes_numericas, dtype='int64'), n_colunas
+
+
+def exportar_floresta_compacta(modelo, caminho):
+    """
+    Achata o RandomForest do pipeline e o seu one-hot em arrays contíguos e salva em um .npz sem
+    compressão. Os nós de todas as árvores ficam em um único vetor (com deslocamento por árvore).
+    A entrada de cada leitura vira um vetor curto: as colunas numéricas seguidas do índice da
+    estação; um nó do one-hot da estação k passa a testar "estação == k" (k guardado no limiar)
+    e os nós numéricos mantêm o teste "valor <= limiar", com o lado dos valores ausentes (NaN)
+    escolhido no treino. Folhas apontam para si mesmas.
+    """
+    categorias, coluna_inicial, colunas_numericas, posicoes_numericas, n_colunas = extrair_layout_entrada(modelo)
+    classificador = modelo.named_steps['classifier']
+
+    # Coluna da matriz do classificador -> posição no vetor compacto e categoria de estação (ou -1)
+    coluna_estacao = len(colunas_numericas)
+    coluna_compacta = np.full(n_colunas, coluna_estacao, dtype='int32')
+    coluna_compacta[posicoes_numericas] = np.arange(len(posicoes_numericas))
+    categoria_da_coluna = np.full(n_colunas, -1, dtype='int64')
+    categoria_da_coluna[coluna_inicial:coluna_inicial + len(categorias)] = np.arange(len(categorias))
+
+    raizes, feature, limiar, nan_a_esquerda, filhos, valores = [], [], [], [], [], []
+    deslocamento = 0
+    for arvore in classificador.estimators_:
+        t = arvore.tree_
+        folha = t.children_left < 0
+        coluna = np.where(folha, 0, t.feature)
+        eh_estacao = ~folha & (categoria_da_coluna[coluna] >= 0)
+        proprio = np.arange(t.node_count)
+        raizes.append(deslocamento)
+        feature.append(np.where(folha, 0, coluna_compacta[coluna]))
+        limiar.append(np.where(eh_estacao, categoria_da_coluna[coluna], t.threshold))
+        # Versões do sklearn sem suporte a NaN nas árvores mandam o NaN para a direita
+        nan_a_esquerda.append(getattr(t, 'missing_go_to_left', np.zeros(t.node_count)).astype(bool))
+        filhos.append(np.column_stack([np.where(folha, proprio, t.children_left),
+                                       np.where(folha, proprio, t.children_right)]).ravel() + deslocamento)
+        valores.append(t.value[:, 0, :])
+        deslocamento += t.node_count
+
+    # Grava em arquivo temporário e troca de uma vez: processos que mapearam a versão anterior
+    # (carregar_floresta_compacta com mmap) continuam lendo o arquivo antigo intacto
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as arquivo:
+        np.savez(arquivo,
+                 raizes=np.array(raizes, dtype='int32'),
+                 feature=np.concatenate(feature).astype('int32'),
+                 limiar=np.concatenate(limiar).astype('float64'),
+                 nan_a_esquerda=np.concatenate(nan_a_esquerda),
+                 filhos=np.concatenate(filhos).astype('int32'),
+                 valores=np.ascontiguousarray(np.concatenate(valores), dtype='float64'),
+                 categorias_estacao=categorias,
+                 colunas_numericas=np.array(colunas_numericas, dtype=str),
+                 feature_names_in=np.asarray(modelo.feature_names_in_).astype(str),
+                 classes=classificador.classes_)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def carregar_floresta_compacta(caminho, mmap=False):
+    """
+    Carrega a floresta exportada. Com mmap=True os arrays são mapeados do arquivo em vez de
+    copiados: a carga não lê as árvores do disco e processos que abrem o mesmo arquivo
+    compartilham uma única cópia na memória (page cache).
+    """
+    if mmap:
+        return FlorestaCompacta(_mapear_npz(caminho))
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        return FlorestaCompacta({nome: arquivo[nome] for nome in arquivo.files})
+
+
+def _mapear_npz(caminho):
+    # np.load ignora mmap_mode em .npz; como np.savez grava os membros sem compressão, cada .npy
+    # ocupa um trecho contínuo do arquivo e o array pode ser uma visão do arquivo mapeado
+    arrays = {}
+    with zipfile.ZipFile(caminho) as zip_npz, open(caminho, 'rb') as arquivo:
+        mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        for info in zip_npz.infolist():
+            nome = info.filename[:-len('.npy')]
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Membro '{nome}' de {caminho} está comprimido e não pode ser mapeado.")
+            # Cabeçalho local do zip: 30 bytes fixos + nome + campo extra
+            tamanho_nome, tamanho_extra = struct.unpack_from('<HH', mapa, info.header_offset + 26)
+            arquivo.seek(info.header_offset + 30 + tamanho_nome + tamanho_extra)
+            versao = np.lib.format.read_magic(arquivo)
+            ler_cabecalho = np.lib.format.read_array_header_1_0 if versao == (1, 0) else np.lib.format.read_array_header_2_0
+            forma, ordem_fortran, dtype = ler_cabecalho(arquivo)
+            arrays[nome] = np.ndarray(forma, dtype=dtype, buffer=mapa, offset=arquivo.tell(),
+                                      order='F' if ordem_fortran else 'C')
+    return arrays
+
+
+class FlorestaCompacta:
+    """
+    Preditor independente do sklearn para a floresta exportada por exportar_floresta_compacta.
+    Leituras repetidas (mesma estação e mesmos valores) são pontuadas uma única vez; todos os pares
+    (leitura, árvore) descem as árvores juntos, um nível por passo, só enquanto não chegam a uma
+    folha. As probabilidades das folhas são somadas na ordem das árvores, como no
+    RandomForestClassifier, de modo que as predições são idênticas às do pipeline.
+    Expõe feature_names_in_ e a mesma interface prever/prever_proba do PreditorEmLote.
+    """
+
+    # Abaixo disso a deduplicação das leituras custa mais do que economiza
+    MIN_LINHAS_DEDUPLICAR = 1024
+    # Até este tamanho de lote cada leitura desce as árvores em Python puro: com árvores profundas
+    # o laço por nível do NumPy paga mais em chamadas do que a travessia escalar
+    MAX_LINHAS_ESCALAR = 8
+
+    def __init__(self, arrays):
+        self.raizes = arrays['raizes']
+        self.feature = arrays['feature']
+        self.limiar = arrays['limiar']
+        self.nan_a_esquerda = arrays['nan_a_esquerda']
+        self.filhos = arrays['filhos']
+        self.valores = arrays['valores']
+        self.classes = arrays['classes']
+        self.colunas_numericas = list(arrays['colunas_numericas'])
+        self.feature_names_in_ = arrays['feature_names_in']
+        self.eh_folha = self.filhos[0::2] == np.arange(len(self.feature))
+        self.eh_estacao = ~self.eh_folha & (self.feature == len(self.colunas_numericas))
+
+        # Busca binária das estações: categorias ordenadas e a posição original de cada uma
+        categorias = arrays['categorias_estacao']
+        self._ordem_categorias = np.argsort(categorias, kind='stable')
+        self._categorias_ordenadas = categorias[self._ordem_categorias]
+        self._listas = None
+
+    def indices_estacoes(self, cod_estacoes):
+        """Categoria do one-hot de cada estação (-1 para estações desconhecidas)."""
+        cod_estacoes = np.asarray(cod_estacoes).astype(str, copy=False)
+        if len(self._categorias_ordenadas) == 0:
+            return np.full(len(cod_estacoes), -1, dtype='int64')
+        posicao = np.searchsorted(self._categorias_ordenadas, cod_estacoes)
+        posicao = np.minimum(posicao, len(self._categorias_ordenadas) - 1)
+        encontrada = self._categorias_ordenadas[posicao] == cod_estacoes
+        return np.where(encontrada, self._ordem_categorias[posicao], -1)
+
+    def montar_entradas(self, cod_estacoes, chuva_mm_h, features_extras=None):
+        """Vetor compacto de cada leitura: colunas numéricas (float32) e o índice da estação."""
+        estacao = self.indices_estacoes(cod_estacoes)
+        features_extras = features_extras or {}
+        X = np.empty((len(estacao), len(self.colunas_numericas) + 1), dtype=np.float32)
+        for j, nome in enumerate(self.colunas_numericas):
+            if nome == 'acumulado_chuva_1_h_mm':
+                valores = chuva_mm_h
+            elif nome in features_extras:
+                valores = features_extras[nome]
+            else:
+                raise ValueError(f"Feature '{nome}' exigida pelo modelo não foi informada.")
+            X[:, j] = np.asarray(valores, dtype='float64')
+        X[:, -1] = estacao
+        return X
+
+    def _prever_bloco(self, X):
+        n, n_arvores = X.shape[0], len(self.raizes)
+        X_plano = X.ravel()
+        tem_nan = np.isnan(X_plano).any()
+        no = np.tile(self.raizes, n)
+        posicoes = np.flatnonzero(~self.eh_folha[no])
+        no_ativo = no[posicoes]
+        base = (posicoes // n_arvores) * X.shape[1]
+        while len(posicoes):
+            valor = X_plano[base + self.feature[no_ativo]]
+            limiar = self.limiar[no_ativo]
+            direita_numerico = valor > limiar
+            if tem_nan:
+                direita_numerico = np.where(np.isnan(valor), ~self.nan_a_esquerda[no_ativo], direita_numerico)
+            vai_direita = np.where(self.eh_estacao[no_ativo], valor == limiar, direita_numerico)
+            no_ativo = self.filhos[2 * no_ativo + vai_direita]
+            chegou = self.eh_folha[no_ativo]
+            if chegou.any():
+                no[posicoes[chegou]] = no_ativo[chegou]
+                continua = ~chegou
+                posicoes, no_ativo, base = posicoes[continua], no_ativo[continua], base[continua]
+
+        folhas = self.valores[no].reshape(n, n_arvores, -1)
+        proba = np.zeros((n, folhas.shape[2]), dtype=np.float64)
+        for t in range(n_arvores):
+            proba += folhas[:, t]
+        proba /= n_arvores
+        return proba
+
+    def _prever_escalar(self, X):
+        # Mesma travessia de _prever_bloco sobre listas do Python, criadas na primeira chamada
+        if self._listas is None:
+            self._listas = (self.feature.tolist(), self.limiar.tolist(), self.filhos.tolist(), self.eh_estacao.tolist(),
+                            self.nan_a_esquerda.tolist(), self.eh_folha.tolist(), self.valores.tolist(), self.raizes.tolist())
+        feature, limiar, filhos, eh_estacao, nan_a_esquerda, eh_folha, valores, raizes = self._listas
+        proba = np.zeros((X.shape[0], self.valores.shape[1]), dtype=np.float64)
+        for i, x in enumerate(X.tolist()):
+            soma = [0.0] * self.valores.shape[1]
+            for no in raizes:
+                while not eh_folha[no]:
+                    valor = x[feature[no]]
+                    if eh_estacao[no]:
+                        direita = valor == limiar[no]
+                    elif valor != valor:
+                        direita = not nan_a_esquerda[no]
+                    else:
+                        direita = valor > limiar[no]
+                    no = filhos[2 * no + direita]
+                for c, p in enumerate(valores[no]):
+                    soma[c] += p
+            proba[i] = soma
+        proba /= len(raizes)
+        return proba
+
+    def prever_proba(self, cod_estacoes, chuva_mm_h, features_extras=None):
+        X = self.montar_entradas(cod_estacoes, chuva_mm_h, features_extras)
+        if len(X) <= self.MAX_LINHAS_ESCALAR:
+            return self._prever_escalar(X)
+        inverso = None
+        if len(X) >= self.MIN_LINHAS_DEDUPLICAR:
+            # Compara as linhas como blocos de bytes: leituras idênticas descem as árvores uma só vez
+            chaves = X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+            _, primeira, inverso = np.unique(chaves, return_index=True, return_inverse=True)
+            X = X[primeira]
+        blocos = [self._prever_bloco(X[i:i + TAMANHO_BLOCO_PREDICAO]) for i in range(0, len(X), TAMANHO_BLOCO_PREDICAO)]
+        proba = np.concatenate(blocos) if blocos else np.zeros((0, len(self.classes)))
+        return proba[inverso] if inverso is not None else proba
+
+    def prever(self, cod_estacoes, chuva_mm_h, features_extras=None):
+        """Nível de risco de cada leitura do lote (arrays de mesmo tamanho)."""
+        proba = self.prever_proba(cod_estacoes, chuva_mm_h, features_extras)
+        return self.classes.take(np.argmax(proba, axis=1), axis=0)
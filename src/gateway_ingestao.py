@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import collections
+import json
+import math
+import time
+
+import joblib
+import numpy as np
+
+from features_chuva import COLUNAS_BASE, BufferJanelas, janelas_do_modelo
+from inferencia_lote import obter_preditor
+from motor_alertas import INTENSIDADES, determinar_risco_final_lote
+
+# Protocolo: uma leitura JSON por linha em uma conexão TCP, por exemplo
+#   {"cod_estacao": "SP001", "acumulado_chuva_1_h_mm": 12.5, "intensidade": "Forte"}
+# Para cada leitura o gateway devolve, na mesma ordem, uma linha
+#   {"cod_estacao": "SP001", "risco_ml": 1, "risco_final": 2}
+# ou {"erro": "..."} quando a leitura é inválida. "intensidade" é opcional (padrão "Leve") e aceita
+# o nome ou o código (posição em INTENSIDADES). Com modelos de janelas móveis, cada leitura vale
+# como o acumulado da hora UTC em que chega; a última leitura da hora substitui as anteriores.
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+TAMANHO_FILA_PADRAO = 10_000
+TAMANHO_MAX_LOTE_PADRAO = 2048
+ESPERA_MAX_MS_PADRAO = 5.0
+CAMINHO_MODELO_PADRAO = "ml_model/cemaden_flood_risk_model_pipeline.joblib"
+
+class GatewayIngestao:
+    """
+    Gateway asyncio para leituras de muitos sensores simultâneos. As conexões colocam as leituras
+    em uma fila limitada (tamanho_fila): quando ela enche, a conexão para de ler o socket até
+    haver espaço, e o controle de fluxo do TCP segura os sensores (backpressure). Uma tarefa
+    única junta as leituras em micro-lotes (até tamanho_max_lote ou espera_max_ms) e os pontua
+    fora do loop de eventos, com o mesmo modelo e a mesma regra de risco final do simulador.
+    """
+
+    def __init__(self, modelo, tamanho_fila=TAMANHO_FILA_PADRAO, tamanho_max_lote=TAMANHO_MAX_LOTE_PADRAO,
+                 espera_max_ms=ESPERA_MAX_MS_PADRAO):
+        self.preditor = obter_preditor(modelo)
+        # Histórico recente por estação para as features de janelas, como no treino
+        janelas = janelas_do_modelo(modelo)
+        self.buffer_janelas = BufferJanelas(janelas) if janelas else None
+        self.tamanho_fila = tamanho_fila
+        self.tamanho_max_lote = tamanho_max_lote
+        self.espera_max = espera_max_ms / 1000.0
+        self.leituras = 0
+        self.lotes = 0
+        self.alertas_por_nivel = collections.Counter()
+        self.latencias = collections.deque(maxlen=100_000)
+        self.servidor = None
+        self._conexoes = set()
+
+    async def iniciar(self, host=HOST_PADRAO, porta=PORTA_PADRAO):
+        self.fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        self._tarefa_lotes = asyncio.create_task(self._processar_lotes())
+        self.servidor = await asyncio.start_server(self._atender_conexao, host, porta)
+        return self.servidor.sockets[0].getsockname()[1]
+
+    async def encerrar(self, espera_conexoes=5.0):
+        self.servidor.close()
+        # Conexões ainda abertas terminam de responder o que já receberam antes de serem canceladas
+        if self._conexoes:
+            _, restantes = await asyncio.wait(self._conexoes, timeout=espera_conexoes)
+            for tarefa in restantes:
+                tarefa.cancel()
+        await self.servidor.wait_closed()
+        self._tarefa_lotes.cancel()
+
+    def carregar_historico(self, caminho=None):
+        """
+        Preenche o histórico das janelas com as últimas horas do dataset horário, para que as
+        primeiras leituras de cada estação não sejam pontuadas com janelas vazias. Retorna o
+        número de horas carregadas (0 se o modelo não usa janelas).
+        """
+        if self.buffer_janelas is None:
+            return 0
+        import pandas as pd
+        from armazenamento_horario import carregar_dados_horarios
+
+        hora_atual = pd.Timestamp(int(time.time() // 3600) * 3600, unit='s')
+        historico = carregar_dados_horarios(COLUNAS_BASE, inicio=hora_atual - pd.Timedelta(hours=self.buffer_janelas.tamanho - 1),
+                                            fim=hora_atual - pd.Timedelta(hours=1), caminho=caminho)
+        historico = historico.sort_values('datahora_utc_hora', kind='stable')
+        self.buffer_janelas.atualizar(historico['cod_estacao'].astype(str).tolist(),
+                                      pd.to_datetime(historico['datahora_utc_hora']).to_numpy(),
+                                      historico['acumulado_chuva_1_h_mm'].to_numpy())
+        return len(historico)
+
+    def estatisticas(self):
+        latencias = np.array(self.latencias) * 1e3 if self.latencias else np.zeros(1)
+        p50, p99 = np.percentile(latencias, [50, 99])
+        return {'leituras': self.leituras, 'lotes': self.lotes, 'fila': self.fila.qsize(),
+                'leituras_por_lote': self.leituras / max(self.lotes, 1),
+                'latencia_interna_p50_ms': p50, 'latencia_interna_p99_ms': p99,
+                'alertas_por_nivel': dict(sorted(self.alertas_por_nivel.items()))}
+
+    async def _atender_conexao(self, leitor, escritor):
+        loop = asyncio.get_running_loop()
+        self._conexoes.add(asyncio.current_task())
+        pendentes = asyncio.Queue()
+        tarefa_respostas = asyncio.create_task(self._responder(escritor, pendentes))
+        try:
+            while (linha := await _ler_linha(leitor)) != b'':
+                futuro = loop.create_future()
+                try:
+                    if linha is None:
+                        raise ValueError("linha maior que o limite de leitura do gateway")
+                    leitura = json.loads(linha)
+                    item = (time.perf_counter(), str(leitura['cod_estacao']), _chuva_valida(leitura['acumulado_chuva_1_h_mm']),
+                            _codigo_intensidade(leitura.get('intensidade')), futuro)
+                except (ValueError, KeyError, TypeError) as e:
+                    # Só esta leitura é recusada; as demais seguem para o micro-lote
+                    futuro.set_result({'erro': f"Leitura inválida: {e}"})
+                else:
+                    # Bloqueia aqui enquanto a fila estiver cheia (backpressure sobre o socket)
+                    await self.fila.put(item)
+                await pendentes.put(futuro)
+        except ConnectionError:
+            pass
+        finally:
+            await pendentes.put(None)
+            try:
+                await tarefa_respostas
+            finally:
+                escritor.close()
+                self._conexoes.discard(asyncio.current_task())
+
+    async def _responder(self, escritor, pendentes):
+        # Respostas na mesma ordem das leituras da conexão
+        try:
+            while (futuro := await pendentes.get()) is not None:
+                escritor.write((json.dumps(await futuro) + '\n').encode())
+                if pendentes.empty():
+                    await escritor.drain()
+        except ConnectionError:
+            pass
+
+    async def _processar_lotes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self.fila.get()]
+            prazo = loop.time() + self.espera_max
+            while len(lote) < self.tamanho_max_lote:
+                if not self.fila.empty():
+                    lote.append(self.fila.get_nowait())
+                    continue
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self.fila.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            cod_estacoes = [item[1] for item in lote]
+            chuva = np.array([item[2] for item in lote], dtype='float64')
+            intensidades = np.array([item[3] for item in lote], dtype=np.int8)
+            try:
+                # Pontuação em outra thread: o loop segue aceitando leituras enquanto o lote é avaliado
+                risco_ml, risco_final = await loop.run_in_executor(None, self._pontuar, cod_estacoes, chuva, intensidades)
+            except Exception as e:
+                for item in lote:
+                    item[4].set_result({'erro': f"Falha na predição: {e}"})
+                continue
+
+            agora = time.perf_counter()
+            self.lotes += 1
+            self.leituras += len(lote)
+            self.alertas_por_nivel.update(risco_final.tolist())
+            for item, ml, final in zip(lote, risco_ml.tolist(), risco_final.tolist()):
+                self.latencias.append(agora - item[0])
+                item[4].set_result({'cod_estacao': item[1], 'risco_ml': ml, 'risco_final': final})
+
+    def _pontuar(self, cod_estacoes, chuva, intensidades):
+        extras = None
+        if self.buffer_janelas is not None:
+            hora = int(time.time() // 3600)
+            extras = self.buffer_janelas.atualizar(cod_estacoes, np.full(len(cod_estacoes), hora), chuva)
+        risco_ml = np.asarray(self.preditor.prever(cod_estacoes, chuva, extras), dtype='int64')
+        return risco_ml, determinar_risco_final_lote(risco_ml, intensidades)
+
+
+def _chuva_valida(valor):
+    # json.loads aceita NaN e Infinity: uma leitura assim contaminaria as janelas da estação por horas
+    chuva = float(valor)
+    if not math.isfinite(chuva) or chuva < 0:
+        raise ValueError(f"acumulado_chuva_1_h_mm {valor!r} (esperado um número finito maior ou igual a 0)")
+    return chuva
+
+
+def _codigo_intensidade(intensidade):
+    # Validada por leitura: um valor inválido derrubaria a predição do micro-lote inteiro
+    if intensidade is None:
+        return 0
+    if isinstance(intensidade, str) and intensidade in INTENSIDADES:
+        return INTENSIDADES.index(intensidade)
+    if isinstance(intensidade, int) and not isinstance(intensidade, bool) and 0 <= intensidade < len(INTENSIDADES):
+        return intensidade
+    raise ValueError(f"intensidade {intensidade!r} (use {', '.join(INTENSIDADES)} ou um código de 0 a {len(INTENSIDADES) - 1})")
+
+
+async def _ler_linha(leitor):
+    """
+    Próxima linha da conexão, b'' no fim dela, ou None quando a linha passa do limite do
+    StreamReader; nesse caso ela é descartada até o '\\n' sem ser acumulada na memória.
+    """
+    try:
+        return await leitor.readuntil(b'\n')
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError as e:
+        excedentes = e.consumed
+    while True:
+        await leitor.readexactly(excedentes)
+        try:
+            await leitor.readuntil(b'\n')
+            return None
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError as e:
+            excedentes = e.consumed
+
+
+async def executar_gateway(args):
+    # O pipeline (árvores do sklearn via PreditorEmLote) é o mais rápido para lotes de centenas de leituras;
+    # a floresta compacta compensa só em leituras isoladas, como no simulador
+    modelo = joblib.load(args.modelo)
+    gateway = GatewayIngestao(modelo, args.tamanho_fila, args.tamanho_lote, args.espera_ms)
+    if gateway.buffer_janelas is not None:
+        try:
+            horas = gateway.carregar_historico(args.historico)
+        except (FileNotFoundError, ImportError, ValueError) as e:
+            horas = 0
+            print(f"Aviso: histórico horário indisponível ({e}).")
+        if horas:
+            print(f"Histórico das janelas carregado: {horas:,} horas de estações.")
+        else:
+            print(f"Aviso: o modelo usa janelas de até {gateway.buffer_janelas.tamanho} h e não há histórico recente; "
+                  f"as predições de cada estação só ficam equivalentes às do treino depois desse período de leituras.")
+    porta = await gateway.iniciar(args.host, args.porta)
+    print(f"Gateway de ingestão ouvindo em {args.host}:{porta} (fila {args.tamanho_fila}, "
+          f"lotes de até {args.tamanho_lote} leituras ou {args.espera_ms} ms)")
+    leituras_anteriores = 0
+    while True:
+        await asyncio.sleep(args.intervalo_relatorio)
+        e = gateway.estatisticas()
+        if e['leituras'] == leituras_anteriores:
+            continue
+        taxa = (e['leituras'] - leituras_anteriores) / args.intervalo_relatorio
+        leituras_anteriores = e['leituras']
+        print(f"{taxa:,.0f} leituras/s | {e['leituras']:,} leituras em {e['lotes']:,} lotes "
+              f"({e['leituras_por_lote']:.1f}/lote) | fila {e['fila']} | latência interna p50 "
+              f"{e['latencia_interna_p50_ms']:.1f} ms p99 {e['latencia_interna_p99_ms']:.1f} ms | "
+              f"alertas por nível {e['alertas_por_nivel']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gateway asyncio de ingestão de leituras de sensores (JSON por linha via TCP).")
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--modelo', default=CAMINHO_MODELO_PADRAO)
+    parser.add_argument('--tamanho-fila', type=int, default=TAMANHO_FILA_PADRAO, help="Leituras aguardando predição antes de aplicar backpressure.")
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_MAX_LOTE_PADRAO)
+    parser.add_argument('--espera-ms', type=float, default=ESPERA_MAX_MS_PADRAO, help="Espera máxima para completar um micro-lote.")
+    parser.add_argument('--intervalo-relatorio', type=float, default=5.0)
+    parser.add_argument('--historico', default=None,
+                        help="Dataset horário usado para preencher as janelas móveis na partida (padrão: o do processamento).")
+    args = parser.parse_args()
+    try:
+        asyncio.run(executar_gateway(args))
+    except KeyboardInterrupt:
+        print("Gateway encerrado.")
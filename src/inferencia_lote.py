@@ -0,0 +1,193 @@
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from floresta_compacta import FlorestaCompacta, extrair_layout_entrada
+
+# Limites padrão do serviço de micro-lotes: um lote é disparado ao atingir o tamanho máximo
+# ou quando a requisição mais antiga já esperou espera_max_ms
+TAMANHO_MAX_LOTE_PADRAO = 4096
+ESPERA_MAX_MS_PADRAO = 2.0
+
+_PREDITORES = weakref.WeakKeyDictionary()
+
+
+class PreditorEmLote:
+    """
+    Pontua lotes de leituras (estação, chuva e, se o modelo exigir, features de janelas) com o
+    pipeline treinado por 2_train_model.py, sem montar DataFrames nem passar pelo ColumnTransformer.
+    Na construção o mapa estação -> coluna do one-hot e a posição de cada coluna numérica são
+    extraídos do pipeline; a cada chamada a matriz de entrada é montada direto em NumPy (float32,
+    como o RandomForest usa internamente) e as árvores são percorridas em sequência, sem o
+    despacho do joblib. As predições são idênticas às de modelo.predict.
+    """
+
+    def __init__(self, modelo):
+        self.classificador = modelo.named_steps['classifier']
+        self.classes = self.classificador.classes_
+        categorias, self.coluna_inicial_onehot, self.colunas_numericas, self.posicoes_numericas, self.n_colunas = \
+            extrair_layout_entrada(modelo)
+        # Estações desconhecidas ficam com todas as colunas zeradas (handle_unknown='ignore')
+        self.indice_estacoes = pd.Index(categorias)
+
+    def montar_matriz(self, cod_estacoes, chuva_mm_h, features_extras=None):
+        """Matriz de entrada do classificador, na mesma ordem de colunas do ColumnTransformer."""
+        cod_estacoes = np.asarray(cod_estacoes).astype(str, copy=False)
+        n = len(cod_estacoes)
+        X = np.zeros((n, self.n_colunas), dtype=np.float32)
+
+        colunas = self.indice_estacoes.get_indexer(cod_estacoes)
+        conhecidas = colunas >= 0
+        X[np.flatnonzero(conhecidas), self.coluna_inicial_onehot + colunas[conhecidas]] = 1.0
+
+        features_extras = features_extras or {}
+        for nome, posicao in zip(self.colunas_numericas, self.posicoes_numericas):
+            if nome == 'acumulado_chuva_1_h_mm':
+                valores = chuva_mm_h
+            elif nome in features_extras:
+                valores = features_extras[nome]
+            else:
+                raise ValueError(f"Feature '{nome}' exigida pelo modelo não foi informada.")
+            X[:, posicao] = np.asarray(valores, dtype='float64')
+        return X
+
+    def prever_proba(self, cod_estacoes, chuva_mm_h, features_extras=None):
+        X = self.montar_matriz(cod_estacoes, chuva_mm_h, features_extras)
+        # Mesma acumulação de RandomForestClassifier.predict_proba, na ordem das árvores
+        proba = np.zeros((X.shape[0], len(self.classes)), dtype=np.float64)
+        for arvore in self.classificador.estimators_:
+            proba += arvore.predict_proba(X, check_input=False)
+        proba /= len(self.classificador.estimators_)
+        return proba
+
+    def prever(self, cod_estacoes, chuva_mm_h, features_extras=None):
+        """Nível de risco de cada leitura do lote (arrays de mesmo tamanho)."""
+        proba = self.prever_proba(cod_estacoes, chuva_mm_h, features_extras)
+        return self.classes.take(np.argmax(proba, axis=1), axis=0)
+
+
+class PreditorPipeline:
+    """
+    Alternativa para pipelines cuja codificação de estação (ordinal, alvo, geo) não é suportada
+    pelo PreditorEmLote: mesma interface, montando um único DataFrame por lote para modelo.predict.
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.colunas_entrada = list(modelo.feature_names_in_)
+        self.colunas_numericas = [c for c in self.colunas_entrada if c != 'cod_estacao']
+
+    def montar_dataframe(self, cod_estacoes, chuva_mm_h, features_extras=None):
+        features_extras = features_extras or {}
+        dados = {'cod_estacao': np.asarray(cod_estacoes)}
+        for nome in self.colunas_numericas:
+            if nome == 'acumulado_chuva_1_h_mm':
+                dados[nome] = np.asarray(chuva_mm_h, dtype='float64')
+            elif nome in features_extras:
+                dados[nome] = np.asarray(features_extras[nome], dtype='float64')
+            else:
+                raise ValueError(f"Feature '{nome}' exigida pelo modelo não foi informada.")
+        return pd.DataFrame(dados)[self.colunas_entrada]
+
+    def prever_proba(self, cod_estacoes, chuva_mm_h, features_extras=None):
+        return self.modelo.predict_proba(self.montar_dataframe(cod_estacoes, chuva_mm_h, features_extras))
+
+    def prever(self, cod_estacoes, chuva_mm_h, features_extras=None):
+        return self.modelo.predict(self.montar_dataframe(cod_estacoes, chuva_mm_h, features_extras))
+
+
+def obter_preditor(modelo):
+    """
+    PreditorEmLote do modelo, criado na primeira chamada e reutilizado enquanto o modelo existir.
+    Uma FlorestaCompacta já tem a mesma interface e é devolvida como está; pipelines com outra
+    codificação de estação usam o PreditorPipeline.
+    """
+    if isinstance(modelo, FlorestaCompacta):
+        return modelo
+    preditor = _PREDITORES.get(modelo)
+    if preditor is None:
+        try:
+            preditor = PreditorEmLote(modelo)
+        except ValueError:
+            preditor = PreditorPipeline(modelo)
+        _PREDITORES[modelo] = preditor
+    return preditor
+
+
+class ServicoMicroLotes:
+    """
+    Agrupa requisições concorrentes de uma leitura em lotes pontuados de uma vez pelo
+    PreditorEmLote. Cada chamada a submeter() devolve um Future; uma thread de fundo junta as
+    requisições que chegam em até espera_max_ms (ou até tamanho_max_lote) e resolve todos os
+    Futures do lote com uma única predição.
+    """
+
+    def __init__(self, preditor, tamanho_max_lote=TAMANHO_MAX_LOTE_PADRAO, espera_max_ms=ESPERA_MAX_MS_PADRAO):
+        self.preditor = preditor
+        self.tamanho_max_lote = tamanho_max_lote
+        self.espera_max = espera_max_ms / 1000.0
+        self.lotes_processados = 0
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._processar, name='servico-micro-lotes', daemon=True)
+        self._thread.start()
+
+    def submeter(self, cod_estacao, chuva_mm_h, features_extras=None):
+        futuro = Future()
+        self._fila.put((cod_estacao, chuva_mm_h, features_extras, futuro))
+        return futuro
+
+    def prever(self, cod_estacao, chuva_mm_h, features_extras=None):
+        """Versão bloqueante de submeter(): devolve o nível de risco de uma leitura."""
+        return self.submeter(cod_estacao, chuva_mm_h, features_extras).result()
+
+    def fechar(self):
+        """Processa as requisições pendentes e encerra a thread de fundo."""
+        self._fila.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _processar(self):
+        encerrar = False
+        while not encerrar:
+            item = self._fila.get()
+            if item is None:
+                break
+            lote = [item]
+            prazo = time.perf_counter() + self.espera_max
+            while len(lote) < self.tamanho_max_lote:
+                try:
+                    restante = prazo - time.perf_counter()
+                    item = self._fila.get_nowait() if restante <= 0 else self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is None:
+                    encerrar = True
+                    break
+                lote.append(item)
+            self._pontuar(lote)
+
+    def _pontuar(self, lote):
+        cod_estacoes = [item[0] for item in lote]
+        chuva = np.array([item[1] for item in lote], dtype='float64')
+        try:
+            extras = None
+            if lote[0][2]:
+                extras = {nome: np.array([item[2][nome] for item in lote], dtype='float64') for nome in lote[0][2]}
+            riscos = self.preditor.prever(cod_estacoes, chuva, extras)
+        except Exception as e:
+            for item in lote:
+                item[3].set_exception(e)
+            return
+        self.lotes_processados += 1
+        for item, risco in zip(lote, riscos):
+            item[3].set_result(int(risco))
@@ -0,0 +1,328 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Mapeamento das colunas do CSV do CEMADEN para os nomes padronizados usados no projeto
+MAPA_RENOMEAR_CEMADEN = {
+    'municipio': 'municipio', 'codEstacao': 'cod_estacao', 'uf': 'uf',
+    'nomeEstacao': 'nome_estacao', 'latitude': 'latitude', 'longitude': 'longitude',
+    'datahora': 'datahora_utc', 'valorMedida': 'chuva_10min_mm'
+}
+
+# Colunas preservadas da primeira ocorrência de cada (estação, hora)
+COLUNAS_PRIMEIRA_OCORRENCIA = ['municipio', 'uf', 'nome_estacao', 'latitude', 'longitude', 'datahora_brasilia_ref']
+
+CHAVES_HORARIAS = ['cod_estacao', 'hora_utc_agrupada']
+
+COLUNAS_ESSENCIAIS = ['datahora_utc', 'chuva_10min_mm', 'cod_estacao']
+
+# Linhas lidas por bloco; mantém o pico de memória limitado independentemente do tamanho do arquivo
+TAMANHO_BLOCO_PADRAO = 500_000
+
+# Bytes por fatia no modo paralelo; arquivos maiores são divididos para que vários processos leiam o mesmo mês
+TAMANHO_FATIA_PADRAO = 64 * 1024 * 1024
+
+
+def _coluna_cemaden(nome_coluna):
+    return nome_coluna.replace('\ufeff', '') in MAPA_RENOMEAR_CEMADEN
+
+
+def _ler_cabecalho(arquivo_csv):
+    with open(arquivo_csv, 'rb') as f:
+        linha = f.readline()
+    return [c.strip().strip('"').replace('\ufeff', '') for c in linha.decode('utf-8').strip().split(';')]
+
+
+def ler_csv_cemaden_em_blocos(arquivo_csv, tamanho_bloco=TAMANHO_BLOCO_PADRAO, inicio=None, fim=None):
+    """
+    Lê um CSV mensal do CEMADEN em blocos de tamanho limitado usando o parser C do pandas.
+    Cada bloco já sai com BOM removido e colunas renomeadas para o padrão do projeto.
+    Se inicio/fim forem informados, lê apenas o intervalo de bytes [inicio, fim) do arquivo,
+    que deve começar e terminar em fronteiras de linha (ver dividir_arquivo_em_fatias).
+    """
+    if inicio is None:
+        leitor = pd.read_csv(
+            arquivo_csv, encoding='utf-8', sep=';', decimal=',', engine='c',
+            usecols=_coluna_cemaden, dtype={'codEstacao': str, '\ufeffcodEstacao': str},
+            chunksize=tamanho_bloco
+        )
+    else:
+        with open(arquivo_csv, 'rb') as f:
+            f.seek(inicio)
+            dados = f.read(fim - inicio)
+        leitor = pd.read_csv(
+            io.BytesIO(dados), encoding='utf-8', sep=';', decimal=',', engine='c',
+            header=None, names=_ler_cabecalho(arquivo_csv), usecols=_coluna_cemaden,
+            dtype={'codEstacao': str}, chunksize=tamanho_bloco
+        )
+    with leitor:
+        for df_bloco in leitor:
+            df_bloco.columns = [c.replace('\ufeff', '') for c in df_bloco.columns]
+            df_bloco.rename(columns=MAPA_RENOMEAR_CEMADEN, inplace=True)
+            yield df_bloco
+
+
+def dividir_arquivo_em_fatias(arquivo_csv, tamanho_fatia=TAMANHO_FATIA_PADRAO):
+    """
+    Divide o corpo de um CSV (sem o cabeçalho) em intervalos de bytes de aproximadamente
+    tamanho_fatia, alinhados ao início de linhas. Retorna uma lista de (arquivo, inicio, fim).
+    """
+    tamanho_arquivo = os.path.getsize(arquivo_csv)
+    fatias = []
+    with open(arquivo_csv, 'rb') as f:
+        f.readline()
+        inicio = f.tell()
+        while inicio < tamanho_arquivo:
+            f.seek(min(inicio + tamanho_fatia, tamanho_arquivo))
+            f.readline()
+            fim = min(f.tell(), tamanho_arquivo)
+            fatias.append((arquivo_csv, inicio, fim))
+            inicio = fim
+    return fatias
+
+
+def agregar_bloco_horario(df_bloco):
+    """
+    Pré-agrega um bloco de leituras de 10 minutos em somas parciais por (estação, hora UTC).
+    O resultado é um estado parcial que pode ser combinado com outros via combinar_parciais_horarias.
+    """
+    df_bloco['datahora_utc'] = pd.to_datetime(df_bloco['datahora_utc'])
+    df_bloco['chuva_10min_mm'] = pd.to_numeric(df_bloco['chuva_10min_mm'], errors='coerce').fillna(0)
+    df_bloco['datahora_brasilia_ref'] = df_bloco['datahora_utc'] - pd.Timedelta(hours=3)
+    df_bloco['hora_utc_agrupada'] = df_bloco['datahora_utc'].dt.floor('h')
+
+    agregacoes = {'acumulado_chuva_1_h_mm': ('chuva_10min_mm', 'sum')}
+    agregacoes.update({col: (col, 'first') for col in COLUNAS_PRIMEIRA_OCORRENCIA})
+    parcial = df_bloco.groupby(CHAVES_HORARIAS, sort=False).agg(**agregacoes)
+
+    # Guarda as leituras brutas (em ordem) das horas de borda de cada estação no bloco, que são as
+    # únicas que podem continuar no bloco ou arquivo seguinte
+    chaves_borda = parcial.index[_horas_de_borda(parcial.index)]
+    linhas_borda = pd.MultiIndex.from_frame(df_bloco[CHAVES_HORARIAS]).isin(chaves_borda)
+    parcial['leituras'] = df_bloco.loc[linhas_borda].groupby(CHAVES_HORARIAS, sort=False)['chuva_10min_mm'].agg(tuple)
+    return parcial
+
+
+def _horas_de_borda(indice):
+    # Máscara das horas que são a primeira ou a última de sua estação dentro do índice (estação, hora)
+    horas = pd.Series(indice.get_level_values(1), index=indice)
+    por_estacao = horas.groupby(indice.get_level_values(0), sort=False)
+    return ((horas == por_estacao.transform('min')) | (horas == por_estacao.transform('max'))).to_numpy()
+
+
+def combinar_parciais_horarias(parciais):
+    """
+    Combina estados parciais (na ordem de leitura) mantendo o primeiro valor não nulo das
+    demais colunas, como faz o groupby 'first' original. Horas presentes em mais de um parcial
+    têm o acumulado recalculado a partir das leituras brutas concatenadas, o que reproduz
+    exatamente a soma do modo em memória; se as leituras não estiverem disponíveis (arquivo
+    fora de ordem cronológica por estação), os acumulados parciais são somados.
+    """
+    if len(parciais) == 1:
+        return parciais[0]
+    df_parciais = pd.concat(parciais)
+    repetidas_mask = df_parciais.index.duplicated(keep=False)
+
+    if repetidas_mask.any():
+        repetidas = df_parciais[repetidas_mask]
+        por_chave = repetidas.groupby(level=CHAVES_HORARIAS, sort=False)
+        agregacoes = {'acumulado_chuva_1_h_mm': 'sum'}
+        agregacoes.update({col: 'first' for col in COLUNAS_PRIMEIRA_OCORRENCIA})
+        combinadas = por_chave.agg(agregacoes)
+
+        completas = repetidas['leituras'].notna().groupby(level=CHAVES_HORARIAS, sort=False).all()
+        leituras = repetidas.loc[completas[completas].index, 'leituras']
+        leituras = leituras.groupby(level=CHAVES_HORARIAS, sort=False).agg(lambda partes: sum(partes, ()))
+        if len(leituras):
+            somas_exatas = leituras.explode().astype('float64').groupby(level=CHAVES_HORARIAS, sort=False).sum()
+            combinadas.loc[somas_exatas.index, 'acumulado_chuva_1_h_mm'] = somas_exatas
+        combinadas['leituras'] = leituras
+
+        aproximadas = int((~completas).sum())
+        if aproximadas:
+            print(f"Aviso: {aproximadas} horas com leituras fora de ordem foram combinadas por soma de parciais "
+                  f"(diferenças de arredondamento na última casa decimal são possíveis).")
+        df_parciais = pd.concat([df_parciais[~repetidas_mask], combinadas])
+
+    # Só as horas de borda de cada estação podem reaparecer em parciais seguintes
+    df_parciais['leituras'] = df_parciais['leituras'].where(_horas_de_borda(df_parciais.index))
+    return df_parciais
+
+
+class AcumuladorHorario:
+    """
+    Acumula estados parciais horários na ordem de leitura sem recombinar o estado inteiro a cada
+    novo parcial. Só as horas de borda de cada estação (as que guardam leituras) podem reaparecer
+    em parciais seguintes, então apenas elas são combinadas com os parciais novos; as horas que
+    deixam de ser borda são anexadas a uma lista e ficam intocadas até estado(). O custo de cada
+    adição é proporcional ao parcial novo mais as bordas, não ao estado acumulado.
+    """
+
+    def __init__(self):
+        self.interiores = []
+        self.borda = None
+
+    def adicionar(self, parciais):
+        if not parciais:
+            return
+        combinado = combinar_parciais_horarias(([self.borda] if self.borda is not None else []) + list(parciais))
+        borda = combinado['leituras'].notna().to_numpy()
+        if not borda.all():
+            self.interiores.append(combinado[~borda])
+        self.borda = combinado[borda]
+
+    def estado(self):
+        """
+        Estado combinado de tudo o que foi adicionado (None se nada foi). A combinação final ainda
+        confere colisões entre todas as partes, o que só ocorre com arquivos fora de ordem.
+        """
+        partes = self.interiores + ([self.borda] if self.borda is not None else [])
+        return combinar_parciais_horarias(partes) if partes else None
+
+
+def _ajustar_tipo_cod_estacao(df_horario):
+    # No modo em memória o pandas infere 'cod_estacao' como inteiro quando todos os códigos são numéricos;
+    # a conversão garante a mesma ordenação (e portanto a mesma saída) no modo streaming.
+    codigos = df_horario['cod_estacao']
+    codigos_numericos = pd.to_numeric(codigos, errors='coerce')
+    if len(codigos) and codigos_numericos.notna().all() and (codigos_numericos % 1 == 0).all():
+        df_horario['cod_estacao'] = codigos_numericos.astype('int64')
+    return df_horario
+
+
+def agregar_arquivo_em_streaming(arquivo_csv, tamanho_bloco=TAMANHO_BLOCO_PADRAO, inicio=None, fim=None):
+    """
+    Agrega um único arquivo mensal (ou um intervalo de bytes dele), bloco a bloco, em um estado
+    parcial horário indexado por (cod_estacao, hora_utc_agrupada). Os parciais dos blocos são
+    combinados sempre que passam do tamanho de um bloco, de modo que apenas o estado horário
+    permanece residente. Levanta KeyError se faltarem colunas essenciais.
+    """
+    acumulador = AcumuladorHorario()
+    pendentes = []
+    linhas_pendentes = 0
+    linhas_arquivo = 0
+
+    for df_bloco in ler_csv_cemaden_em_blocos(arquivo_csv, tamanho_bloco, inicio, fim):
+        faltantes = [c for c in COLUNAS_ESSENCIAIS if c not in df_bloco.columns]
+        if faltantes:
+            raise KeyError(f"Colunas essenciais {faltantes} não encontradas. Colunas disponíveis: {df_bloco.columns.tolist()}")
+        linhas_arquivo += len(df_bloco)
+        parcial = agregar_bloco_horario(df_bloco)
+        pendentes.append(parcial)
+        linhas_pendentes += len(parcial)
+        if linhas_pendentes >= tamanho_bloco:
+            acumulador.adicionar(pendentes)
+            pendentes, linhas_pendentes = [], 0
+
+    acumulador.adicionar(pendentes)
+
+    if inicio is None:
+        print(f"Lido {arquivo_csv} em blocos de até {tamanho_bloco} linhas ({linhas_arquivo} linhas).")
+    return acumulador.estado()
+
+
+def finalizar_estado_horario(estado):
+    """
+    Converte o estado parcial combinado no DataFrame horário ordenado por (estação, hora),
+    idêntico ao produzido pelo groupby em memória.
+    """
+    df_horario = _ajustar_tipo_cod_estacao(estado.drop(columns='leituras').reset_index())
+    df_horario.sort_values(CHAVES_HORARIAS, inplace=True, kind='stable')
+    df_horario.reset_index(drop=True, inplace=True)
+    return df_horario
+
+
+def agregar_arquivos_em_streaming(arquivos_csv, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Agrega os arquivos mensais para dados horários sem carregar nenhum arquivo inteiro em memória.
+    Horas que atravessam blocos ou arquivos são combinadas na ordem de leitura. Retorna o mesmo
+    DataFrame que o groupby em memória produziria, ou None se nenhum arquivo puder ser lido.
+    """
+    acumulador = AcumuladorHorario()
+
+    for arquivo_csv in arquivos_csv:
+        try:
+            estado_arquivo = agregar_arquivo_em_streaming(arquivo_csv, tamanho_bloco)
+        except Exception as e:
+            print(f"Erro ao ler o arquivo {arquivo_csv} em modo streaming: {e}. Pulando este arquivo.")
+            continue
+        if estado_arquivo is not None:
+            acumulador.adicionar([estado_arquivo])
+
+    estado = acumulador.estado()
+    if estado is None:
+        print("Nenhum arquivo mensal foi lido em modo streaming. Encerrando.")
+        return None
+
+    return finalizar_estado_horario(estado)
+
+
+def _agregar_fatia(fatia, tamanho_bloco):
+    # Executada nos processos de trabalho; erros voltam como texto para o processo principal decidir
+    arquivo_csv, inicio, fim = fatia
+    try:
+        return agregar_arquivo_em_streaming(arquivo_csv, tamanho_bloco, inicio, fim), None
+    except Exception as e:
+        return None, str(e)
+
+
+def agregar_arquivos_em_paralelo(arquivos_csv, workers, tamanho_bloco=TAMANHO_BLOCO_PADRAO,
+                                 tamanho_fatia=TAMANHO_FATIA_PADRAO):
+    """
+    Agrega os arquivos mensais em paralelo usando um pool de processos. Cada arquivo é dividido
+    em fatias de bytes alinhadas a linhas; cada fatia é lida e pré-agregada em um processo e os
+    estados parciais são combinados no processo principal na ordem (arquivo, fatia), de modo que
+    o resultado é determinístico e idêntico ao do modo em memória. Um arquivo com qualquer fatia
+    ilegível é ignorado por inteiro, como no modo sequencial.
+    """
+    fatias = []
+    for arquivo_csv in arquivos_csv:
+        try:
+            fatias.extend(dividir_arquivo_em_fatias(arquivo_csv, tamanho_fatia))
+        except Exception as e:
+            print(f"Erro ao dividir o arquivo {arquivo_csv} em fatias: {e}. Pulando este arquivo.")
+    print(f"{len(fatias)} fatias de até {tamanho_fatia // (1024 * 1024)} MB distribuídas entre {workers} processos.")
+
+    if workers <= 1:
+        resultados = (_agregar_fatia(fatia, tamanho_bloco) for fatia in fatias)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        resultados = executor.map(_agregar_fatia, fatias, [tamanho_bloco] * len(fatias))
+
+    acumulador = AcumuladorHorario()
+    arquivo_atual, acumulador_arquivo, erro_arquivo = None, None, None
+
+    def _fechar_arquivo():
+        if arquivo_atual is None:
+            return
+        if erro_arquivo is not None:
+            print(f"Erro ao ler o arquivo {arquivo_atual} em modo paralelo: {erro_arquivo}. Pulando este arquivo.")
+            return
+        estado_arquivo = acumulador_arquivo.estado()
+        if estado_arquivo is not None:
+            acumulador.adicionar([estado_arquivo])
+            print(f"Agregado {arquivo_atual}.")
+
+    try:
+        for (arquivo_csv, _, _), (parcial, erro) in zip(fatias, resultados):
+            if arquivo_csv != arquivo_atual:
+                _fechar_arquivo()
+                arquivo_atual, acumulador_arquivo, erro_arquivo = arquivo_csv, AcumuladorHorario(), None
+            if erro is not None:
+                erro_arquivo = erro
+            elif parcial is not None and erro_arquivo is None:
+                acumulador_arquivo.adicionar([parcial])
+        _fechar_arquivo()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    estado = acumulador.estado()
+    if estado is None:
+        print("Nenhum arquivo mensal foi lido em modo paralelo. Encerrando.")
+        return None
+
+    return finalizar_estado_horario(estado)
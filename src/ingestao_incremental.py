@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from ingestao_cemaden import (CHAVES_HORARIAS, TAMANHO_BLOCO_PADRAO, agregar_arquivo_em_streaming,
+                              combinar_parciais_horarias, finalizar_estado_horario)
+
+CAMINHO_MANIFESTO = os.path.join("data", "manifesto_ingestao.json")
+
+# Estados parciais horários de cada arquivo fonte já processado. Cada um guarda as leituras brutas
+# das horas de borda, o que permite recombinar exatamente horas que atravessam dois arquivos.
+DIRETORIO_PARCIAIS = os.path.join("data", "parciais_ingestao")
+
+
+def calcular_hash_arquivo(caminho, tamanho_leitura=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_leitura), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def carregar_manifesto(caminho=CAMINHO_MANIFESTO):
+    if not os.path.exists(caminho):
+        return {'arquivos': {}}
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_manifesto(manifesto, caminho=CAMINHO_MANIFESTO):
+    # Escrita atômica: o manifesto só passa a valer depois que o armazenamento foi atualizado
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    caminho_tmp = caminho + '.tmp'
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+    os.replace(caminho_tmp, caminho)
+
+
+def identificar_arquivos_alterados(arquivos_csv, manifesto):
+    """
+    Compara os arquivos com o manifesto e retorna a lista de (arquivo, tamanho, mtime, sha256)
+    dos arquivos novos ou cujo conteúdo mudou. Arquivos com tamanho e mtime iguais aos do
+    manifesto não são lidos; se só o mtime mudou e o hash é o mesmo, o manifesto é atualizado.
+    """
+    alterados = []
+    for arquivo_csv in arquivos_csv:
+        info = os.stat(arquivo_csv)
+        entrada = manifesto['arquivos'].get(arquivo_csv)
+        if entrada and entrada['tamanho'] == info.st_size and entrada['mtime'] == info.st_mtime:
+            continue
+        sha256 = calcular_hash_arquivo(arquivo_csv)
+        if entrada and entrada['sha256'] == sha256:
+            entrada['mtime'] = info.st_mtime
+            continue
+        alterados.append((arquivo_csv, info.st_size, info.st_mtime, sha256))
+    return alterados
+
+
+def _caminho_parcial(arquivo_csv, sha256):
+    nome = os.path.splitext(os.path.basename(arquivo_csv))[0]
+    return os.path.join(DIRETORIO_PARCIAIS, f"{nome}-{sha256[:16]}.pkl")
+
+
+def _ordem_arquivos(manifesto, arquivos_csv):
+    # Recombina na ordem da lista de arquivos (a mesma do processamento completo);
+    # arquivos do manifesto que saíram da lista vêm por último, na ordem em que foram registrados.
+    posicao = {arquivo: i for i, arquivo in enumerate(arquivos_csv)}
+    return sorted(manifesto['arquivos'], key=lambda a: posicao.get(a, len(posicao)))
+
+
+def preparar_atualizacao_incremental(arquivos_csv, tamanho_bloco=TAMANHO_BLOCO_PADRAO, reprocessar_tudo=False):
+    """
+    Lê apenas os arquivos novos ou alterados e recalcula somente os grupos (estação, hora) afetados,
+    incluindo horas que também têm leituras em outros arquivos (recombinadas a partir dos parciais
+    salvos). Retorna (df_afetado, chaves_removidas, manifesto_novo, parciais_obsoletos) ou None se
+    não houver nada a fazer. O manifesto novo deve ser salvo (salvar_manifesto) e os parciais
+    obsoletos apagados (descartar_parciais) somente depois que o armazenamento horário for atualizado.
+    """
+    manifesto = carregar_manifesto()
+    if reprocessar_tudo:
+        manifesto = {'arquivos': {}}
+    alterados = identificar_arquivos_alterados(arquivos_csv, manifesto)
+    if not alterados:
+        return None
+
+    os.makedirs(DIRETORIO_PARCIAIS, exist_ok=True)
+    parciais_novos = {}
+    parciais_obsoletos = []
+    chaves_afetadas = None
+
+    for arquivo_csv, tamanho, mtime, sha256 in alterados:
+        print(f"Arquivo novo ou alterado: {arquivo_csv}")
+        estado = agregar_arquivo_em_streaming(arquivo_csv, tamanho_bloco)
+        if estado is None:
+            estado = pd.DataFrame(columns=['acumulado_chuva_1_h_mm', 'leituras'],
+                                  index=pd.MultiIndex.from_arrays([[], []], names=CHAVES_HORARIAS))
+        chaves = estado.index
+
+        entrada_antiga = manifesto['arquivos'].get(arquivo_csv)
+        if entrada_antiga and os.path.exists(entrada_antiga['parcial']):
+            # Grupos que só existiam na versão antiga do arquivo também precisam ser recalculados
+            chaves = chaves.append(pd.read_pickle(entrada_antiga['parcial']).index)
+            parciais_obsoletos.append(entrada_antiga['parcial'])
+        chaves_afetadas = chaves if chaves_afetadas is None else chaves_afetadas.append(chaves)
+
+        caminho_parcial = _caminho_parcial(arquivo_csv, sha256)
+        estado.to_pickle(caminho_parcial)
+        parciais_novos[arquivo_csv] = estado
+        horas = estado.index.get_level_values(1)
+        manifesto['arquivos'][arquivo_csv] = {
+            'tamanho': tamanho, 'mtime': mtime, 'sha256': sha256, 'parcial': caminho_parcial,
+            'hora_min': str(horas.min()) if len(horas) else None,
+            'hora_max': str(horas.max()) if len(horas) else None,
+        }
+
+    chaves_afetadas = chaves_afetadas.unique()
+    horas_afetadas = chaves_afetadas.get_level_values(1)
+    hora_min, hora_max = horas_afetadas.min(), horas_afetadas.max()
+
+    # Só os parciais cujo intervalo de horas cruza as horas afetadas precisam ser consultados
+    selecionados = []
+    for arquivo_csv in _ordem_arquivos(manifesto, arquivos_csv):
+        entrada = manifesto['arquivos'][arquivo_csv]
+        if arquivo_csv in parciais_novos:
+            parcial = parciais_novos[arquivo_csv]
+        elif (entrada['hora_min'] is None or pd.Timestamp(entrada['hora_max']) < hora_min
+              or pd.Timestamp(entrada['hora_min']) > hora_max):
+            continue
+        else:
+            parcial = pd.read_pickle(entrada['parcial'])
+        parcial = parcial[parcial.index.isin(chaves_afetadas)]
+        if len(parcial):
+            selecionados.append(parcial)
+
+    if selecionados:
+        df_afetado = finalizar_estado_horario(combinar_parciais_horarias(selecionados))
+        chaves_presentes = pd.MultiIndex.from_frame(df_afetado[CHAVES_HORARIAS])
+    else:
+        df_afetado = None
+        chaves_presentes = chaves_afetadas[:0]
+    chaves_removidas = chaves_afetadas[~chaves_afetadas.isin(chaves_presentes)]
+
+    print(f"{len(alterados)} arquivo(s) novo(s) ou alterado(s); {len(chaves_afetadas)} grupos (estação, hora) recalculados.")
+    return df_afetado, chaves_removidas, manifesto, parciais_obsoletos
+
+
+def descartar_parciais(caminhos):
+    for caminho in caminhos:
+        if os.path.exists(caminho):
+            os.remove(caminho)
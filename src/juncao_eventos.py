@@ -0,0 +1,229 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+from armazenamento_horario import carregar_dados_horarios
+
+CAMINHO_EVENTOS = "data/eventos_enchentes_sp_2025.csv"
+CAMINHO_SAIDA_PADRAO = "data/eventos_estacoes_chuva.csv"
+RAIO_TERRA_KM = 6371.0088
+RAIO_PADRAO_KM = 10.0
+HORAS_ANTES_PADRAO = 24
+HORAS_DEPOIS_PADRAO = 6
+# "Madrugada" no catálogo de eventos é representada como 2h, como na análise exploratória
+HORA_MADRUGADA = 2
+COLUNAS_CHUVA = ['cod_estacao', 'datahora_utc_hora', 'latitude', 'longitude', 'acumulado_chuva_1_h_mm', 'nivel_risco']
+
+
+def carregar_eventos(caminho=CAMINHO_EVENTOS):
+    """
+    Lê o catálogo de eventos (Data dd/mm/aaaa, Horario livre em horário de Brasília, Latitude/Longitude)
+    e acrescenta 'datahora_evento_utc'. Horários como '~20h34' ou '15h27-17h35' usam a primeira hora;
+    sem horário reconhecível, o evento fica no início do dia e 'horario_conhecido' é False.
+    """
+    eventos = pd.read_csv(caminho, skipinitialspace=True)
+    eventos.columns = eventos.columns.str.strip()
+    eventos['Latitude'] = pd.to_numeric(eventos['Latitude'], errors='coerce')
+    eventos['Longitude'] = pd.to_numeric(eventos['Longitude'], errors='coerce')
+    data = pd.to_datetime(eventos['Data'].astype(str).str.strip(), format='%d/%m/%Y', errors='coerce')
+
+    horario = eventos['Horario'].astype(str).str.lower()
+    partes = horario.str.extract(r'(\d{1,2})\s*[h:]\s*(\d{2})?')
+    hora = pd.to_numeric(partes[0], errors='coerce')
+    minuto = pd.to_numeric(partes[1], errors='coerce').fillna(0)
+    hora = hora.where(hora.notna() | ~horario.str.contains('madrugada'), HORA_MADRUGADA)
+
+    eventos['horario_conhecido'] = hora.notna()
+    local = data + pd.to_timedelta(hora.fillna(0), unit='h') + pd.to_timedelta(minuto.where(hora.notna(), 0), unit='m')
+    # Brasília é UTC-3 o ano inteiro desde 2019
+    eventos['datahora_evento_utc'] = local + pd.Timedelta(hours=3)
+    invalidos = eventos['datahora_evento_utc'].isna() | eventos['Latitude'].isna() | eventos['Longitude'].isna()
+    if invalidos.any():
+        print(f"Aviso: {int(invalidos.sum())} evento(s) sem data ou coordenadas válidas foram ignorados.")
+    return eventos[~invalidos].reset_index(drop=True)
+
+
+class IndiceEstacoes:
+    """
+    BallTree com distância haversine sobre as coordenadas das estações, mais a série horária de
+    chuva ordenada por (estação, hora) com chaves inteiras, para buscar janelas por busca binária.
+    """
+
+    def __init__(self, df_horario):
+        # factorize usa hash (np.unique ordenaria milhões de strings); sort=True mantém os códigos em ordem
+        codigos, estacoes = pd.factorize(df_horario['cod_estacao'].astype(str), sort=True)
+        self.estacoes = np.asarray(estacoes, dtype=str)
+        # Primeira ocorrência de cada estação: atribuição invertida deixa o menor índice
+        primeira = np.empty(len(self.estacoes), dtype='int64')
+        primeira[codigos[::-1]] = np.arange(len(codigos) - 1, -1, -1)
+        self.coordenadas = df_horario[['latitude', 'longitude']].to_numpy(dtype='float64')[primeira]
+        validas = ~np.isnan(self.coordenadas).any(axis=1)
+        if not validas.all():
+            print(f"Aviso: {int((~validas).sum())} estação(ões) sem coordenadas ficam fora do índice espacial.")
+        self._indices_validos = np.flatnonzero(validas)
+        self.arvore = BallTree(np.radians(self.coordenadas[validas]), metric='haversine')
+
+        # Chave = estação * n_horas + hora relativa ao início: uma busca binária delimita qualquer janela
+        horas = pd.to_datetime(df_horario['datahora_utc_hora']).to_numpy().astype('datetime64[h]').astype('int64')
+        self.hora_inicial = horas.min()
+        self.n_horas = int(horas.max() - self.hora_inicial) + 1
+        chaves = codigos.astype('int64') * self.n_horas + (horas - self.hora_inicial)
+        ordem = np.argsort(chaves, kind='stable')
+        self.chaves = chaves[ordem]
+        self.chuva = df_horario['acumulado_chuva_1_h_mm'].to_numpy()[ordem]
+        self.nivel_risco = (df_horario['nivel_risco'].to_numpy()[ordem] if 'nivel_risco' in df_horario.columns
+                            else np.full(len(ordem), -1))
+
+    def estacoes_no_raio(self, latitudes, longitudes, raio_km=RAIO_PADRAO_KM):
+        """
+        Pares (índice do ponto, índice da estação, distância em km) de todas as estações a até
+        raio_km de cada ponto, em uma única consulta à árvore; dentro de cada ponto, da mais próxima à mais distante.
+        """
+        pontos = np.radians(np.column_stack([latitudes, longitudes]).astype('float64'))
+        vizinhos, distancias = self.arvore.query_radius(pontos, r=raio_km / RAIO_TERRA_KM,
+                                                        return_distance=True, sort_results=True)
+        contagens = np.fromiter((len(v) for v in vizinhos), dtype='int64', count=len(vizinhos))
+        if contagens.sum() == 0:
+            return np.array([], dtype='int64'), np.array([], dtype='int64'), np.array([], dtype='float64')
+        return (np.repeat(np.arange(len(pontos)), contagens),
+                self._indices_validos[np.concatenate(vizinhos)],
+                np.concatenate(distancias) * RAIO_TERRA_KM)
+
+    def janelas(self, indices_estacao, horas_inicio, horas_fim):
+        """
+        Para cada par (estação, [hora_inicio, hora_fim]) devolve (par, posição na série ordenada)
+        de todas as horas existentes na janela, sem laço por par.
+        """
+        inicio = np.asarray(horas_inicio, dtype='datetime64[h]').astype('int64') - self.hora_inicial
+        fim = np.asarray(horas_fim, dtype='datetime64[h]').astype('int64') - self.hora_inicial
+        inicio = np.clip(inicio, 0, self.n_horas)
+        fim = np.clip(fim, -1, self.n_horas - 1)
+        base = np.asarray(indices_estacao, dtype='int64') * self.n_horas
+        primeiro = np.searchsorted(self.chaves, base + inicio, side='left')
+        ultimo = np.searchsorted(self.chaves, base + fim, side='right')
+        tamanhos = np.maximum(ultimo - primeiro, 0)
+        par = np.repeat(np.arange(len(tamanhos)), tamanhos)
+        deslocamento = np.arange(tamanhos.sum()) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+        return par, np.repeat(primeiro, tamanhos) + deslocamento
+
+    def hora_da_posicao(self, posicoes):
+        return ((self.chaves[posicoes] % self.n_horas) + self.hora_inicial).astype('datetime64[h]')
+
+
+def juntar_eventos_estacoes(eventos, indice, raio_km=RAIO_PADRAO_KM, horas_antes=HORAS_ANTES_PADRAO,
+                            horas_depois=HORAS_DEPOIS_PADRAO):
+    """
+    Junção espaço-temporal: uma linha por (evento, estação a até raio_km, hora da janela
+    [evento - horas_antes, evento + horas_depois]) com a chuva da estação naquela hora.
+    Eventos sem horário conhecido usam o dia inteiro (00h a 23h de Brasília) como centro da janela.
+    """
+    i_evento, i_estacao, distancia = indice.estacoes_no_raio(eventos['Latitude'], eventos['Longitude'], raio_km)
+    momento = eventos['datahora_evento_utc'].to_numpy().astype('datetime64[h]')
+    conhecido = eventos['horario_conhecido'].to_numpy()
+    inicio = momento - np.timedelta64(horas_antes, 'h')
+    fim = momento + np.where(conhecido, horas_depois, horas_depois + 23).astype('timedelta64[h]')
+
+    par, posicao = indice.janelas(i_estacao, inicio[i_evento], fim[i_evento])
+    hora = indice.hora_da_posicao(posicao)
+    # Categóricas: milhões de linhas repetem poucos eventos e estações
+    codigos_local, locais = pd.factorize(eventos.get('Bairro_Localizacao', pd.Series('', index=eventos.index)).astype(str))
+    return pd.DataFrame({
+        'evento': i_evento[par],
+        'Bairro_Localizacao': pd.Categorical.from_codes(codigos_local[i_evento[par]], categories=locais),
+        'cod_estacao': pd.Categorical.from_codes(i_estacao[par], categories=indice.estacoes),
+        'distancia_km': distancia[par].round(3),
+        'datahora_utc_hora': hora.astype('datetime64[ns]'),
+        'horas_desde_evento': (hora - momento[i_evento[par]]).astype('int64'),
+        'acumulado_chuva_1_h_mm': indice.chuva[posicao],
+        'nivel_risco': indice.nivel_risco[posicao],
+    })
+
+
+def resumir_juncao(juncao):
+    """Uma linha por (evento, estação): chuva total e máxima na janela, horas com dado e nível de risco máximo."""
+    return (juncao.groupby(['evento', 'cod_estacao'], sort=True)
+            .agg(distancia_km=('distancia_km', 'first'), horas_com_dado=('acumulado_chuva_1_h_mm', 'size'),
+                 chuva_total_mm=('acumulado_chuva_1_h_mm', 'sum'), chuva_max_1h_mm=('acumulado_chuva_1_h_mm', 'max'),
+                 nivel_risco_max=('nivel_risco', 'max'))
+            .reset_index()
+            .sort_values(['evento', 'distancia_km'], kind='stable', ignore_index=True))
+
+
+def resumir_eventos(resumo, eventos):
+    """Uma linha por evento: estações no raio, distância da mais próxima e pior chuva/nível entre elas."""
+    por_evento = resumo.groupby('evento').agg(
+        estacoes=('cod_estacao', 'size'), estacao_mais_proxima_km=('distancia_km', 'min'),
+        chuva_max_1h_mm=('chuva_max_1h_mm', 'max'), chuva_total_max_mm=('chuva_total_mm', 'max'),
+        nivel_risco_max=('nivel_risco_max', 'max'))
+    colunas = [c for c in ['Data', 'Horario', 'Bairro_Localizacao'] if c in eventos.columns]
+    return eventos[colunas].join(por_evento).fillna({'estacoes': 0}).astype({'estacoes': 'int64'})
+
+
+def marcar_horas_com_evento(df_horario, juncao):
+    """
+    Rótulo de verdade de campo: coluna booleana 'evento_proximo', verdadeira nas linhas
+    (estação, hora) que caem na janela de algum evento dentro do raio.
+    """
+    codigos_eventos, estacoes = _fatorar(juncao['cod_estacao'])
+    codigos = _fatorar(df_horario['cod_estacao'], estacoes)[0]
+
+    def _chaves(codigos_estacao, datahoras):
+        # Chave inteira (estação, hora): cabe em int64 com folga para séculos de horas
+        horas = pd.to_datetime(datahoras).to_numpy().astype('datetime64[h]').astype('int64')
+        return codigos_estacao.astype('int64') << 32 | (horas - np.iinfo('int32').min)
+
+    chaves_eventos = _chaves(codigos_eventos, juncao['datahora_utc_hora'])
+    # isin do pandas usa tabela hash, sem ordenar as chaves
+    pertence = pd.Series(_chaves(codigos, df_horario['datahora_utc_hora'])).isin(chaves_eventos).to_numpy()
+    df_horario['evento_proximo'] = (codigos >= 0) & pertence
+    return df_horario
+
+
+def _fatorar(cod_estacao, estacoes=None):
+    # Códigos inteiros de cod_estacao (em estacoes, se informado; -1 quando ausente), usando os
+    # códigos da coluna categórica quando houver em vez de comparar milhões de strings
+    if isinstance(cod_estacao.dtype, pd.CategoricalDtype):
+        codigos, categorias = cod_estacao.cat.codes.to_numpy(), cod_estacao.cat.categories.astype(str)
+    else:
+        codigos, categorias = pd.factorize(cod_estacao.astype(str))
+        categorias = pd.Index(categorias)
+    if estacoes is None:
+        return codigos, categorias
+    mapa = estacoes.get_indexer(categorias)
+    return np.where(codigos >= 0, mapa[codigos], -1), estacoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Liga os eventos de enchente às estações próximas e à chuva horária em torno de cada evento.")
+    parser.add_argument('--eventos', default=CAMINHO_EVENTOS)
+    parser.add_argument('--raio-km', type=float, default=RAIO_PADRAO_KM)
+    parser.add_argument('--horas-antes', type=int, default=HORAS_ANTES_PADRAO)
+    parser.add_argument('--horas-depois', type=int, default=HORAS_DEPOIS_PADRAO)
+    parser.add_argument('--saida', default=CAMINHO_SAIDA_PADRAO, help="CSV com uma linha por evento, estação e hora.")
+    args = parser.parse_args()
+
+    try:
+        eventos = carregar_eventos(args.eventos)
+        df_horario = carregar_dados_horarios(COLUNAS_CHUVA)
+    except FileNotFoundError as e:
+        print(f"Erro: arquivo não encontrado: {e}")
+        exit()
+
+    inicio = time.perf_counter()
+    indice = IndiceEstacoes(df_horario)
+    tempo_indice = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    juncao = juntar_eventos_estacoes(eventos, indice, args.raio_km, args.horas_antes, args.horas_depois)
+    tempo_juncao = time.perf_counter() - inicio
+    print(f"Índice de {len(indice.estacoes)} estações e {len(indice.chaves):,} horas montado em {tempo_indice:.2f} s; "
+          f"junção de {len(eventos)} eventos em {tempo_juncao * 1000:.1f} ms ({len(juncao):,} linhas).")
+
+    print(f"\nEstações a até {args.raio_km} km e chuva de {args.horas_antes} h antes a {args.horas_depois} h depois de cada evento:")
+    print(resumir_eventos(resumir_juncao(juncao), eventos).to_string())
+    os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+    juncao.to_csv(args.saida, index=False)
+    print(f"Junção salva em {args.saida}")
@@ -0,0 +1,170 @@
+import numpy as np
+
+# Mesma regra de determinar_risco_final do simulador: chuva local Forte +1, Extrema +2 (máximo 2)
+INTENSIDADES = ("Leve", "Moderada", "Forte", "Extrema")
+AJUSTE_INTENSIDADE = {"Forte": 1, "Extrema": 2}
+NIVEL_MAXIMO = 2
+NIVEIS_ALERTA = ("Verde", "Amarelo", "Vermelho")
+# Limites (mm/h) entre as intensidades, os mesmos de INTENSIDADE_MM_H no simulador
+LIMITES_INTENSIDADE_MM_H = (5.0, 18.0, 40.0)
+
+# Histerese: um nível sobe na hora, mas só desce depois de CICLOS_RESFRIAMENTO_PADRAO ciclos
+# seguidos abaixo dele e de PERMANENCIA_MINIMA_PADRAO ciclos desde a última escalada
+CICLOS_RESFRIAMENTO_PADRAO = 3
+PERMANENCIA_MINIMA_PADRAO = 6
+
+_CODIGO_INTENSIDADE = {nome: codigo for codigo, nome in enumerate(INTENSIDADES)}
+_AJUSTE_POR_CODIGO = np.array([AJUSTE_INTENSIDADE.get(nome, 0) for nome in INTENSIDADES], dtype=np.int8)
+
+
+def codificar_intensidades(intensidades):
+    """
+    Código (posição em INTENSIDADES) de cada intensidade; nomes desconhecidos viram 'Leve'.
+    Códigos inteiros fora de range(len(INTENSIDADES)) levantam ValueError.
+    """
+    intensidades = np.asarray(intensidades)
+    if intensidades.dtype.kind in 'iu':
+        invalidos = (intensidades < 0) | (intensidades >= len(INTENSIDADES))
+        if invalidos.any():
+            raise ValueError(f"Código de intensidade inválido: {intensidades[invalidos].ravel()[:5].tolist()} "
+                             f"(esperado de 0 a {len(INTENSIDADES) - 1}).")
+        return intensidades
+    return np.fromiter((_CODIGO_INTENSIDADE.get(nome, 0) for nome in intensidades.tolist()),
+                       dtype=np.int8, count=len(intensidades))
+
+
+def intensidades_por_chuva(chuva_mm_h):
+    """Código da intensidade correspondente à chuva de cada leitura (para séries históricas, sem intensidade informada)."""
+    return np.searchsorted(LIMITES_INTENSIDADE_MM_H, np.asarray(chuva_mm_h), side='right').astype(np.int8)
+
+
+def determinar_risco_final_lote(risco_ml, intensidades):
+    """
+    Versão vetorizada de determinar_risco_final. intensidades pode trazer os nomes ou, mais rápido
+    para muitas estações, os códigos de codificar_intensidades.
+    """
+    ajuste = _AJUSTE_POR_CODIGO[codificar_intensidades(intensidades)]
+    return np.minimum(np.asarray(risco_ml, dtype=np.int8) + ajuste, NIVEL_MAXIMO).astype(np.int8)
+
+
+class Transicoes:
+    """Mudanças de nível de alerta em um ciclo: índice da estação, nível anterior e nível novo."""
+
+    def __init__(self, estacoes, nivel_anterior, nivel_novo):
+        self.estacoes = estacoes
+        self.nivel_anterior = nivel_anterior
+        self.nivel_novo = nivel_novo
+
+    def __len__(self):
+        return len(self.estacoes)
+
+    @property
+    def escaladas(self):
+        return self.nivel_novo > self.nivel_anterior
+
+
+class MotorAlertas:
+    """
+    Motor de alertas de uma região inteira. Recebe, a cada ciclo, arrays com o risco do modelo e
+    a intensidade local de todas as estações, aplica a regra do risco final de forma vetorizada e
+    mantém o estado de cada estação em arrays NumPy compactos:
+      nivel                   nível de alerta em vigor (0 Verde, 1 Amarelo, 2 Vermelho)
+      ciclos_desde_escalada   ciclos desde a última subida de nível
+      ciclos_abaixo           ciclos seguidos com risco abaixo do nível em vigor (resfriamento)
+    O nível sobe assim que o risco do ciclo passa dele e só desce (direto para o risco do ciclo)
+    após ciclos_resfriamento ciclos seguidos abaixo e permanencia_minima ciclos desde a escalada,
+    de modo que uma estação oscilando em torno de um limiar não alerta a cada ciclo. Só as
+    transições são devolvidas.
+    """
+
+    def __init__(self, cod_estacoes, municipios=None, ciclos_resfriamento=CICLOS_RESFRIAMENTO_PADRAO,
+                 permanencia_minima=PERMANENCIA_MINIMA_PADRAO):
+        self.cod_estacoes = np.asarray(cod_estacoes).astype(str)
+        n = len(self.cod_estacoes)
+        self.ciclos_resfriamento = ciclos_resfriamento
+        self.permanencia_minima = permanencia_minima
+        self.nivel = np.zeros(n, dtype=np.int8)
+        # Começa "desde sempre" para que o estado inicial (Verde) não seja retido pela permanência mínima
+        self.ciclos_desde_escalada = np.full(n, np.iinfo(np.int32).max // 2, dtype=np.int32)
+        self.ciclos_abaixo = np.zeros(n, dtype=np.int32)
+        self.ciclos = 0
+
+        # Busca binária dos códigos das estações, como na floresta compacta
+        self._ordem = np.argsort(self.cod_estacoes, kind='stable')
+        self._ordenadas = self.cod_estacoes[self._ordem]
+
+        # Município de cada estação como código inteiro, para as agregações com bincount
+        self.municipio = self.nomes_municipios = None
+        if municipios is not None:
+            codigos = {}
+            self.municipio = np.fromiter((codigos.setdefault(nome, len(codigos)) for nome in municipios),
+                                         dtype=np.int32, count=n)
+            self.nomes_municipios = np.array(list(codigos), dtype=object)
+
+    def indices_estacoes(self, cod_estacoes):
+        """Índice de cada estação no estado do motor (-1 para estações não cadastradas)."""
+        cod_estacoes = np.asarray(cod_estacoes).astype(str, copy=False)
+        if len(self._ordenadas) == 0:
+            return np.full(len(cod_estacoes), -1, dtype=np.int64)
+        posicao = np.minimum(np.searchsorted(self._ordenadas, cod_estacoes), len(self._ordenadas) - 1)
+        return np.where(self._ordenadas[posicao] == cod_estacoes, self._ordem[posicao], -1)
+
+    def processar_ciclo(self, risco_ml, intensidades, estacoes=None):
+        """
+        Avança um ciclo e devolve as Transicoes. Sem estacoes, risco_ml e intensidades trazem
+        todas as estações na ordem de cadastro; com estacoes (índices de indices_estacoes, no
+        máximo uma leitura por estação), só essas são avaliadas, e as demais mantêm o nível.
+        """
+        alvo = determinar_risco_final_lote(risco_ml, intensidades)
+        if estacoes is None:
+            if len(alvo) != len(self.nivel):
+                raise ValueError(f"Esperadas {len(self.nivel)} leituras (uma por estação); recebidas {len(alvo)}.")
+            estacoes = slice(None)
+        else:
+            estacoes = np.asarray(estacoes, dtype=np.int64)
+            if len(estacoes) != len(alvo):
+                raise ValueError("estacoes e risco_ml devem ter o mesmo tamanho.")
+            if len(estacoes) and estacoes.min() < 0:
+                raise ValueError("Leituras de estações não cadastradas no motor de alertas (índice -1).")
+        self.ciclos += 1
+        np.add(self.ciclos_desde_escalada, 1, out=self.ciclos_desde_escalada)
+
+        # Cópia: com todas as estações (slice) a indexação devolveria uma visão, sobrescrita logo abaixo
+        atual = self.nivel[estacoes].copy()
+        sobe = alvo > atual
+        abaixo = np.where(alvo < atual, self.ciclos_abaixo[estacoes] + 1, 0)
+        desce = ((abaixo >= self.ciclos_resfriamento)
+                 & (self.ciclos_desde_escalada[estacoes] >= self.permanencia_minima))
+        muda = sobe | desce
+
+        self.nivel[estacoes] = np.where(muda, alvo, atual)
+        self.ciclos_abaixo[estacoes] = np.where(desce, 0, abaixo)
+        mudaram = np.flatnonzero(muda)
+        if isinstance(estacoes, slice):
+            subiram, indices = np.flatnonzero(sobe), mudaram
+        else:
+            subiram, indices = estacoes[sobe], estacoes[mudaram]
+        self.ciclos_desde_escalada[subiram] = 0
+        return Transicoes(indices, atual[mudaram], alvo[mudaram])
+
+    def resumir_por_municipio(self, transicoes):
+        """
+        Agrega as transições do ciclo por município (só os municípios com alguma transição):
+        escaladas, reduções, estações em alerta (nível > 0) e o maior nível em vigor no município.
+        """
+        if self.municipio is None:
+            raise ValueError("O motor de alertas foi criado sem municípios.")
+        n_municipios = len(self.nomes_municipios)
+        municipio = self.municipio[transicoes.estacoes]
+        escaladas = np.bincount(municipio, weights=transicoes.escaladas, minlength=n_municipios).astype(np.int64)
+        reducoes = np.bincount(municipio, minlength=n_municipios) - escaladas
+        afetados = np.flatnonzero(escaladas + reducoes)
+
+        # Com poucos níveis, o máximo por município sai de um bincount por nível (sem ufunc.at)
+        nivel_maximo = np.zeros(len(afetados), dtype=np.int8)
+        for nivel in range(1, NIVEL_MAXIMO + 1):
+            presentes = np.bincount(self.municipio[self.nivel == nivel], minlength=n_municipios)[afetados] > 0
+            nivel_maximo[presentes] = nivel
+        em_alerta = np.bincount(self.municipio[self.nivel > 0], minlength=n_municipios)[afetados]
+        return {'municipio': self.nomes_municipios[afetados], 'escaladas': escaladas[afetados],
+                'reducoes': reducoes[afetados], 'estacoes_em_alerta': em_alerta, 'nivel_maximo': nivel_maximo}
@@ -0,0 +1,364 @@
+import atexit
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage, o pico de RSS fica indisponível
+    resource = None
+
+# Só a biblioteca padrão é importada aqui (cProfile, pstats e tracemalloc apenas quando pedidos),
+# para não pesar na partida do simulador, que importa este módulo mesmo com as métricas desligadas
+DIRETORIO_METRICAS_PADRAO = 'metricas'
+PREFIXO_PROMETHEUS = 'floodguard'
+QUANTIS_DURACAO = (0.5, 0.95, 0.99)
+TOP_PONTOS_QUENTES = 25
+
+
+def _ler_pico_rss():
+    # Pico de memória residente do processo, em bytes (no Linux, o VmHWM, que _zerar_pico_rss reinicia)
+    if resource is None:
+        return 0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def _zerar_pico_rss():
+    # Reinicia o VmHWM (Linux); sem isso o pico de cada etapa é o pico do processo até o fim dela
+    try:
+        with open('/proc/self/clear_refs', 'w') as arquivo:
+            arquivo.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _tempo_cpu():
+    # CPU do processo (alta resolução) mais a dos filhos já encerrados (ex.: pool de processos fechado
+    # dentro da etapa), que os.times só dá em tiques do relógio
+    tempos = os.times()
+    return time.process_time() + tempos.children_user + tempos.children_system
+
+
+def _quantil(valores_ordenados, q):
+    # Posto mais próximo: o menor valor com pelo menos q das amostras abaixo ou iguais a ele
+    return valores_ordenados[max(0, math.ceil(q * len(valores_ordenados)) - 1)]
+
+
+class _EtapaNula:
+    """Devolvida por etapa() com a instrumentação desligada: nenhum relógio é lido."""
+    linhas = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        return False
+
+
+_ETAPA_NULA = _EtapaNula()
+
+
+class _Etapa:
+    __slots__ = ('perfilador', 'nome', 'linhas', 'inicio', 'inicio_cpu', 'pico_rss', 'pico_python')
+
+    def __init__(self, perfilador, nome, linhas):
+        self.perfilador = perfilador
+        self.nome = nome
+        self.linhas = linhas
+
+    def __enter__(self):
+        self.perfilador._abrir(self)
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        self.perfilador._fechar(self, falhou=tipo is not None)
+        return False
+
+
+class PerfiladorEtapas:
+    """
+    Mede as etapas de uma execução (tempo de parede, tempo de CPU, pico de RSS e linhas/s) com
+    `with perfilador.etapa('nome', linhas=n):`. Etapas com o mesmo nome (ex.: uma predição por
+    ciclo) são acumuladas, com quantis da duração de cada chamada. Etapas podem ser aninhadas:
+    o pico de cada uma inclui o das etapas internas. Opcionalmente roda cProfile (perfilar_cpu)
+    e tracemalloc (perfilar_memoria) na execução inteira e inclui os pontos quentes no relatório.
+    Desligado (ativo=False), etapa() devolve um contexto vazio compartilhado.
+    """
+
+    def __init__(self, execucao, ativo=True, perfilar_cpu=False, perfilar_memoria=False,
+                 diretorio=DIRETORIO_METRICAS_PADRAO, top=TOP_PONTOS_QUENTES):
+        self.execucao = execucao
+        self.ativo = ativo
+        self.perfilar_cpu = perfilar_cpu
+        self.perfilar_memoria = perfilar_memoria
+        self.diretorio = diretorio
+        self.top = top
+        self.estatisticas = {}
+        self._abertas = []
+        self._pico_por_etapa = False
+        self._pico_processo = 0
+        self._perfil_cpu = None
+        self._inicio = None
+        self._finalizado = False
+
+    def iniciar(self):
+        if not self.ativo:
+            return self
+        self._pico_por_etapa = _zerar_pico_rss()
+        if self.perfilar_memoria:
+            import tracemalloc
+            tracemalloc.start()
+        if self.perfilar_cpu:
+            import cProfile
+            self._perfil_cpu = cProfile.Profile()
+            self._perfil_cpu.enable()
+        self._inicio = (time.time(), time.perf_counter(), _tempo_cpu())
+        return self
+
+    def etapa(self, nome, linhas=None):
+        """Contexto que mede a etapa; linhas (ou etapa.linhas, definido dentro do bloco) dá as linhas/s."""
+        if not self.ativo:
+            return _ETAPA_NULA
+        return _Etapa(self, nome, linhas)
+
+    def _picos_atuais(self):
+        pico_python = None
+        if self.perfilar_memoria:
+            import tracemalloc
+            pico_python = tracemalloc.get_traced_memory()[1]
+        return _ler_pico_rss(), pico_python
+
+    def _propagar_picos(self, pico_rss, pico_python):
+        for aberta in self._abertas:
+            aberta.pico_rss = max(aberta.pico_rss, pico_rss)
+            if pico_python is not None:
+                aberta.pico_python = max(aberta.pico_python, pico_python)
+
+    def _abrir(self, etapa):
+        # Antes de zerar os picos para a etapa nova, as etapas externas (e o processo) guardam o que já viram
+        pico_rss, pico_python = self._picos_atuais()
+        self._pico_processo = max(self._pico_processo, pico_rss)
+        self._propagar_picos(pico_rss, pico_python)
+        if self.perfilar_memoria:
+            import tracemalloc
+            tracemalloc.reset_peak()
+        if self._pico_por_etapa:
+            _zerar_pico_rss()
+        etapa.pico_rss, etapa.pico_python = 0, 0
+        self._abertas.append(etapa)
+        etapa.inicio_cpu = _tempo_cpu()
+        etapa.inicio = time.perf_counter()
+
+    def _fechar(self, etapa, falhou):
+        duracao = time.perf_counter() - etapa.inicio
+        tempo_cpu = _tempo_cpu() - etapa.inicio_cpu
+        pico_rss, pico_python = self._picos_atuais()
+        etapa.pico_rss = max(etapa.pico_rss, pico_rss)
+        if pico_python is not None:
+            etapa.pico_python = max(etapa.pico_python, pico_python)
+        self._abertas.remove(etapa)
+        self._propagar_picos(etapa.pico_rss, etapa.pico_python if pico_python is not None else None)
+
+        estatistica = self.estatisticas.setdefault(etapa.nome, {
+            'chamadas': 0, 'falhas': 0, 'tempo_parede_s': 0.0, 'tempo_cpu_s': 0.0,
+            'pico_rss_bytes': 0, 'pico_python_bytes': None, 'linhas': None, 'duracoes': []})
+        estatistica['chamadas'] += 1
+        estatistica['falhas'] += int(falhou)
+        estatistica['tempo_parede_s'] += duracao
+        estatistica['tempo_cpu_s'] += tempo_cpu
+        estatistica['pico_rss_bytes'] = max(estatistica['pico_rss_bytes'], etapa.pico_rss)
+        if pico_python is not None:
+            estatistica['pico_python_bytes'] = max(estatistica['pico_python_bytes'] or 0, etapa.pico_python)
+        if etapa.linhas is not None:
+            estatistica['linhas'] = (estatistica['linhas'] or 0) + int(etapa.linhas)
+        estatistica['duracoes'].append(duracao)
+
+    def _pontos_quentes_cpu(self):
+        import pstats
+        estatisticas = pstats.Stats(self._perfil_cpu).stats
+        # Ordenados pelo tempo próprio (sem as funções chamadas), que aponta onde o tempo é gasto
+        funcoes = sorted(estatisticas.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        return [{'funcao': f"{arquivo}:{linha}({nome})", 'chamadas': chamadas, 'tempo_proprio_s': round(proprio, 6),
+                 'tempo_acumulado_s': round(acumulado, 6)}
+                for (arquivo, linha, nome), (_, chamadas, proprio, acumulado, _) in funcoes]
+
+    def _pontos_quentes_memoria(self):
+        import tracemalloc
+        instantaneo = tracemalloc.take_snapshot()
+        return [{'local': f"{estatistica.traceback[0].filename}:{estatistica.traceback[0].lineno}",
+                 'tamanho_mb': round(estatistica.size / 2 ** 20, 3), 'blocos': estatistica.count}
+                for estatistica in instantaneo.statistics('lineno')[:self.top]]
+
+    def relatorio(self):
+        """Relatório da execução como dicionário serializável em JSON."""
+        inicio_epoca, inicio_parede, inicio_cpu = self._inicio
+        etapas = []
+        for nome, estatistica in self.estatisticas.items():
+            etapa = {'nome': nome, 'chamadas': estatistica['chamadas'], 'falhas': estatistica['falhas'],
+                     'tempo_parede_s': round(estatistica['tempo_parede_s'], 6),
+                     'tempo_cpu_s': round(estatistica['tempo_cpu_s'], 6),
+                     'pico_rss_mb': round(estatistica['pico_rss_bytes'] / 2 ** 20, 1),
+                     'linhas': estatistica['linhas'],
+                     'linhas_por_s': (round(estatistica['linhas'] / estatistica['tempo_parede_s'], 1)
+                                      if estatistica['linhas'] and estatistica['tempo_parede_s'] > 0 else None)}
+            if estatistica['pico_python_bytes'] is not None:
+                etapa['pico_python_mb'] = round(estatistica['pico_python_bytes'] / 2 ** 20, 1)
+            if estatistica['chamadas'] > 1:
+                duracoes = sorted(estatistica['duracoes'])
+                etapa['duracao_s'] = {'min': duracoes[0], 'max': duracoes[-1],
+                                      **{f"p{int(q * 100)}": _quantil(duracoes, q) for q in QUANTIS_DURACAO}}
+            etapas.append(etapa)
+
+        relatorio = {
+            'execucao': self.execucao,
+            'inicio_utc': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(inicio_epoca)),
+            'duracao_s': round(time.perf_counter() - inicio_parede, 6),
+            'tempo_cpu_s': round(_tempo_cpu() - inicio_cpu, 6),
+            'pico_rss_processo_mb': round(max(self._pico_processo, _ler_pico_rss()) / 2 ** 20, 1),
+            'pico_rss_por_etapa': self._pico_por_etapa,
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'argumentos': sys.argv[1:],
+            'etapas': etapas,
+        }
+        if self._perfil_cpu is not None:
+            relatorio['pontos_quentes_cpu'] = self._pontos_quentes_cpu()
+        if self.perfilar_memoria:
+            relatorio['pontos_quentes_memoria'] = self._pontos_quentes_memoria()
+        return relatorio
+
+    def texto_prometheus(self, relatorio=None):
+        """Métricas no formato texto do Prometheus (ex.: para o textfile collector do node_exporter)."""
+        relatorio = relatorio or self.relatorio()
+        execucao = _rotulo(relatorio['execucao'])
+        metricas = [
+            ('execucao_duracao_segundos', 'gauge', 'Tempo de parede da execução.', [('', relatorio['duracao_s'])]),
+            ('execucao_tempo_cpu_segundos', 'gauge', 'Tempo de CPU da execução (processo e filhos encerrados).',
+             [('', relatorio['tempo_cpu_s'])]),
+        ]
+        por_etapa = [
+            ('etapa_chamadas_total', 'counter', 'Execuções da etapa.', 'chamadas', 1),
+            ('etapa_falhas_total', 'counter', 'Execuções da etapa encerradas por exceção.', 'falhas', 1),
+            ('etapa_tempo_parede_segundos_total', 'counter', 'Tempo de parede acumulado da etapa.', 'tempo_parede_s', 1),
+            ('etapa_tempo_cpu_segundos_total', 'counter', 'Tempo de CPU acumulado da etapa.', 'tempo_cpu_s', 1),
+            ('etapa_pico_rss_bytes', 'gauge', 'Pico de memória residente durante a etapa.', 'pico_rss_mb', 2 ** 20),
+            ('etapa_linhas_total', 'counter', 'Linhas processadas pela etapa.', 'linhas', 1),
+            ('etapa_linhas_por_segundo', 'gauge', 'Vazão da etapa em linhas por segundo.', 'linhas_por_s', 1),
+        ]
+        for nome, tipo, ajuda, campo, escala in por_etapa:
+            amostras = [(f'etapa="{_rotulo(etapa["nome"])}"', etapa[campo] if escala == 1 else round(etapa[campo] * escala))
+                        for etapa in relatorio['etapas'] if etapa[campo] is not None]
+            metricas.append((nome, tipo, ajuda, amostras))
+
+        linhas = []
+        for nome, tipo, ajuda, amostras in metricas:
+            if not amostras:
+                continue
+            nome = f"{PREFIXO_PROMETHEUS}_{nome}"
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+            for rotulos, valor in amostras:
+                linhas.append(f'{nome}{{execucao="{execucao}"{"," + rotulos if rotulos else ""}}} {_numero(valor)}')
+
+        # Duração de cada chamada como summary (quantis, soma e contagem), para etapas repetidas
+        nome = f"{PREFIXO_PROMETHEUS}_etapa_duracao_segundos"
+        repetidas = [etapa for etapa in relatorio['etapas'] if 'duracao_s' in etapa]
+        if repetidas:
+            linhas += [f"# HELP {nome} Duração de cada chamada da etapa.", f"# TYPE {nome} summary"]
+            for etapa in repetidas:
+                rotulos = f'execucao="{execucao}",etapa="{_rotulo(etapa["nome"])}"'
+                for q in QUANTIS_DURACAO:
+                    linhas.append(f'{nome}{{{rotulos},quantile="{q}"}} {_numero(etapa["duracao_s"][f"p{int(q * 100)}"])}')
+                linhas.append(f'{nome}_sum{{{rotulos}}} {_numero(etapa["tempo_parede_s"])}')
+                linhas.append(f'{nome}_count{{{rotulos}}} {etapa["chamadas"]}')
+        return "\n".join(linhas) + "\n"
+
+    def salvar(self, relatorio=None):
+        """
+        Grava <diretorio>/<execucao>_metricas.json e <execucao>_metricas.prom (e o perfil cProfile
+        em <execucao>_cpu.prof, para pstats ou snakeviz) com troca atômica dos arquivos.
+        """
+        relatorio = relatorio or self.relatorio()
+        os.makedirs(self.diretorio, exist_ok=True)
+        base = os.path.join(self.diretorio, self.execucao)
+        caminhos = [_gravar_atomico(f"{base}_metricas.json", json.dumps(relatorio, indent=2, ensure_ascii=False)),
+                    _gravar_atomico(f"{base}_metricas.prom", self.texto_prometheus(relatorio))]
+        if self._perfil_cpu is not None:
+            self._perfil_cpu.dump_stats(f"{base}_cpu.prof")
+            caminhos.append(f"{base}_cpu.prof")
+        return caminhos
+
+    def finalizar(self):
+        """Encerra os perfis, salva o relatório e imprime o resumo das etapas (uma única vez)."""
+        if not self.ativo or self._finalizado:
+            return
+        self._finalizado = True
+        if self._perfil_cpu is not None:
+            self._perfil_cpu.disable()
+        try:
+            relatorio = self.relatorio()
+            caminhos = self.salvar(relatorio)
+        except Exception as e:
+            print(f"Erro ao salvar as métricas da execução: {e}")
+            return
+        finally:
+            if self.perfilar_memoria:
+                import tracemalloc
+                tracemalloc.stop()
+        print(f"\n--- Métricas por etapa ({relatorio['execucao']}, {relatorio['duracao_s']:.2f} s) ---")
+        for etapa in relatorio['etapas']:
+            vazao = f" | {etapa['linhas_por_s']:,.0f} linhas/s" if etapa['linhas_por_s'] else ""
+            chamadas = f" ({etapa['chamadas']}x, p95 {etapa['duracao_s']['p95'] * 1000:.2f} ms)" if 'duracao_s' in etapa else ""
+            print(f"{etapa['nome']:<32} {etapa['tempo_parede_s']:9.3f} s | CPU {etapa['tempo_cpu_s']:8.3f} s | "
+                  f"pico RSS {etapa['pico_rss_mb']:8.1f} MB{vazao}{chamadas}")
+        print(f"Métricas salvas em: {', '.join(caminhos)}")
+
+
+PERFILADOR_INATIVO = PerfiladorEtapas('inativo', ativo=False)
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _gravar_atomico(caminho, conteudo):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def adicionar_argumentos_metricas(parser):
+    """Opções de linha de comando comuns aos três scripts do pipeline."""
+    parser.add_argument('--metricas', action='store_true',
+                        help="Mede tempo de parede, CPU, pico de RSS e linhas/s de cada etapa e salva um relatório "
+                             "JSON e um arquivo no formato do Prometheus.")
+    parser.add_argument('--diretorio-metricas', default=DIRETORIO_METRICAS_PADRAO,
+                        help="Diretório dos relatórios de métricas.")
+    parser.add_argument('--perfilar', choices=['cpu', 'memoria', 'ambos'], default=None,
+                        help="Também roda cProfile e/ou tracemalloc e inclui os pontos quentes no relatório (implica --metricas).")
+
+
+def criar_perfilador(execucao, args):
+    """
+    Perfilador configurado pelas opções de adicionar_argumentos_metricas. Ligado, ele começa a medir
+    já e salva o relatório ao fim do processo (inclusive em exit() por erro); desligado, custa só
+    uma chamada de método por etapa.
+    """
+    ativo = args.metricas or args.perfilar is not None
+    perfilador = PerfiladorEtapas(execucao, ativo, perfilar_cpu=args.perfilar in ('cpu', 'ambos'),
+                                  perfilar_memoria=args.perfilar in ('memoria', 'ambos'),
+                                  diretorio=args.diretorio_metricas)
+    if ativo:
+        perfilador.iniciar()
+        atexit.register(perfilador.finalizar)
+    return perfilador
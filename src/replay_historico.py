@@ -0,0 +1,408 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from features_chuva import janelas_do_modelo, nomes_features_janelas
+from floresta_compacta import caminho_floresta_compacta, carregar_floresta_compacta
+from ingestao_cemaden import TAMANHO_BLOCO_PADRAO, ler_csv_cemaden_em_blocos
+from inferencia_lote import obter_preditor
+from motor_alertas import (CICLOS_RESFRIAMENTO_PADRAO, NIVEIS_ALERTA, PERMANENCIA_MINIMA_PADRAO, MotorAlertas,
+                           intensidades_por_chuva)
+from perfilador_etapas import PERFILADOR_INATIVO, adicionar_argumentos_metricas, criar_perfilador
+
+PADRAO_ARQUIVOS_MENSAIS = "data/cemaden_[sS][pP]_*.csv"
+CAMINHO_MODELO_PADRAO = "ml_model/cemaden_flood_risk_model_pipeline.joblib"
+CAMINHO_SAIDA_PADRAO = "data/replay_linha_do_tempo_alertas.csv"
+PASSO = pd.Timedelta(minutes=10)
+PASSOS_POR_HORA = 6
+# Leituras pontuadas por chamada ao preditor: limita a matriz de entrada (one-hot denso no pipeline)
+TAMANHO_LOTE_PREDICAO = 16384
+# Nível a partir do qual um episódio conta como alerta nas estatísticas (1 = Amarelo)
+NIVEL_ALERTA_PADRAO = 1
+RAIO_EVENTO_PADRAO_KM = 10.0
+HORAS_ANTES_EVENTO_PADRAO = 24
+HORAS_DEPOIS_EVENTO_PADRAO = 6
+
+
+def carregar_leituras_10min(arquivos_csv, inicio=None, fim=None, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Lê as leituras de 10 minutos dos CSVs mensais do CEMADEN em blocos, mantendo só estação,
+    instante e chuva (e, à parte, município e coordenadas de cada estação). inicio/fim restringem
+    o período a [inicio, fim). Retorna (leituras, estacoes); arquivos ilegíveis são pulados.
+    """
+    inicio = pd.Timestamp(inicio) if inicio is not None else None
+    fim = pd.Timestamp(fim) if fim is not None else None
+    blocos, cadastros = [], []
+    for arquivo_csv in arquivos_csv:
+        try:
+            for df_bloco in ler_csv_cemaden_em_blocos(arquivo_csv, tamanho_bloco):
+                datahora = pd.to_datetime(df_bloco['datahora_utc'])
+                manter = np.ones(len(df_bloco), dtype=bool)
+                if inicio is not None:
+                    manter &= (datahora >= inicio).to_numpy()
+                if fim is not None:
+                    manter &= (datahora < fim).to_numpy()
+                if not manter.any():
+                    continue
+                df_bloco = df_bloco[manter]
+                blocos.append(pd.DataFrame({
+                    'cod_estacao': df_bloco['cod_estacao'].astype(str).to_numpy(),
+                    'datahora_utc': datahora[manter].to_numpy(),
+                    'chuva_10min_mm': pd.to_numeric(df_bloco['chuva_10min_mm'], errors='coerce').fillna(0).to_numpy(),
+                }))
+                colunas = [c for c in ('cod_estacao', 'municipio', 'latitude', 'longitude') if c in df_bloco.columns]
+                cadastros.append(df_bloco[colunas].drop_duplicates('cod_estacao'))
+        except Exception as e:
+            print(f"Erro ao ler o arquivo {arquivo_csv}: {e}. Pulando este arquivo.")
+    if not blocos:
+        return None, None
+    estacoes = pd.concat(cadastros, ignore_index=True).drop_duplicates('cod_estacao')
+    estacoes['cod_estacao'] = estacoes['cod_estacao'].astype(str)
+    return pd.concat(blocos, ignore_index=True), estacoes.sort_values('cod_estacao', ignore_index=True)
+
+
+def carregar_modelo_replay(caminho_modelo=CAMINHO_MODELO_PADRAO):
+    """
+    Pipeline treinado (o PreditorEmLote é o mais rápido para lotes grandes, como no gateway) ou,
+    sem ele, a floresta compacta exportada ao lado.
+    """
+    if os.path.exists(caminho_modelo):
+        import joblib
+        return joblib.load(caminho_modelo, mmap_mode='r')
+    return carregar_floresta_compacta(caminho_floresta_compacta(caminho_modelo), mmap=True)
+
+
+def _deslocar(grade, passos):
+    # Valor de passos atrás na mesma estação (eixo 0 = tempo), com 0 antes do início
+    if passos == 0:
+        return grade
+    deslocada = np.zeros_like(grade)
+    deslocada[passos:] = grade[:-passos]
+    return deslocada
+
+
+def _somas_moveis(grade, passos):
+    # Soma dos últimos passos valores (inclusive o atual) por soma acumulada; o arredondamento
+    # remove os resíduos da subtração (1e-15 em vez de 0), que separariam leituras iguais
+    acumulada = np.cumsum(grade, axis=0)
+    return np.round(acumulada - _deslocar(acumulada, passos), 6)
+
+
+def _maximos_moveis(horaria, janelas):
+    """
+    Máximo de horaria[t], horaria[t - 6], ..., horaria[t - 6 (w - 1)] para cada w em janelas: o
+    mesmo máximo das features de janelas, sobre a hora móvel que termina em cada passo. Blocos
+    de 2^k horas são construídos por duplicação, guardando só o bloco corrente.
+    """
+    resultado = {}
+    bloco, tamanho = horaria, 1
+    for w in sorted(janelas):
+        while tamanho * 2 <= w:
+            bloco = np.maximum(bloco, _deslocar(bloco, tamanho * PASSOS_POR_HORA))
+            tamanho *= 2
+        resultado[w] = np.maximum(bloco, _deslocar(bloco, (w - tamanho) * PASSOS_POR_HORA))
+    return resultado
+
+
+class ReplayHistorico:
+    """
+    Reprodução da série real de 10 minutos de todas as estações pelo caminho de alerta do
+    simulador. As leituras vão para uma grade densa (passo x estação). A cada passo, a chuva da
+    última hora móvel (e as janelas de 3 h a 72 h, se o modelo usar) sai de somas acumuladas e
+    deslocamentos vetorizados, e a intensidade local vem dos limites de INTENSIDADE_MM_H. Como a
+    predição não depende do estado dos alertas, ela é feita antes, em lotes, uma única vez por
+    combinação distinta de estação e features. O laço por passo só avança o MotorAlertas com
+    as estações que têm leitura na última hora, o que aplica a regra de determinar_risco_final
+    e a histerese a todas de uma vez.
+    """
+
+    def __init__(self, leituras, estacoes, modelo, perfilador=None):
+        perfilador = perfilador or PERFILADOR_INATIVO
+        self.estacoes = estacoes
+        self.cod_estacoes = estacoes['cod_estacao'].to_numpy()
+        with perfilador.etapa('grade_e_features', linhas=len(leituras)):
+            self._montar_grade(leituras)
+            features = self._calcular_features(janelas_do_modelo(modelo))
+        with perfilador.etapa('predicao_ml', linhas=len(self.estacao)):
+            self.risco_ml = self._prever(obter_preditor(modelo), features)
+        self.intensidade = intensidades_por_chuva(self.chuva_1h)
+
+    def _montar_grade(self, leituras):
+        estacao = pd.Index(self.cod_estacoes).get_indexer(leituras['cod_estacao'])
+        instante = leituras['datahora_utc'].to_numpy(dtype='datetime64[ns]')
+        self.inicio = pd.Timestamp(instante.min()).floor(PASSO)
+        passo = (instante - self.inicio.to_datetime64()) // PASSO.to_timedelta64()
+        self.n_passos = int(passo.max()) + 1
+        n_estacoes = len(self.cod_estacoes)
+        # Leituras repetidas no mesmo passo são somadas, como na agregação horária
+        celula = passo * n_estacoes + estacao
+        total = self.n_passos * n_estacoes
+        self._chuva_10min = np.bincount(celula, weights=leituras['chuva_10min_mm'].to_numpy(dtype='float64'),
+                                        minlength=total).reshape(self.n_passos, n_estacoes)
+        leituras_na_hora = _somas_moveis(np.bincount(celula, minlength=total).reshape(self.n_passos, n_estacoes),
+                                         PASSOS_POR_HORA)
+        # Células avaliadas: estação com alguma leitura na última hora, em ordem de passo
+        celulas = np.flatnonzero(leituras_na_hora.ravel() > 0)
+        self.passo, self.estacao = np.divmod(celulas, n_estacoes)
+        self.inicio_passo = np.searchsorted(self.passo, np.arange(self.n_passos + 1))
+
+    def _calcular_features(self, janelas):
+        horaria = _somas_moveis(self._chuva_10min, PASSOS_POR_HORA)
+        self.chuva_1h = horaria[self.passo, self.estacao]
+        features = {}
+        if janelas:
+            maximos = _maximos_moveis(horaria, janelas)
+            for w in janelas:
+                features[f'chuva_{w}h_soma_mm'] = _somas_moveis(self._chuva_10min, w * PASSOS_POR_HORA)[self.passo, self.estacao]
+                features[f'chuva_{w}h_max_mm'] = maximos.pop(w)[self.passo, self.estacao]
+        del self._chuva_10min
+        return {nome: features[nome] for nome in nomes_features_janelas(janelas)}
+
+    def _prever(self, preditor, features):
+        # Horas secas se repetem aos milhares por estação: cada combinação é pontuada uma vez
+        colunas = {'estacao': self.estacao, 'acumulado_chuva_1_h_mm': self.chuva_1h, **features}
+        grupos = pd.DataFrame(colunas).groupby(list(colunas), sort=False).ngroup().to_numpy()
+        # Primeira célula de cada combinação: a atribuição invertida deixa o menor índice
+        unicas = np.empty(grupos.max() + 1 if len(grupos) else 0, dtype='int64')
+        unicas[grupos[::-1]] = np.arange(len(grupos) - 1, -1, -1)
+        risco = np.empty(len(unicas), dtype=np.int8)
+        for inicio in range(0, len(unicas), TAMANHO_LOTE_PREDICAO):
+            linhas = unicas[inicio:inicio + TAMANHO_LOTE_PREDICAO]
+            extras = {nome: valores[linhas] for nome, valores in features.items()} or None
+            risco[inicio:inicio + len(linhas)] = preditor.prever(self.cod_estacoes[self.estacao[linhas]],
+                                                                 self.chuva_1h[linhas], extras)
+        return risco[grupos]
+
+    def datahora_do_passo(self, passos):
+        return self.inicio + np.asarray(passos) * PASSO
+
+    def executar(self, velocidade=0, ciclos_resfriamento=CICLOS_RESFRIAMENTO_PADRAO,
+                 permanencia_minima=PERMANENCIA_MINIMA_PADRAO, ao_transicionar=None):
+        """
+        Avança passo a passo pelo MotorAlertas e devolve a linha do tempo das transições de nível
+        (datahora_utc, cod_estacao, municipio, nivel_anterior, nivel_novo, chuva_1h_mm, risco_ml).
+        velocidade é o fator sobre o tempo real (60 = uma hora de série por minuto); 0 reproduz
+        o mais rápido possível. ao_transicionar(datahora, transicoes), se informado, é chamado a cada
+        passo com transições.
+        """
+        municipios = self.estacoes['municipio'] if 'municipio' in self.estacoes.columns else None
+        motor = MotorAlertas(self.cod_estacoes, municipios, ciclos_resfriamento, permanencia_minima)
+        segundos_por_passo = PASSO.total_seconds() / velocidade if velocidade else 0.0
+        relogio = time.perf_counter()
+        registros = []
+        for passo in range(self.n_passos):
+            inicio, fim = self.inicio_passo[passo], self.inicio_passo[passo + 1]
+            if fim > inicio:
+                transicoes = motor.processar_ciclo(self.risco_ml[inicio:fim], self.intensidade[inicio:fim],
+                                                   self.estacao[inicio:fim])
+                if len(transicoes):
+                    # Posição de cada estação transicionada entre as células do passo (ordenadas por estação)
+                    celulas = inicio + np.searchsorted(self.estacao[inicio:fim], transicoes.estacoes)
+                    registros.append((celulas, transicoes.nivel_anterior, transicoes.nivel_novo))
+                    if ao_transicionar is not None:
+                        ao_transicionar(self.datahora_do_passo(passo), transicoes)
+            if segundos_por_passo:
+                # Agenda pelo relógio: o tempo de processamento do passo é descontado da espera
+                espera = relogio + (passo + 1) * segundos_por_passo - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+        self.motor = motor
+        return self._linha_do_tempo(registros)
+
+    def _linha_do_tempo(self, registros):
+        if registros:
+            celulas, anterior, novo = (np.concatenate(partes) for partes in zip(*registros))
+        else:
+            celulas, anterior, novo = np.array([], dtype='int64'), np.array([], dtype=np.int8), np.array([], dtype=np.int8)
+        linha_do_tempo = pd.DataFrame({
+            'datahora_utc': self.datahora_do_passo(self.passo[celulas]),
+            'cod_estacao': self.cod_estacoes[self.estacao[celulas]],
+            'nivel_anterior': anterior,
+            'nivel_novo': novo,
+            'chuva_1h_mm': self.chuva_1h[celulas],
+            'risco_ml': self.risco_ml[celulas],
+        })
+        if 'municipio' in self.estacoes.columns:
+            linha_do_tempo.insert(2, 'municipio', self.estacoes['municipio'].to_numpy()[self.estacao[celulas]])
+        return linha_do_tempo
+
+
+def episodios_de_alerta(linha_do_tempo, fim_replay, nivel_alerta=NIVEL_ALERTA_PADRAO):
+    """
+    Episódios de alerta por estação: do passo em que o nível chega a nivel_alerta ou mais até o
+    passo em que volta abaixo dele (ou até fim_replay, se ainda estiver em alerta), com o maior nível.
+    """
+    linha = linha_do_tempo.sort_values(['cod_estacao', 'datahora_utc'], kind='stable', ignore_index=True)
+    em_alerta = (linha['nivel_novo'] >= nivel_alerta).to_numpy()
+    estava = (linha['nivel_anterior'] >= nivel_alerta).to_numpy()
+    estacao = linha['cod_estacao'].to_numpy()
+    # Número do episódio de cada transição: conta as entradas em alerta da estação até ela
+    entrada = em_alerta & ~estava
+    episodio = np.cumsum(entrada) - 1
+    inicios = np.flatnonzero(entrada)
+    saida = np.flatnonzero(~em_alerta & estava)
+    fim = np.full(len(inicios), pd.Timestamp(fim_replay).to_datetime64(), dtype='datetime64[ns]')
+    fim[episodio[saida]] = linha['datahora_utc'].to_numpy(dtype='datetime64[ns]')[saida]
+    nivel_maximo = (pd.Series(linha['nivel_novo'].to_numpy()[em_alerta]).groupby(episodio[em_alerta]).max()
+                    .reindex(range(len(inicios))).to_numpy())
+    return pd.DataFrame({
+        'cod_estacao': estacao[inicios],
+        'inicio_utc': linha['datahora_utc'].to_numpy(dtype='datetime64[ns]')[inicios],
+        'fim_utc': fim,
+        'nivel_maximo': nivel_maximo.astype(np.int8),
+    })
+
+
+def avaliar_alertas(episodios, estacoes, eventos, inicio_replay, fim_replay, raio_km=RAIO_EVENTO_PADRAO_KM,
+                    horas_antes=HORAS_ANTES_EVENTO_PADRAO, horas_depois=HORAS_DEPOIS_EVENTO_PADRAO):
+    """
+    Compara os episódios com os eventos de enchente do período. Um evento é detectado quando
+    alguma estação a até raio_km está em alerta na janela [evento - horas_antes, evento + horas_depois]
+    (o dia inteiro, quando o horário é desconhecido). A antecedência é o tempo entre o início do
+    primeiro desses episódios e o evento (negativa quando o alerta veio depois). Episódios que
+    não tocam a janela de nenhum evento próximo são falsos alarmes.
+    Retorna (eventos_avaliados, episodios com a coluna 'falso_alarme', resumo).
+    """
+    from sklearn.neighbors import BallTree
+    from juncao_eventos import RAIO_TERRA_KM
+
+    momento = eventos['datahora_evento_utc']
+    eventos = eventos[(momento >= inicio_replay) & (momento < fim_replay)].reset_index(drop=True)
+    janela_inicio = eventos['datahora_evento_utc'] - pd.Timedelta(hours=horas_antes)
+    janela_fim = (eventos['datahora_evento_utc']
+                  + pd.to_timedelta(np.where(eventos['horario_conhecido'], horas_depois, horas_depois + 23), unit='h'))
+
+    coordenadas = estacoes[['latitude', 'longitude']].apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+    validas = np.flatnonzero(~np.isnan(coordenadas).any(axis=1))
+    pares = pd.DataFrame({'evento': np.array([], dtype='int64'), 'cod_estacao': np.array([], dtype=str)})
+    if len(eventos) and len(validas):
+        arvore = BallTree(np.radians(coordenadas[validas]), metric='haversine')
+        vizinhos = arvore.query_radius(np.radians(eventos[['Latitude', 'Longitude']].to_numpy(dtype='float64')),
+                                       r=raio_km / RAIO_TERRA_KM)
+        pares = pd.DataFrame({
+            'evento': np.repeat(np.arange(len(eventos)), [len(v) for v in vizinhos]),
+            'cod_estacao': estacoes['cod_estacao'].to_numpy()[validas[np.concatenate(vizinhos).astype('int64')]],
+        })
+
+    episodios = episodios.reset_index(drop=True)
+    cruzamento = pares.merge(episodios.reset_index(names='episodio'), on='cod_estacao')
+    ev = cruzamento['evento'].to_numpy()
+    sobrepoe = ((cruzamento['inicio_utc'].to_numpy() <= janela_fim.to_numpy()[ev])
+                & (cruzamento['fim_utc'].to_numpy() >= janela_inicio.to_numpy()[ev]))
+    cruzamento = cruzamento[sobrepoe]
+
+    primeiro_alerta = cruzamento.groupby('evento')['inicio_utc'].min()
+    avaliados = eventos[[c for c in ('Data', 'Horario', 'Bairro_Localizacao', 'datahora_evento_utc', 'horario_conhecido')
+                         if c in eventos.columns]].copy()
+    avaliados['estacoes_no_raio'] = pares.groupby('evento').size().reindex(avaliados.index, fill_value=0)
+    avaliados['primeiro_alerta_utc'] = primeiro_alerta.reindex(avaliados.index)
+    avaliados['detectado'] = avaliados['primeiro_alerta_utc'].notna()
+    avaliados['antecedencia_h'] = ((avaliados['datahora_evento_utc'] - avaliados['primeiro_alerta_utc'])
+                                   / pd.Timedelta(hours=1)).round(2)
+
+    episodios['falso_alarme'] = ~episodios.index.isin(cruzamento['episodio'])
+    dias = max((pd.Timestamp(fim_replay) - pd.Timestamp(inicio_replay)) / pd.Timedelta(days=1), 1e-9)
+    com_horario = avaliados['detectado'] & avaliados['horario_conhecido']
+    resumo = {
+        'eventos': len(avaliados),
+        'eventos_com_estacao_no_raio': int((avaliados['estacoes_no_raio'] > 0).sum()),
+        'eventos_detectados': int(avaliados['detectado'].sum()),
+        'antecedencia_mediana_h': float(avaliados.loc[com_horario, 'antecedencia_h'].median()) if com_horario.any() else None,
+        'antecedencia_media_h': float(avaliados.loc[com_horario, 'antecedencia_h'].mean()) if com_horario.any() else None,
+        'episodios_alerta': len(episodios),
+        'falsos_alarmes': int(episodios['falso_alarme'].sum()),
+        'taxa_falsos_alarmes': float(episodios['falso_alarme'].mean()) if len(episodios) else None,
+        'falsos_alarmes_por_estacao_dia': float(episodios['falso_alarme'].sum() / max(len(estacoes), 1) / dias),
+    }
+    return avaliados, episodios, resumo
+
+
+def imprimir_transicoes(replay):
+    # Saída no estilo do simulador, para reproduções em velocidade real ou acelerada
+    def _imprimir(datahora, transicoes):
+        for estacao, anterior, novo in zip(transicoes.estacoes.tolist(), transicoes.nivel_anterior.tolist(),
+                                           transicoes.nivel_novo.tolist()):
+            print(f"{datahora:%Y-%m-%d %H:%M} UTC | {replay.cod_estacoes[estacao]}: "
+                  f"{NIVEIS_ALERTA[anterior]} -> {NIVEIS_ALERTA[novo]}")
+    return _imprimir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproduz a série histórica de 10 minutos do CEMADEN pelo caminho de alerta "
+                                                 "do simulador e mede a antecedência e os falsos alarmes em relação aos eventos.")
+    parser.add_argument('--arquivos', nargs='+', help=f"CSVs mensais do CEMADEN (padrão: {PADRAO_ARQUIVOS_MENSAIS}).")
+    parser.add_argument('--inicio', help="Início do período reproduzido (UTC), ex.: 2025-02-01.")
+    parser.add_argument('--fim', help="Fim (exclusivo) do período reproduzido (UTC), ex.: 2025-03-01.")
+    parser.add_argument('--modelo', default=CAMINHO_MODELO_PADRAO)
+    parser.add_argument('--velocidade', type=float, default=0,
+                        help="Fator sobre o tempo real (ex.: 600 = 10 minutos de série por segundo); 0 = o mais rápido possível.")
+    parser.add_argument('--exibir', action='store_true', help="Imprime cada transição de nível durante a reprodução.")
+    parser.add_argument('--nivel-alerta', type=int, default=NIVEL_ALERTA_PADRAO, choices=[1, 2],
+                        help="Nível que conta como alerta nas estatísticas (1 = Amarelo, 2 = Vermelho).")
+    parser.add_argument('--raio-km', type=float, default=RAIO_EVENTO_PADRAO_KM)
+    parser.add_argument('--horas-antes', type=int, default=HORAS_ANTES_EVENTO_PADRAO)
+    parser.add_argument('--horas-depois', type=int, default=HORAS_DEPOIS_EVENTO_PADRAO)
+    parser.add_argument('--eventos', default="data/eventos_enchentes_sp_2025.csv")
+    parser.add_argument('--saida', default=CAMINHO_SAIDA_PADRAO, help="CSV com a linha do tempo das transições de alerta.")
+    adicionar_argumentos_metricas(parser)
+    args = parser.parse_args()
+    perfilador = criar_perfilador('replay', args)
+
+    arquivos = args.arquivos or sorted(glob.glob(PADRAO_ARQUIVOS_MENSAIS))
+    if not arquivos:
+        print(f"Nenhum arquivo mensal encontrado ({PADRAO_ARQUIVOS_MENSAIS}). Encerrando.")
+        exit()
+    try:
+        with perfilador.etapa('carga_modelo'):
+            modelo = carregar_modelo_replay(args.modelo)
+    except FileNotFoundError as e:
+        print(f"Erro: modelo não encontrado: {e}")
+        exit()
+
+    inicio_total = time.perf_counter()
+    with perfilador.etapa('leitura_csv') as etapa:
+        leituras, estacoes = carregar_leituras_10min(arquivos, args.inicio, args.fim)
+        etapa.linhas = len(leituras) if leituras is not None else None
+    if leituras is None or len(leituras) == 0:
+        print("Nenhuma leitura no período informado. Encerrando.")
+        exit()
+    print(f"{len(leituras):,} leituras de {len(estacoes)} estações lidas de {len(arquivos)} arquivo(s) "
+          f"em {time.perf_counter() - inicio_total:.1f} s.")
+
+    replay = ReplayHistorico(leituras, estacoes, modelo, perfilador)
+    del leituras
+    inicio_replay = pd.Timestamp(args.inicio) if args.inicio else replay.inicio
+    fim_replay = pd.Timestamp(args.fim) if args.fim else replay.datahora_do_passo(replay.n_passos)
+    with perfilador.etapa('replay_alertas', linhas=len(replay.estacao)):
+        inicio = time.perf_counter()
+        linha_do_tempo = replay.executar(args.velocidade, ao_transicionar=imprimir_transicoes(replay) if args.exibir else None)
+        tempo_laco = time.perf_counter() - inicio
+    print(f"{replay.n_passos:,} passos de 10 minutos ({len(replay.estacao):,} avaliações, "
+          f"{len(linha_do_tempo):,} transições) reproduzidos em {tempo_laco:.2f} s; "
+          f"total {time.perf_counter() - inicio_total:.1f} s.")
+
+    with perfilador.etapa('avaliacao_eventos'):
+        from juncao_eventos import carregar_eventos
+        episodios = episodios_de_alerta(linha_do_tempo, fim_replay, args.nivel_alerta)
+        try:
+            eventos = carregar_eventos(args.eventos)
+        except FileNotFoundError:
+            print(f"Aviso: catálogo de eventos {args.eventos} não encontrado; estatísticas só dos alertas.")
+            eventos = pd.DataFrame({'datahora_evento_utc': pd.Series(dtype='datetime64[ns]'),
+                                    'horario_conhecido': pd.Series(dtype=bool),
+                                    'Latitude': pd.Series(dtype='float64'), 'Longitude': pd.Series(dtype='float64')})
+        avaliados, episodios, resumo = avaliar_alertas(episodios, estacoes, eventos, inicio_replay, fim_replay,
+                                                       args.raio_km, args.horas_antes, args.horas_depois)
+
+    print(f"\nEventos no período ({NIVEIS_ALERTA[args.nivel_alerta]} ou acima, estações a até {args.raio_km} km):")
+    if len(avaliados):
+        print(avaliados.drop(columns='datahora_evento_utc').to_string())
+    for chave, valor in resumo.items():
+        print(f"  {chave}: {valor if not isinstance(valor, float) else round(valor, 3)}")
+    os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+    linha_do_tempo.to_csv(args.saida, index=False)
+    print(f"Linha do tempo dos alertas salva em {args.saida}")
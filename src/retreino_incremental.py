@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# Árvores acrescentadas à floresta a cada re-treino incremental
+ARVORES_POR_RETREINO = 20
+
+
+def estacoes_desconhecidas(pipeline, cod_estacoes):
+    """Estações de cod_estacoes que o codificador do pipeline não viu no treino (vazio se não houver tabela)."""
+    transformador = pipeline.named_steps['preprocessor'].transformers_[0][1]
+    if hasattr(transformador, 'categories_'):
+        conhecidas = transformador.categories_[0]
+    elif hasattr(transformador, 'indice_'):
+        conhecidas = transformador.indice_
+    else:
+        return np.array([], dtype=str)
+    return np.setdiff1d(pd.unique(np.asarray(cod_estacoes).astype(str)), np.asarray(conhecidas).astype(str))
+
+
+def adicionar_arvores(pipeline, X_novo, y_novo, arvores_novas=ARVORES_POR_RETREINO, arvores_max=None):
+    """
+    Re-treino incremental: mantém o pré-processador e as árvores já treinadas e acrescenta
+    arvores_novas árvores treinadas só com os dados novos (warm_start do RandomForest).
+    O custo depende do volume novo, não do histórico acumulado.
+
+    Estações que o codificador nunca viu recebem a codificação de "estação desconhecida"
+    (one-hot zerado, ordinal -1, média global no modo alvo ou coordenadas ausentes no geo); as
+    árvores novas aprendem o comportamento delas com essa codificação até o próximo re-treino completo.
+    Com arvores_max, as árvores mais antigas são descartadas quando a floresta passa desse tamanho.
+    Retorna o número de estações desconhecidas nos dados novos.
+    """
+    classificador = pipeline.named_steps['classifier']
+    classes = classificador.classes_
+    y_novo = np.asarray(y_novo)
+    classes_novas = np.setdiff1d(y_novo, classes)
+    if len(classes_novas):
+        raise ValueError(f"Classes {list(classes_novas)} não existem no modelo; faça um re-treino completo.")
+
+    X_transformado = pipeline.named_steps['preprocessor'].transform(X_novo)
+    pesos = np.ones(len(y_novo))
+    faltantes = np.setdiff1d(classes, y_novo)
+    if len(faltantes):
+        # O RandomForest recalcula classes_ a partir de y: uma linha de peso zero por classe ausente
+        # mantém as mesmas classes (e colunas de probabilidade) das árvores antigas
+        X_transformado = _repetir_primeira_linha(X_transformado, len(faltantes))
+        y_novo = np.concatenate([y_novo, faltantes])
+        pesos = np.concatenate([pesos, np.zeros(len(faltantes))])
+
+    classificador.set_params(warm_start=True, n_estimators=len(classificador.estimators_) + arvores_novas)
+    classificador.fit(X_transformado, y_novo.astype(classes.dtype), sample_weight=pesos)
+    classificador.set_params(warm_start=False)
+
+    if arvores_max is not None and len(classificador.estimators_) > arvores_max:
+        classificador.estimators_ = classificador.estimators_[-arvores_max:]
+        classificador.set_params(n_estimators=arvores_max)
+    return len(estacoes_desconhecidas(pipeline, X_novo['cod_estacao']))
+
+
+def _repetir_primeira_linha(X, vezes):
+    if hasattr(X, 'tocsr'):
+        from scipy.sparse import vstack
+        return vstack([X, X[[0] * vezes]], format='csr')
+    return np.vstack([X, np.repeat(X[:1], vezes, axis=0)])
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+# Perfis de limiares de chuva horária (mm/h) para os níveis de risco
+# Baixo=0: chuva < baixo_max; Moderado=1: baixo_max <= chuva < moderado_max; Alto=2: chuva >= moderado_max
+PERFIS_LIMIARES = {
+    'eda_3a_rodada': {'baixo_max': 5.5, 'moderado_max': 18},  # Limiares ajustados após a EDA (3ª rodada)
+}
+PERFIL_PADRAO = 'eda_3a_rodada'
+
+# 01/01/1970 foi uma quinta-feira; com segunda=0 isso equivale ao deslocamento 3
+_DIA_SEMANA_EPOCH = 3
+_NS_POR_HORA = 3600 * 10**9
+_NS_POR_DIA = 24 * _NS_POR_HORA
+
+
+def obter_limiares(perfil=PERFIL_PADRAO):
+    """Aceita o nome de um perfil de PERFIS_LIMIARES ou um dicionário {'baixo_max', 'moderado_max'}."""
+    if isinstance(perfil, dict):
+        return perfil
+    if perfil not in PERFIS_LIMIARES:
+        raise ValueError(f"Perfil de limiares desconhecido: {perfil}. Disponíveis: {list(PERFIS_LIMIARES)}")
+    return PERFIS_LIMIARES[perfil]
+
+
+def interpretar_perfil(texto):
+    """Converte 'nome=baixo_max,moderado_max' (ex.: 'conservador=3,10') em (nome, limiares)."""
+    nome, valores = texto.split('=', 1)
+    baixo_max, moderado_max = (float(v) for v in valores.split(','))
+    if baixo_max > moderado_max:
+        raise ValueError(f"Perfil {nome}: baixo_max ({baixo_max}) deve ser menor ou igual a moderado_max ({moderado_max}).")
+    return nome.strip(), {'baixo_max': baixo_max, 'moderado_max': moderado_max}
+
+
+def classificar_risco_vetorizado(chuva_mm_h, perfil=PERFIL_PADRAO):
+    """
+    Classifica a chuva horária em níveis de risco (0, 1, 2) com uma única busca binária vetorizada
+    sobre os limiares, equivalente à classificação linha a linha com if/elif.
+    Valores NaN caem em Alto (2), como na comparação original.
+    """
+    limiares = obter_limiares(perfil)
+    bordas = np.array([limiares['baixo_max'], limiares['moderado_max']], dtype='float64')
+    valores = np.asarray(chuva_mm_h, dtype='float64')
+    return np.searchsorted(bordas, valores, side='right').astype('int8')
+
+
+def rotular_multiplos_perfis(chuva_mm_h, perfis):
+    """
+    Rotula a mesma série de chuva com vários perfis de uma vez. perfis é um dicionário
+    {nome: perfil}; retorna um DataFrame com uma coluna 'nivel_risco_<nome>' por perfil.
+    """
+    valores = np.asarray(chuva_mm_h, dtype='float64')
+    indice = chuva_mm_h.index if isinstance(chuva_mm_h, pd.Series) else None
+    return pd.DataFrame({f'nivel_risco_{nome}': classificar_risco_vetorizado(valores, perfil)
+                         for nome, perfil in perfis.items()}, index=indice)
+
+
+def calcular_features_calendario(datahora):
+    """
+    Deriva ano, mes, dia, hora_brasilia e dia_semana_brasilia (segunda=0) de uma série de datas
+    em uma única passada vetorizada do NumPy, sem os acessores .dt individuais.
+    """
+    if datahora.isna().any():
+        # NaT não tem representação inteira; mantém o comportamento do pandas (NaN) nesse caso
+        return pd.DataFrame({
+            'ano': datahora.dt.year, 'mes': datahora.dt.month, 'dia': datahora.dt.day,
+            'hora_brasilia': datahora.dt.hour, 'dia_semana_brasilia': datahora.dt.dayofweek,
+        }, index=datahora.index)
+
+    # Dias desde 01/01/1970 e hora do dia a partir dos nanossegundos
+    ns = datahora.to_numpy(dtype='datetime64[ns]').view('int64')
+    if len(ns) == 0:
+        vazio = np.empty(0, dtype='int32')
+        return pd.DataFrame({c: vazio for c in ['ano', 'mes', 'dia', 'hora_brasilia', 'dia_semana_brasilia']},
+                            index=datahora.index)
+    dias = ns // _NS_POR_DIA
+    hora = ((ns - dias * _NS_POR_DIA) // _NS_POR_HORA).astype('int32')
+
+    # Os dados cobrem poucos dias distintos: a data civil é calculada uma vez por dia do intervalo
+    # (algoritmo civil_from_days de H. Hinnant) e distribuída às linhas por indexação
+    dia_min = dias.min()
+    posicao = dias - dia_min
+    z = np.arange(dia_min, dias.max() + 1) + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    tabela_dia = (doy - (153 * mp + 2) // 5 + 1).astype('int32')
+    tabela_mes = np.where(mp < 10, mp + 3, mp - 9).astype('int32')
+    tabela_ano = (yoe + era * 400 + (tabela_mes <= 2)).astype('int32')
+    tabela_dia_semana = ((z - 719468 + _DIA_SEMANA_EPOCH) % 7).astype('int32')
+
+    return pd.DataFrame({
+        'ano': tabela_ano[posicao],
+        'mes': tabela_mes[posicao],
+        'dia': tabela_dia[posicao],
+        'hora_brasilia': hora,
+        'dia_semana_brasilia': tabela_dia_semana[posicao],
+    }, index=datahora.index)
@@ -0,0 +1,190 @@
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score
+
+N_FOLDS_PADRAO = 5
+# Horas descartadas do fim do treino antes de cada bloco de teste: horas vizinhas têm chuva
+# quase igual e vazariam o teste para o treino
+LACUNA_HORAS_PADRAO = 24
+HIPERPARAMETROS_PADRAO = {'n_estimators': 100}
+
+
+def interpretar_grade(especificacoes):
+    """
+    Converte ['n_estimators=50,100', 'max_depth=None,20'] na lista de combinações (produto
+    cartesiano) de hiperparâmetros do RandomForestClassifier. Sem especificações, usa o padrão do script.
+    """
+    if not especificacoes:
+        return [dict(HIPERPARAMETROS_PADRAO)]
+    nomes, valores = [], []
+    for especificacao in especificacoes:
+        nome, _, lista = especificacao.partition('=')
+        if not nome or not lista:
+            raise ValueError(f"Grade inválida: '{especificacao}' (use nome=valor1,valor2).")
+        nomes.append(nome.strip())
+        valores.append([_converter_valor(v.strip()) for v in lista.split(',')])
+    return [dict(HIPERPARAMETROS_PADRAO, **dict(zip(nomes, combinacao))) for combinacao in itertools.product(*valores)]
+
+
+def _converter_valor(texto):
+    if texto == 'None':
+        return None
+    for tipo in (int, float):
+        try:
+            return tipo(texto)
+        except ValueError:
+            pass
+    return texto
+
+
+def folds_temporais_bloqueados(horas, n_folds=N_FOLDS_PADRAO, lacuna_horas=LACUNA_HORAS_PADRAO):
+    """
+    Divide as horas distintas em n_folds + 1 blocos contíguos. O fold k testa no bloco k + 1 e
+    treina com todas as horas anteriores a ele (janela expansiva), menos as últimas lacuna_horas.
+    Retorna uma lista de dicionários com os índices posicionais de treino e teste e os períodos.
+    """
+    horas = pd.to_datetime(pd.Series(horas)).to_numpy()
+    blocos = np.array_split(np.unique(horas), n_folds + 1)
+    if any(len(bloco) == 0 for bloco in blocos):
+        raise ValueError(f"Poucas horas distintas ({len(np.unique(horas))}) para {n_folds} folds.")
+
+    folds = []
+    for k in range(n_folds):
+        inicio_teste, fim_teste = blocos[k + 1][0], blocos[k + 1][-1]
+        limite_treino = inicio_teste - np.timedelta64(lacuna_horas, 'h')
+        treino = np.flatnonzero(horas < limite_treino)
+        teste = np.flatnonzero((horas >= inicio_teste) & (horas <= fim_teste))
+        if len(treino) == 0:
+            raise ValueError(f"Fold {k + 1} sem dados de treino: reduza --lacuna-horas ou --folds.")
+        folds.append({'fold': k + 1, 'treino': treino, 'teste': teste,
+                      'periodo_treino': (pd.Timestamp(horas[treino].min()), pd.Timestamp(horas[treino].max())),
+                      'periodo_teste': (pd.Timestamp(inicio_teste), pd.Timestamp(fim_teste))})
+    return folds
+
+
+def preparar_folds_em_cache(X, y, folds, construir_preprocessador, diretorio):
+    """
+    Codifica cada fold uma única vez (pré-processador ajustado só no treino do fold) e grava as
+    matrizes sem compressão em diretorio, para que todas as combinações da grade as leiam com
+    mmap em vez de repetir a codificação. Cada fold recebe 'caminho' e 'tempo_codificacao'.
+    """
+    for fold in folds:
+        inicio = time.perf_counter()
+        preprocessador = construir_preprocessador()
+        X_treino = preprocessador.fit_transform(X.iloc[fold['treino']], y.iloc[fold['treino']])
+        X_teste = preprocessador.transform(X.iloc[fold['teste']])
+        fold['caminho'] = os.path.join(diretorio, f"fold_{fold['fold']}.joblib")
+        joblib.dump((X_treino, y.iloc[fold['treino']].to_numpy(), X_teste, y.iloc[fold['teste']].to_numpy()), fold['caminho'])
+        fold['tempo_codificacao'] = time.perf_counter() - inicio
+    return folds
+
+
+def _avaliar_fold(caminho, hiperparametros, classes):
+    # Executado nos processos do pool: lê o fold codificado do cache e treina uma floresta
+    inicio = time.perf_counter()
+    X_treino, y_treino, X_teste, y_teste = joblib.load(caminho, mmap_mode='r')
+    classificador = RandomForestClassifier(random_state=42, **hiperparametros)
+    classificador.fit(X_treino, y_treino)
+    tempo_treino = time.perf_counter() - inicio
+    y_pred = classificador.predict(X_teste)
+    return {'acuracia': accuracy_score(y_teste, y_pred),
+            'f1_macro': f1_score(y_teste, y_pred, labels=classes, average='macro', zero_division=0),
+            'matriz_confusao': confusion_matrix(y_teste, y_pred, labels=classes),
+            'tempo_treino': tempo_treino, 'tempo_total': time.perf_counter() - inicio}
+
+
+def _contexto_pool():
+    # 2_train_model.py roda no nível do módulo: com 'spawn' cada processo repetiria o script inteiro
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def executar_validacao_temporal(X, y, horas, construir_preprocessador, treinar_final, grade,
+                                n_folds=N_FOLDS_PADRAO, lacuna_horas=LACUNA_HORAS_PADRAO, n_jobs=1):
+    """
+    Validação cruzada temporal bloqueada com busca em grade. Cada combinação x fold é avaliada em
+    um pool de n_jobs processos a partir dos folds codificados em cache. treinar_final(hiperparametros)
+    treina o modelo final com todos os dados no processo principal: com uma só combinação ele roda
+    em paralelo à validação; com várias, espera a validação para usar a melhor (maior F1 macro médio).
+    Retorna (modelo_final, resultados, melhor, folds, tempo_final).
+    """
+    folds = folds_temporais_bloqueados(horas, n_folds, lacuna_horas)
+    classes = np.unique(y)
+    contexto = _contexto_pool()
+    if n_jobs > 1 and contexto is None:
+        print("Aviso: pool de processos indisponível nesta plataforma; validação executada sequencialmente.")
+        n_jobs = 1
+
+    diretorio_cache = tempfile.mkdtemp(prefix='folds_temporais_')
+    executor = ProcessPoolExecutor(max_workers=n_jobs, mp_context=contexto) if n_jobs > 1 else None
+    try:
+        print(f"Codificando {len(folds)} folds temporais (uma vez cada) em {diretorio_cache}...")
+        preparar_folds_em_cache(X, y, folds, construir_preprocessador, diretorio_cache)
+
+        tarefas = [(i, fold) for i in range(len(grade)) for fold in folds]
+        print(f"Avaliando {len(grade)} combinação(ões) x {len(folds)} folds = {len(tarefas)} treinos "
+              f"em {max(n_jobs, 1)} processo(s)...")
+        if executor is not None:
+            futuros = [executor.submit(_avaliar_fold, fold['caminho'], grade[i], classes) for i, fold in tarefas]
+
+        modelo_final, tempo_final = None, None
+        if len(grade) == 1 and executor is not None:
+            # Modelo final no processo principal enquanto o pool valida os folds
+            modelo_final, tempo_final = _cronometrar(treinar_final, grade[0])
+
+        if executor is not None:
+            metricas = [futuro.result() for futuro in futuros]
+        else:
+            metricas = [_avaliar_fold(fold['caminho'], grade[i], classes) for i, fold in tarefas]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        shutil.rmtree(diretorio_cache, ignore_errors=True)
+
+    resultados = [dict(m, combinacao=i, fold=fold['fold']) for (i, fold), m in zip(tarefas, metricas)]
+    melhor = max(range(len(grade)), key=lambda i: np.mean([r['f1_macro'] for r in resultados if r['combinacao'] == i]))
+    if modelo_final is None:
+        print(f"Treinando o modelo final com a melhor combinação: {grade[melhor]}...")
+        modelo_final, tempo_final = _cronometrar(treinar_final, grade[melhor])
+    return modelo_final, resultados, melhor, folds, tempo_final
+
+
+def _cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def relatorio_validacao_temporal(resultados, melhor, grade, folds, lacuna_horas):
+    """Texto do relatório: períodos dos folds, métricas e tempo de parede por fold e médias por combinação."""
+    linhas = [f"Validação Cruzada Temporal Bloqueada ({len(folds)} folds, janela expansiva, lacuna de {lacuna_horas} h antes de cada teste)\n"]
+    for fold in folds:
+        linhas.append(f"Fold {fold['fold']}: treino {fold['periodo_treino'][0]:%Y-%m-%d %H:%M} a {fold['periodo_treino'][1]:%Y-%m-%d %H:%M} "
+                      f"({len(fold['treino'])} linhas) | teste {fold['periodo_teste'][0]:%Y-%m-%d %H:%M} a "
+                      f"{fold['periodo_teste'][1]:%Y-%m-%d %H:%M} ({len(fold['teste'])} linhas) | codificação {fold['tempo_codificacao']:.2f} s")
+
+    for i, hiperparametros in enumerate(grade):
+        do_combo = [r for r in resultados if r['combinacao'] == i]
+        marcador = "  <- melhor (F1 macro médio)" if i == melhor else ""
+        linhas.append(f"\nCombinação {i + 1}: {hiperparametros}{marcador}")
+        linhas.append(f"{'fold':>5} {'acurácia':>9} {'f1 macro':>9} {'treino (s)':>11} {'total (s)':>10}")
+        for r in do_combo:
+            linhas.append(f"{r['fold']:>5} {r['acuracia']:>9.4f} {r['f1_macro']:>9.4f} {r['tempo_treino']:>11.2f} {r['tempo_total']:>10.2f}")
+        linhas.append(f"{'média':>5} {np.mean([r['acuracia'] for r in do_combo]):>9.4f} "
+                      f"{np.mean([r['f1_macro'] for r in do_combo]):>9.4f} "
+                      f"{np.mean([r['tempo_treino'] for r in do_combo]):>11.2f} {np.mean([r['tempo_total'] for r in do_combo]):>10.2f}")
+
+    matriz = sum(r['matriz_confusao'] for r in resultados if r['combinacao'] == melhor)
+    linhas.append(f"\nMatriz de Confusão da melhor combinação (soma dos folds):\n{matriz}")
+    return "\n".join(linhas) + "\n"